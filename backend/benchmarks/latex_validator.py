@@ -0,0 +1,59 @@
+"""
+Times LatexValidator.validate on a resume, to keep the pre-flight check negligible next to pdflatex.
+
+Validation runs before every compile (and on every local score), so it should stay a small
+fraction of a millisecond per kilobyte of source. The first run also prints the diagnostics,
+which is handy when checking a template by hand.
+
+Usage (from backend/):
+    python benchmarks/latex_validator.py --tex ../data/users/testuser/templates/<resume>.tex
+
+Exits non-zero if the average validation took longer than --budget-ms.
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.services.latex_validator import LatexValidator, format_diagnostics, _preamble_cache
+
+
+def main():
+    default_tex = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "users", "testuser", "templates",
+        "Bhuvan_Thirwani_Software_Engineer_2026.tex"
+    )
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tex", default=default_tex)
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument("--budget-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with open(args.tex, "r", encoding="utf-8") as f:
+        tex = f.read()
+    validator = LatexValidator()
+
+    _preamble_cache.clear()
+    started = time.perf_counter()
+    report = validator.validate(tex)
+    cold_ms = (time.perf_counter() - started) * 1000
+    print(format_diagnostics(report["diagnostics"]) or "No diagnostics")
+    print(f"{len(report['fixes'])} automatic fixes")
+
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        validator.validate(tex)
+    warm_ms = (time.perf_counter() - started) * 1000 / args.iterations
+
+    print(f"Resume: {len(tex)} chars")
+    print(f"  cold   {cold_ms:.3f} ms  (preamble analyzed)")
+    print(f"  warm   {warm_ms:.3f} ms per validation  ({args.iterations} runs, preamble cached)")
+
+    ok = warm_ms <= args.budget_ms
+    print(f"  OK: within {args.budget_ms} ms" if ok else f"  FAIL: over the {args.budget_ms} ms budget")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Compares full-document and per-section optimize_resume against a latency-injecting fake provider.
+
+The fake provider stands in for the LLM call: it answers each structured call after
+--base-latency seconds plus the time to "generate" its output at --chars-per-second, which is
+what dominates a real rewrite. The full mode generates the whole resume in one call; the
+section mode generates Skills and each Experience/Project entry in parallel calls, bounded by
+OPTIMIZE_SECTION_CONCURRENCY, so its wall time should track the slowest part.
+
+Usage (from backend/):
+    python benchmarks/section_optimize.py --tex ../data/users/testuser/templates/<resume>.tex
+
+Exits non-zero if the section mode was not faster than the full rewrite.
+"""
+import os
+import re
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.services import llm_service
+from src.services.llm_service import LLMService, OptimizationResult, SectionRewrite
+
+KEYWORDS = ["Kubernetes", "Terraform", "gRPC", "Kafka", "Redis", "Observability", "Go", "System Design"]
+
+
+class FakeProviderLLMService(LLMService):
+    """LLMService whose structured calls are answered locally after a simulated generation delay."""
+
+    def __init__(self, base_latency: float, chars_per_second: float):
+        super().__init__()
+        self.base_latency = base_latency
+        self.chars_per_second = chars_per_second
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    def _get_model_config(self, user_config):
+        return {"id": "fake", "model_id": "fake", "provider": "fake"}
+
+    def _init_llm(self, config):
+        return None
+
+    async def _invoke_structured(self, llm, model_conf, formatted_prompt, result_model, temperature: float = 0.2):
+        if result_model is SectionRewrite:
+            section = formatted_prompt.split("LATEX:\n", 1)[1].strip("\n ") + "\n"
+            keywords = re.search(r"TARGET KEYWORDS: (.*)", formatted_prompt).group(1)
+            result = SectionRewrite(new_latex_code=add_keywords(section, keywords), summary=[f"Added {keywords}"])
+        else:
+            resume = formatted_prompt.split("old_resume_code (LaTeX): ", 1)[1].rstrip()
+            result = OptimizationResult(
+                final_score=90,
+                new_latex_code=add_keywords(resume, ", ".join(KEYWORDS)),
+                summary=["Rewrote the resume"]
+            )
+
+        delay = self.base_latency + len(result.new_latex_code) / self.chars_per_second
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.in_flight -= 1
+        self.calls.append(delay)
+        return result
+
+
+def add_keywords(tex: str, keywords: str) -> str:
+    # First skills list ("{: ...") or first bullet gets the keywords; otherwise unchanged
+    for anchor in ("{: ", "\\resumeItem{"):
+        at = tex.find(anchor)
+        if at != -1:
+            at += len(anchor)
+            return tex[:at] + keywords + ", " + tex[at:]
+    return tex
+
+
+async def run(service: FakeProviderLLMService, tex: str, mode: str):
+    analysis = {"ats_score": 60, "missing_keywords": KEYWORDS, "matched_keywords": ["Python"], "justification": {}}
+    service.calls, service.max_in_flight = [], 0
+    started = time.perf_counter()
+    result = await service.optimize_resume({"prompts": {}}, analysis, tex, "Platform engineer: " + ", ".join(KEYWORDS), mode=mode)
+    return result, time.perf_counter() - started
+
+
+def main():
+    default_tex = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "users", "testuser", "templates",
+        "Bhuvan_Thirwani_Software_Engineer_2026.tex"
+    )
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tex", default=default_tex)
+    parser.add_argument("--base-latency", type=float, default=0.3)
+    parser.add_argument("--chars-per-second", type=float, default=2000.0)
+    parser.add_argument("--concurrency", type=int, default=llm_service.OPTIMIZE_SECTION_CONCURRENCY)
+    args = parser.parse_args()
+
+    with open(args.tex, "r", encoding="utf-8") as f:
+        tex = f.read()
+    llm_service.OPTIMIZE_SECTION_CONCURRENCY = args.concurrency
+    service = FakeProviderLLMService(args.base_latency, args.chars_per_second)
+
+    full, full_seconds = asyncio.run(run(service, tex, "full"))
+    full_calls = list(service.calls)
+    sections, section_seconds = asyncio.run(run(service, tex, "sections"))
+    section_calls = list(service.calls)
+
+    print(f"Resume: {len(tex)} chars, {len(KEYWORDS)} target keywords, concurrency {args.concurrency}")
+    print(f"  full      {full_seconds:.2f}s  ({len(full_calls)} call)")
+    print(f"  sections  {section_seconds:.2f}s  ({len(section_calls)} calls, max in flight {service.max_in_flight})")
+    print(f"            slowest part {max(section_calls):.2f}s, serial sum {sum(section_calls):.2f}s")
+    print(f"  stats     {sections.stats}")
+
+    ok = sections.stats.get("mode") == "sections" and section_seconds < full_seconds
+    print("  OK: section mode beat the full rewrite" if ok else "  FAIL: section mode was not faster")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Per-task event loop vs. persistent per-process loop, against a local fake LLM endpoint.
+
+Mirrors what a Celery worker does for N sequential LLM tasks:
+  per_task   - new_event_loop() + new HTTP client per task, both closed afterwards (old worker)
+  persistent - one loop from src.services.event_loop, one client reused by every task
+
+Usage (from backend/):
+    python benchmarks/worker_event_loop.py --tasks 200
+    python benchmarks/worker_event_loop.py --tasks 200 --tls   # needs the openssl CLI
+
+The fake server counts accepted connections, so the output shows how many
+TCP (and TLS) handshakes each mode paid for.
+"""
+import os
+import ssl
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx  # Transport used by the OpenAI SDK (and so by ChatOpenAI)
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.services.event_loop import run_async, stop_loop
+
+COMPLETION = json.dumps({
+    "id": "chatcmpl-bench",
+    "object": "chat.completion",
+    "model": "fake",
+    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "{\"ok\": true}"}}],
+    "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+}).encode("utf-8")
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like real LLM APIs
+    connections = 0
+    lock = threading.Lock()
+    latency = 0.0
+
+    def setup(self):
+        with FakeLLMHandler.lock:
+            FakeLLMHandler.connections += 1
+        super().setup()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.latency:
+            time.sleep(self.latency)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(tls: bool, latency: float):
+    FakeLLMHandler.latency = latency
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeLLMHandler)
+    scheme = "http"
+    if tls:
+        cert_dir = tempfile.mkdtemp()
+        cert, key = os.path.join(cert_dir, "cert.pem"), os.path.join(cert_dir, "key.pem")
+        subprocess.run(
+            ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+             "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+            check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert, key)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"{scheme}://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+
+
+REQUEST = {"model": "fake", "messages": [{"role": "user", "content": "score this resume"}]}
+
+
+async def call_llm(client: httpx.AsyncClient, url: str):
+    resp = await client.post(url, json=REQUEST)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def bench_per_task(url: str, tasks: int) -> float:
+    started = time.perf_counter()
+    for _ in range(tasks):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        async def task():
+            async with httpx.AsyncClient(verify=False) as client:
+                return await call_llm(client, url)
+
+        loop.run_until_complete(task())
+        loop.close()
+    return time.perf_counter() - started
+
+
+def bench_persistent(url: str, tasks: int) -> float:
+    async def make_client():
+        return httpx.AsyncClient(verify=False)
+
+    client = run_async(make_client())
+    started = time.perf_counter()
+    for _ in range(tasks):
+        run_async(call_llm(client, url))
+    elapsed = time.perf_counter() - started
+    run_async(client.aclose())
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--tls", action="store_true", help="serve over HTTPS with a throwaway self-signed cert")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated model time per request (seconds)")
+    args = parser.parse_args()
+
+    server, url = start_server(args.tls, args.latency)
+    results = {}
+    for name, bench in (("per_task", bench_per_task), ("persistent", bench_persistent)):
+        FakeLLMHandler.connections = 0
+        elapsed = bench(url, args.tasks)
+        results[name] = (elapsed, FakeLLMHandler.connections)
+
+    stop_loop()
+    server.shutdown()
+
+    print(f"{args.tasks} sequential tasks against {url}")
+    for name, (elapsed, connections) in results.items():
+        print(f"  {name:<11} {elapsed:8.3f}s total  {elapsed / args.tasks * 1000:7.2f} ms/task  {connections:4d} connections")
+    speedup = results["per_task"][0] / results["persistent"][0]
+    print(f"  persistent loop is {speedup:.2f}x faster")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, Header
 from sqlalchemy.orm import Session
 from src.deps import get_current_workspace, get_current_user
 from src.db.session import get_db
 from src.services.file_service import FileService
 from src.services.llm_service import LLMService
 from src.services.compiler_service import CompilerService
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 router = APIRouter()
 
 import uuid
 import re
+import json
+import asyncio
 
 class AnalyzeRequest(BaseModel):
     template_filename: str = ""
     profile_filename: str = ""
     job_description: str
+    bypass_cache: bool = False
+
+class QuickScoreRequest(BaseModel):
+    template_filename: str = ""
+    latex_code: str = "" # Unsaved editor contents take precedence over the template
+    job_description: str
 
 class OptimizeRequest(BaseModel):
     template_filename: str
@@ -25,6 +34,11 @@ class OptimizeRequest(BaseModel):
     output_filename: str
     ignored_keywords: list[str] = [] # Optional list of keywords to remove
     manual_keywords: list[str] = [] # Optional list of keywords to add manually
+    seed_workflow_id: str = "" # Near-duplicate earlier workflow to warm-start from (see /similar_jobs)
+
+class SimilarJobsRequest(BaseModel):
+    job_description: str
+    template_filename: str = ""
 
 from typing import Optional
 
@@ -36,6 +50,7 @@ class RefineRequest(BaseModel):
     output_filename: str
     job_description: str # For re-analysis
     target_version: Optional[str] = None # NEW: Explicit version control
+    stream: bool = False # Relay LLM tokens + progress on /jobs/{job_id}/events
 
 class CompileRequest(BaseModel):
     workflow_id: str
@@ -43,6 +58,9 @@ class CompileRequest(BaseModel):
     target_version: str
     output_filename: str
 
+class BatchCompileRequest(BaseModel):
+    items: list[CompileRequest]
+
 # ... imports ...
 
 # ... Models (AnalyzeRequest, OptimizeRequest) ...
@@ -82,13 +100,38 @@ async def analyze_resume(
 
     # 3. Call LLM
     try:
-        result = await llm_service.analyze_resume(config, resume_text, req.job_description)
+        result = await llm_service.analyze_resume(config, resume_text, req.job_description, use_cache=not req.bypass_cache)
         return result
     except Exception as e:
         import traceback
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"LLM Error: {str(e)}")
 
+@router.post("/quick_score")
+def quick_score(
+    req: QuickScoreRequest,
+    workspace_id: str = Depends(get_current_workspace),
+    file_service: FileService = Depends(lambda: FileService())
+):
+    """
+    Local keyword-based ATS score in the shape of /analyze, computed in milliseconds without
+    an LLM call. Meant for live scoring while editing and as a preview while /analyze runs.
+    """
+    from src.services.ats_scorer import score_resume
+
+    resume_text = req.latex_code
+    if not resume_text:
+        if not req.template_filename:
+            raise HTTPException(status_code=400, detail="Must provide either latex_code or template_filename")
+        try:
+            resume_path = file_service.get_file_content(workspace_id, req.template_filename, "template")
+            with open(resume_path, "r", encoding="utf-8") as f:
+                resume_text = f.read()
+        except Exception as e:
+            raise HTTPException(status_code=404, detail=f"File error: {str(e)}")
+
+    return score_resume(resume_text, req.job_description)
+
 @router.post("/optimize")
 async def optimize_resume(
     req: OptimizeRequest,
@@ -99,7 +142,16 @@ async def optimize_resume(
 ):
     # 1. Create Workflow in DB
     from src.db.models import Workflow, Job
+    from src.services.jd_index import jd_index
     import uuid
+
+    if req.seed_workflow_id:
+        seed = db.query(Workflow).filter(Workflow.id == req.seed_workflow_id, Workflow.user_id == current_user.id).first()
+        if not seed:
+            raise HTTPException(status_code=404, detail="Seed workflow not found")
+        # The seed's resume replaces the selected template, so it must have been built from it
+        if seed.template_filename != req.template_filename:
+            raise HTTPException(status_code=400, detail="Seed workflow was built from a different template")
     
     workflow = Workflow(
         id=str(uuid.uuid4()),
@@ -111,13 +163,23 @@ async def optimize_resume(
     db.add(workflow)
     db.commit()
     db.refresh(workflow)
+    # Shingling + MinHash is CPU work; keep it off the event loop
+    await asyncio.to_thread(jd_index.add, current_user.id, workflow.id, req.job_description)
+    
+    # 2. Create Job Record in DB (before enqueueing, so no stage can run ahead of it)
+    job = Job(
+        id=str(uuid.uuid4()),
+        workflow_id=workflow.id,
+        status="PENDING"
+    )
+    db.add(job)
+    db.commit()
     
-    # 2. Enqueue Task
-    from src.worker import optimize_resume_task
-    import redis
-    import os
+    # 3. Enqueue Pipeline (extract -> LLM -> compile -> persist, each on its own queue)
+    from src.worker import start_optimize_pipeline
     
-    task = optimize_resume_task.delay(
+    start_optimize_pipeline(
+        job_id=job.id,
         workspace_id=workspace_id,
         template_filename=req.template_filename,
         profile_filename=req.profile_filename,
@@ -126,24 +188,72 @@ async def optimize_resume(
         output_filename=req.output_filename,
         ignored_keywords=req.ignored_keywords,
         manual_keywords=req.manual_keywords,
-        workflow_id=workflow.id # Pass DB ID
-    )
-    
-    # 3. Create Job Record in DB
-    job = Job(
-        id=task.id,
-        workflow_id=workflow.id,
-        status="PENDING"
+        workflow_id=workflow.id, # Pass DB ID
+        seed_workflow_id=req.seed_workflow_id
     )
-    db.add(job)
-    db.commit()
     
     return {
-        "job_id": task.id,
+        "job_id": job.id,
         "workflow_id": workflow.id,
         "status": "processing"
     }
 
+@router.post("/similar_jobs")
+async def find_similar_jobs(
+    req: SimilarJobsRequest,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Earlier workflows whose job description is a near-duplicate of this one (MinHash/LSH).
+    Each match carries what can be reused: the earlier analysis (only valid for the same
+    template) and the version to pass as seed_workflow_id to /optimize (also same template only).
+    """
+    from src.db.models import Workflow, Job
+    from src.services.jd_index import jd_index
+
+    def load_workflows():
+        rows = db.query(Workflow.id, Workflow.job_description).filter(Workflow.user_id == current_user.id).all()
+        return [(row.id, row.job_description) for row in rows if row.job_description]
+
+    def lookup():
+        jd_index.ensure_built(current_user.id, load_workflows)
+        return jd_index.find_similar(current_user.id, req.job_description)
+
+    # Index building and LSH lookups are CPU work; keep them off the event loop
+    matches = await asyncio.to_thread(lookup)
+    if not matches:
+        return {"matches": []}
+
+    workflows = {
+        w.id: w for w in db.query(Workflow)
+        .filter(Workflow.id.in_([m["workflow_id"] for m in matches]), Workflow.user_id == current_user.id)
+        .all()
+    }
+    results = []
+    for match in matches:
+        workflow = workflows.get(match["workflow_id"])
+        if not workflow:
+            continue
+        jobs = db.query(Job)\
+            .filter(Job.workflow_id == workflow.id, Job.status == "SUCCESS")\
+            .order_by(Job.updated_at.desc())\
+            .all()
+        latest = next((j.result_data for j in jobs if (j.result_data or {}).get("compilation", {}).get("success")), None)
+        source_analysis = next((j.result_data["source_analysis"] for j in jobs if (j.result_data or {}).get("source_analysis")), None)
+        same_template = bool(req.template_filename) and req.template_filename == workflow.template_filename
+        results.append({
+            **match,
+            "created_at": workflow.created_at,
+            "template_filename": workflow.template_filename,
+            "latest_version": latest.get("version") if latest else None,
+            "ats_score": ((latest or {}).get("analysis") or {}).get("ats_score") or ((latest or {}).get("optimization") or {}).get("final_score"),
+            # The earlier analysis scored the same resume against (almost) the same posting
+            "analysis": source_analysis if same_template else None,
+            "can_seed": latest is not None and same_template
+        })
+    return {"matches": results}
+
 @router.get("/workflows")
 def list_workflows(
     skip: int = 0, 
@@ -204,6 +314,64 @@ def get_job_status(
         "workflow_id": job.workflow_id
     }
 
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID"),
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Server-Sent Events for a job: "token" (streamed LLM output), "stage", "compiled",
+    "analysis", then "done" or "error". Reconnects resume after Last-Event-ID.
+    """
+    from src.db.models import Job, Workflow
+    from src.db.session import SessionLocal
+    from src.services.job_events import stream_events, format_sse
+
+    def terminal_event(job):
+        if job.status == "SUCCESS":
+            return {"seq": 0, "event": "done", "data": {"status": job.status, "result": job.result_data}}
+        if job.status == "FAILED":
+            return {"seq": 0, "event": "error", "data": {"error": job.error_message}}
+        return None
+
+    # Events carry the full result: only the owner of the job's workflow may subscribe
+    job = db.query(Job)\
+        .join(Workflow, Job.workflow_id == Workflow.id)\
+        .filter(Job.id == job_id, Workflow.user_id == current_user.id)\
+        .first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    initial = terminal_event(job)
+    db.close() # Don't hold a DB connection for the lifetime of the stream
+
+    def load_finished():
+        session = SessionLocal()
+        try:
+            job = session.query(Job).filter(Job.id == job_id).first()
+            return terminal_event(job) if job else None
+        finally:
+            session.close()
+
+    async def finished():
+        # Re-read on reconnects with nothing to replay and on idle heartbeats (off the event loop)
+        return await asyncio.to_thread(load_finished)
+
+    async def event_stream():
+        if initial and not last_event_id:
+            # Finished before the client connected (events may have expired): answer from the DB
+            yield format_sse(initial)
+            return
+        async for event in stream_events(job_id, last_seq=last_event_id or 0, finished=finished):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/refine")
 async def refine_resume(
     req: RefineRequest,
@@ -212,7 +380,7 @@ async def refine_resume(
     current_user = Depends(get_current_user)
 ):
     from src.db.models import Job
-    from src.worker import refine_resume_task
+    from src.worker import start_refine_pipeline
 
     # Determine target version
     if req.target_version:
@@ -225,8 +393,18 @@ async def refine_resume(
         else:
             new_version = "v2"
 
-    # Enqueue Celery Task
-    task = refine_resume_task.delay(
+    # Create Job Record in DB
+    job = Job(
+        id=str(uuid.uuid4()),
+        workflow_id=req.workflow_id,
+        status="PENDING"
+    )
+    db.add(job)
+    db.commit()
+
+    # Enqueue Pipeline
+    start_refine_pipeline(
+        job_id=job.id,
         workspace_id=workspace_id,
         workflow_id=req.workflow_id,
         current_version=req.current_version,
@@ -234,20 +412,12 @@ async def refine_resume(
         user_request=req.user_request,
         output_filename=req.output_filename,
         job_description=req.job_description,
-        target_version=new_version
-    )
-
-    # Create Job Record in DB
-    job = Job(
-        id=task.id,
-        workflow_id=req.workflow_id,
-        status="PENDING"
+        new_version=new_version,
+        stream=req.stream
     )
-    db.add(job)
-    db.commit()
 
     return {
-        "job_id": task.id,
+        "job_id": job.id,
         "workflow_id": req.workflow_id,
         "version": new_version,
         "status": "processing"
@@ -265,7 +435,7 @@ async def compile_manual_version(
     # Sanitize
     sanitized_latex = req.latex_code.replace("\x00", "").replace("\u0000", "")
     
-    compile_result = compiler_service.compile_resume(
+    compile_result = await compiler_service.compile_resume_async(
         workspace_id, 
         sanitized_latex, 
         req.output_filename,
@@ -279,3 +449,125 @@ async def compile_manual_version(
         "version": req.target_version
     }
 
+
+@router.post("/compile_batch")
+def compile_batch(
+    req: BatchCompileRequest,
+    workspace_id: str = Depends(get_current_workspace),
+    compiler_service: CompilerService = Depends(lambda: CompilerService())
+):
+    """
+    Compile many versions at once (e.g. after a template fix).
+    Streams one JSON line per item (NDJSON) as each compile finishes.
+    """
+    if not req.items:
+        raise HTTPException(status_code=400, detail="No items to compile")
+
+    targets = [(i.workflow_id, i.target_version, i.output_filename) for i in req.items]
+    if len(set(targets)) != len(targets):
+        raise HTTPException(status_code=400, detail="Duplicate workflow/version/filename in batch")
+
+    items = [
+        {
+            "workflow_id": i.workflow_id,
+            "version": i.target_version,
+            "output_filename": i.output_filename,
+            "latex_code": i.latex_code.replace("\x00", "").replace("\u0000", "")
+        }
+        for i in req.items
+    ]
+
+    def stream():
+        for result in compiler_service.compile_batch(workspace_id, items):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@router.get("/compile_cache/stats")
+def get_compile_cache_stats(
+    workspace_id: str = Depends(get_current_workspace),
+    compiler_service: CompilerService = Depends(lambda: CompilerService())
+):
+    """
+    Hit/miss counters of the compile cache for this process.
+    """
+    return compiler_service.get_cache_stats()
+
+@router.get("/compile_queue/stats")
+def get_compile_queue_stats(
+    workspace_id: str = Depends(get_current_workspace),
+    compiler_service: CompilerService = Depends(lambda: CompilerService())
+):
+    """
+    Concurrency limit, in-flight/queued compiles and queue-wait timings for this API process.
+    """
+    return compiler_service.get_queue_stats()
+
+@router.get("/pipeline/stats")
+def get_pipeline_stats(
+    workspace_id: str = Depends(get_current_workspace)
+):
+    """
+    Queue depth and wait/run latency of each Celery pipeline stage (extract, llm, compile, persist).
+    """
+    from src.services.pipeline_stats import get_pipeline_stats as read_pipeline_stats
+    return read_pipeline_stats()
+
+@router.get("/llm_cache/stats")
+def get_llm_cache_stats(
+    workspace_id: str = Depends(get_current_workspace)
+):
+    """
+    Hit rate, estimated saved tokens and size of the analyze response cache.
+    """
+    from src.services.llm_cache import analyze_cache
+    return analyze_cache.get_stats()
+
+@router.get("/rate_limits/stats")
+def get_rate_limit_stats(
+    workspace_id: str = Depends(get_current_workspace)
+):
+    """
+    Remaining requests/tokens per minute, calls in flight and wait/rejection counts for each
+    provider API key (identified by a hash, never the key itself).
+    """
+    from src.services.rate_limiter import llm_rate_limiter
+    return llm_rate_limiter.get_stats()
+
+@router.get("/llm_routing/stats")
+def get_llm_routing_stats(
+    workspace_id: str = Depends(get_current_workspace)
+):
+    """
+    Hedging / failover counters, per-model latency percentiles and circuit breaker states
+    of this API process (workers keep their own).
+    """
+    from src.services.llm_routing import latency_tracker, circuit_breaker, routing_stats
+    return {
+        "routing": dict(routing_stats),
+        "latency": latency_tracker.get_stats(),
+        "breakers": circuit_breaker.get_stats()
+    }
+
+@router.get("/llm_parsing/stats")
+def get_llm_parsing_stats(
+    workspace_id: str = Depends(get_current_workspace)
+):
+    """
+    Structured-output parsing in this API process: clean vs repaired replies (by repair kind),
+    truncated replies and the continuation calls that rescued them.
+    """
+    from src.services.json_repair import get_stats
+    return get_stats()
+
+
+@router.get("/prompt_compaction/stats")
+def get_prompt_compaction_stats(
+    workspace_id: str = Depends(get_current_workspace)
+):
+    """
+    Estimated input tokens per prompt type in this API process, before and after the
+    preamble and comments were stripped from the resume.
+    """
+    from src.services.prompt_compactor import get_stats
+    return get_stats()
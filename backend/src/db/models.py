@@ -34,7 +34,7 @@ class Workflow(Base):
 class Job(Base):
     __tablename__ = "jobs"
 
-    id = Column(String, primary_key=True) # Celery Task ID
+    id = Column(String, primary_key=True) # Pipeline job ID (passed through every Celery stage)
     workflow_id = Column(String, ForeignKey("workflows.id"))
     
     status = Column(String, default="PENDING") # PENDING, SUCCESS, FAILED
@@ -0,0 +1,372 @@
+import os
+import re
+import difflib
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from src.services.latex_structure import index_cache
+from src.services.latex_validator import LatexValidator
+
+# Local ATS Scorer
+# Deterministic keyword scoring in the shape of AnalysisResult, for live/preview scores that
+# shouldn't wait on (or pay for) an LLM call. Same rubric weights as the analyze prompt.
+WEIGHTS = {
+    "keyword_match": 40,
+    "skill_depth": 20,
+    "role_fit": 10,
+    "experience_relevance": 15,
+    "education_fit": 5,
+    "parsing_quality": 10,
+}
+MAX_KEYWORDS = 40
+MAX_PHRASE_WORDS = 3
+# Share of resume text an edit may change before a refine gets a full LLM re-analysis
+INCREMENTAL_RESCORE_THRESHOLD = float(os.getenv("INCREMENTAL_RESCORE_THRESHOLD", "0.15"))
+# Incremental results build on each other; after this many in a row, or once the edits since
+# the last full analysis add up to this share of the text, the next refine is analyzed in full
+INCREMENTAL_RESCORE_MAX_STEPS = int(os.getenv("INCREMENTAL_RESCORE_MAX_STEPS", "5"))
+INCREMENTAL_RESCORE_MAX_DRIFT = float(os.getenv("INCREMENTAL_RESCORE_MAX_DRIFT", "0.3"))
+
+TOKEN = re.compile(r"[a-z0-9][a-z0-9+#]*(?:[./-][a-z0-9+#]+)*")
+LATEX_COMMENT = re.compile(r"(?<!\\)%[^\n]*")
+LATEX_ESCAPE = re.compile(r"\\([&%#_$])")
+LATEX_COMMAND = re.compile(r"\\[A-Za-z@]+\*?|\\\\")
+LATEX_NOISE = re.compile(r"[{}$\[\]~^]")
+PHRASE_BREAK = re.compile(r"[,;:()\n\u2022|!?]|\.\s")
+
+# Canonical skill -> spellings seen in resumes and job posts
+SKILLS = {
+    "Python": ["python"], "Java": ["java"], "JavaScript": ["javascript"], "TypeScript": ["typescript"],
+    "Go": ["golang"], "Rust": ["rust"], "C++": ["c++", "cpp"], "C#": ["c#", "csharp"],
+    "Kotlin": ["kotlin"], "Swift": ["swift"], "Scala": ["scala"], "Ruby": ["ruby"], "PHP": ["php"],
+    "SQL": ["sql"], "NoSQL": ["nosql"], "Bash": ["bash", "shell scripting"], "HTML": ["html", "html5"], "CSS": ["css", "css3"],
+    "React": ["react", "reactjs", "react.js"], "Next.js": ["next.js", "nextjs"], "Angular": ["angular"],
+    "Vue": ["vue", "vue.js", "vuejs"], "Node.js": ["node.js", "nodejs"], "Express": ["express", "express.js"],
+    "Django": ["django"], "Flask": ["flask"], "FastAPI": ["fastapi"], "Spring": ["spring"], "Spring Boot": ["spring boot"],
+    "Rails": ["rails", "ruby on rails"], ".NET": [".net", "dotnet"], "GraphQL": ["graphql"], "REST": ["restful", "rest api"],
+    "gRPC": ["grpc"], "Microservices": ["microservices", "microservice"], "PostgreSQL": ["postgresql", "postgres"],
+    "MySQL": ["mysql"], "MongoDB": ["mongodb", "mongo"], "Redis": ["redis"], "Cassandra": ["cassandra"],
+    "DynamoDB": ["dynamodb"], "Elasticsearch": ["elasticsearch", "elastic search"], "Kafka": ["kafka"],
+    "RabbitMQ": ["rabbitmq"], "Spark": ["spark", "apache spark", "pyspark"], "Hadoop": ["hadoop"], "Airflow": ["airflow"],
+    "Snowflake": ["snowflake"], "BigQuery": ["bigquery"], "dbt": ["dbt"], "ETL": ["etl"],
+    "AWS": ["aws", "amazon web services"], "GCP": ["gcp", "google cloud"], "Azure": ["azure"], "Docker": ["docker"],
+    "Kubernetes": ["kubernetes", "k8s"], "Terraform": ["terraform"], "Ansible": ["ansible"], "Jenkins": ["jenkins"],
+    "CI/CD": ["ci/cd", "ci cd", "continuous integration", "continuous delivery"], "Git": ["git"], "Linux": ["linux"],
+    "Prometheus": ["prometheus"], "Grafana": ["grafana"], "Observability": ["observability"],
+    "Machine Learning": ["machine learning", "ml"], "Deep Learning": ["deep learning"], "NLP": ["nlp", "natural language processing"],
+    "Computer Vision": ["computer vision"], "LLMs": ["llm", "llms", "large language models"], "Generative AI": ["generative ai", "genai"],
+    "PyTorch": ["pytorch"], "TensorFlow": ["tensorflow"], "scikit-learn": ["scikit-learn", "sklearn"], "Pandas": ["pandas"],
+    "NumPy": ["numpy"], "LangChain": ["langchain"], "RAG": ["rag", "retrieval augmented generation"],
+    "Prompt Engineering": ["prompt engineering"], "Data Structures": ["data structures"], "Algorithms": ["algorithms"],
+    "System Design": ["system design"], "Distributed Systems": ["distributed systems"], "Object-Oriented Design": ["object-oriented design", "ood", "oop"],
+    "Agile": ["agile", "scrum"], "Unit Testing": ["unit testing", "unit tests"], "Celery": ["celery"], "Tableau": ["tableau"],
+}
+
+ROLE_WORDS = {"engineer", "developer", "scientist", "analyst", "architect", "manager", "designer", "intern", "administrator", "consultant"}
+DEGREES = {
+    "bachelor": ["bachelor", "bachelors", "b.s", "b.tech"],
+    "master": ["master", "masters", "m.s", "mtech", "m.tech"],
+    "phd": ["phd", "ph.d", "doctorate"],
+    "computer science": ["computer science"],
+}
+
+STOPWORDS = set("""
+a an the and or but if of to in on at by for with from as is are was were be been being this that these those it its
+we you your our they their them he she his her i me my us will would should can could may might must shall do does did
+have has had not no nor so than too very just also into over under about across within per via etc including include
+includes such more most other any all each both few some what which who whom whose where when why how while who
+""".split())
+# Words that show up in every posting and say nothing about the role
+GENERIC = set("""
+experience team teams work working ability able strong skills skill years year role roles knowledge requirements
+requirement responsibilities responsibility candidate candidates company job opportunity benefits salary equal
+employer plus preferred required excellent understanding new using use build building develop developing help
+looking join environment well good great high highly best make ensure support within across business solutions
+product products customers customer world people position time days day please apply qualifications minimum
+related field based level senior junior closely collaborate collaborating communication written verbal
+""".split())
+
+_stem_cache: Dict[str, str] = {}
+
+
+def _stem(token: str) -> str:
+    # Plural folding only: "microservices" == "microservice", "apis" == "api"
+    stem = _stem_cache.get(token)
+    if stem is None:
+        stem = token[:-1] if len(token) > 3 and token.endswith("s") and not token.endswith("ss") else token
+        _stem_cache[token] = stem
+    return stem
+
+
+def tokenize(text: str) -> List[str]:
+    return [_stem(t) for t in TOKEN.findall(text.lower())]
+
+
+def strip_latex(tex: str) -> str:
+    """Plain text of a LaTeX resume (body only, commands dropped, arguments kept)."""
+    begin = tex.find("\\begin{document}")
+    if begin != -1:
+        tex = tex[begin + len("\\begin{document}"):]
+    tex = LATEX_COMMENT.sub("", tex)
+    tex = LATEX_ESCAPE.sub(r"\1", tex)
+    tex = LATEX_COMMAND.sub(" ", tex)
+    return LATEX_NOISE.sub(" ", tex)
+
+
+class PhraseMatcher:
+    """
+    Multi-pattern matcher over token sequences: a trie of stemmed phrases walked from every
+    token position, so all keywords are counted in one pass over the resume.
+    """
+
+    def __init__(self, patterns: Dict[str, List[str]]):
+        self._trie: Dict = {}
+        self.max_len = 1
+        for key, spellings in patterns.items():
+            for spelling in spellings:
+                tokens = tokenize(spelling)
+                if not tokens:
+                    continue
+                node = self._trie
+                for token in tokens:
+                    node = node.setdefault(token, {})
+                node.setdefault(None, set()).add(key)
+                self.max_len = max(self.max_len, len(tokens))
+
+    def count(self, tokens: List[str]) -> Counter:
+        counts = Counter()
+        for i in range(len(tokens)):
+            node = self._trie
+            for token in tokens[i:i + self.max_len]:
+                node = node.get(token)
+                if node is None:
+                    break
+                for key in node.get(None, ()):
+                    counts[key] += 1
+        return counts
+
+
+_skill_matcher = PhraseMatcher(SKILLS)
+
+
+def _candidate_phrases(text: str) -> Counter:
+    """n-grams (up to MAX_PHRASE_WORDS) inside runs of content words, RAKE style."""
+    phrases = Counter()
+    for chunk in PHRASE_BREAK.split(text.lower()):
+        run = []
+        for token in TOKEN.findall(chunk) + [""]:
+            if token and token not in STOPWORDS and token not in GENERIC and not token.isdigit() and len(token) > 1:
+                run.append(token)
+                continue
+            for n in range(1, MAX_PHRASE_WORDS + 1):
+                for i in range(len(run) - n + 1):
+                    phrases[" ".join(run[i:i + n])] += 1
+            run = []
+    return phrases
+
+
+@lru_cache(maxsize=64)
+def extract_keywords(jd_text: str) -> Tuple[Tuple[str, float, Tuple[str, ...]], ...]:
+    """
+    Weighted keywords of a job description: (display name, weight, spellings).
+    Dictionary skills always count; other phrases need to be repeated to count.
+    Cached per JD text, so live re-scoring only pays for matching the resume.
+    """
+    jd_tokens = tokenize(jd_text)
+    keywords = {}
+    for skill, hits in _skill_matcher.count(jd_tokens).items():
+        keywords[skill] = (3.0 + min(hits, 3) * 0.5, tuple(SKILLS[skill]))
+
+    covered = {" ".join(tokenize(s)) for spellings in SKILLS.values() for s in spellings}
+    phrases = _candidate_phrases(jd_text)
+    ranked = sorted(phrases.items(), key=lambda p: (-p[1] * len(p[0].split()), p[0]))
+    # Phrases inside a skill the JD already named ("distributed" in "distributed systems") add nothing
+    taken = [" ".join(tokenize(s)) for skill in keywords for s in SKILLS[skill]]
+    for phrase, count in ranked:
+        words = len(phrase.split())
+        if count < 2 or (words == 1 and len(phrase) < 4):
+            continue
+        stemmed = " ".join(tokenize(phrase))
+        if stemmed in covered or any(stemmed in t for t in taken):
+            continue
+        taken.append(stemmed)
+        keywords.setdefault(phrase, (1.0 + 0.5 * (words - 1) + min(count, 4) * 0.25, (phrase,)))
+        if len(keywords) >= MAX_KEYWORDS:
+            break
+
+    ordered = sorted(keywords.items(), key=lambda k: -k[1][0])[:MAX_KEYWORDS]
+    return tuple((name, weight, spellings) for name, (weight, spellings) in ordered)
+
+
+def keyword_matcher(keywords) -> PhraseMatcher:
+    return PhraseMatcher({name: list(spellings) for name, _, spellings in keywords})
+
+
+def _role_phrase(jd_text: str) -> Tuple[str, ...]:
+    """The job title, taken as the first '<word> engineer'-style bigram in the posting."""
+    tokens = TOKEN.findall(jd_text.lower())
+    for i, token in enumerate(tokens):
+        if _stem(token) in ROLE_WORDS:
+            return tuple(tokens[max(0, i - 1):i + 1])
+    return ()
+
+
+def _section_text(tex: str, needle: str) -> str:
+    index = index_cache.get(tex)
+    return " ".join(tex[s["start"]:s["end"]] for s in index["sections"] if needle in s["title"].lower())
+
+
+def score_resume(resume: str, jd_text: str) -> Dict:
+    """
+    Scores a resume (LaTeX or plain text) against a job description without an LLM.
+    Returns a dict in the shape of AnalysisResult.
+    """
+    is_latex = "\\begin{document}" in resume or "\\section" in resume
+    text = strip_latex(resume) if is_latex else resume
+    tokens = tokenize(text)
+
+    keywords = extract_keywords(jd_text)
+    matcher = keyword_matcher(keywords)
+    counts = matcher.count(tokens)
+    weights = {name: weight for name, weight, _ in keywords}
+    matched = [name for name, _, _ in keywords if counts[name]]
+    missing = [name for name, _, _ in keywords if not counts[name]]
+
+    total_weight = sum(weights.values()) or 1.0
+    coverage = sum(weights[k] for k in matched) / total_weight
+    skills = [k for k in weights if k in SKILLS]
+    deep = [k for k in skills if counts[k] >= 2]
+    depth = len(deep) / len(skills) if skills else coverage
+
+    role = _role_phrase(jd_text)
+    resume_tokens = set(tokens)
+    if role and " ".join(_stem(t) for t in role) in " ".join(tokens):
+        role_score = 1.0
+    elif role and _stem(role[-1]) in resume_tokens:
+        role_score = 0.6
+    else:
+        role_score = 0.2 if role else 0.5
+
+    experience = strip_latex(_section_text(resume, "experience")) if is_latex else ""
+    if experience:
+        experience_counts = matcher.count(tokenize(experience))
+        experience_score = sum(weights[k] for k in matched if experience_counts[k]) / total_weight
+    else:
+        experience_score = coverage
+
+    jd_degrees = [d for d, spellings in DEGREES.items() if PhraseMatcher({d: spellings}).count(tokenize(jd_text))]
+    if jd_degrees:
+        resume_degrees = PhraseMatcher({d: DEGREES[d] for d in jd_degrees}).count(tokens)
+        education_score = len(resume_degrees) / len(jd_degrees)
+    else:
+        education_score = 1.0
+
+    if is_latex:
+        diagnostics = LatexValidator().validate(resume, autofix=False)["diagnostics"]
+        errors = sum(1 for d in diagnostics if d["severity"] == "error")
+        parsing_score = max(0.0, 1.0 - 0.3 * errors)
+    else:
+        errors, parsing_score = 0, 1.0
+
+    parts = {
+        "keyword_match": coverage,
+        "skill_depth": depth,
+        "role_fit": role_score,
+        "experience_relevance": experience_score,
+        "education_fit": education_score,
+        "parsing_quality": parsing_score,
+    }
+    points = {k: round(WEIGHTS[k] * v, 1) for k, v in parts.items()}
+
+    return {
+        "ats_score": max(0, min(100, round(sum(points.values())))),
+        "missing_keywords": missing,
+        "matched_keywords": matched,
+        "justification": {
+            "keyword_match": f"{len(matched)}/{len(keywords)} job keywords found ({points['keyword_match']}/{WEIGHTS['keyword_match']}).",
+            "skill_depth": f"{len(deep)}/{len(skills)} required skills appear more than once ({points['skill_depth']}/{WEIGHTS['skill_depth']}).",
+            "role_fit": f"Role '{' '.join(role) or 'n/a'}' {'found' if role_score == 1.0 else 'partly found' if role_score == 0.6 else 'not found'} in the resume ({points['role_fit']}/{WEIGHTS['role_fit']}).",
+            "experience_relevance": f"Keywords backed by the Experience section: {round(experience_score * 100)}% of weight ({points['experience_relevance']}/{WEIGHTS['experience_relevance']}).",
+            "education_fit": f"Degree requirements met: {', '.join(jd_degrees) or 'none stated'} ({points['education_fit']}/{WEIGHTS['education_fit']}).",
+            "parsing_quality": f"{errors} LaTeX structure error(s) ({points['parsing_quality']}/{WEIGHTS['parsing_quality']}).",
+        },
+        "scorer": "local",
+    }
+
+
+def _keyword_patterns(keyword: str) -> List[str]:
+    # LLM keywords are free text; a known skill also matches its other spellings
+    for skill, spellings in SKILLS.items():
+        if keyword.lower() == skill.lower() or keyword.lower() in spellings:
+            return [keyword] + spellings
+    return [keyword]
+
+
+def rescore_incremental(previous: Dict, previous_tex: str, new_tex: str, threshold: float = INCREMENTAL_RESCORE_THRESHOLD):
+    """
+    Updates a previous analysis (LLM or local) after an edit, rechecking only the keywords
+    whose text the edit touched. Returns None when the edit changed more than `threshold`
+    of the resume text, or when there is nothing to update from; the caller re-analyzes fully.
+    Also None once the chain of incremental results since the last full analysis reaches
+    INCREMENTAL_RESCORE_MAX_STEPS or INCREMENTAL_RESCORE_MAX_DRIFT, so errors can't accumulate.
+    """
+    if not previous or not previous.get("matched_keywords") and not previous.get("missing_keywords"):
+        return None
+    chain = previous.get("rescore") or {}
+    steps = chain.get("steps", 0) + 1
+    if steps > INCREMENTAL_RESCORE_MAX_STEPS:
+        return None
+
+    old_lines = strip_latex(previous_tex).splitlines()
+    new_lines = strip_latex(new_tex).splitlines()
+    removed, added = [], []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False).get_opcodes():
+        if tag != "equal":
+            removed.extend(old_lines[i1:i2])
+            added.extend(new_lines[j1:j2])
+    changed = sum(len(l) for l in removed) + sum(len(l) for l in added)
+    change_ratio = changed / max(1, sum(len(l) for l in old_lines))
+    drift = chain.get("drift", 0.0) + change_ratio
+    if change_ratio > threshold or drift > INCREMENTAL_RESCORE_MAX_DRIFT:
+        return None
+
+    matched = list(previous.get("matched_keywords", []))
+    missing = list(previous.get("missing_keywords", []))
+    matcher = PhraseMatcher({k: _keyword_patterns(k) for k in matched + missing})
+    touched = set(matcher.count(tokenize("\n".join(removed)))) | set(matcher.count(tokenize("\n".join(added))))
+
+    promoted, demoted = [], []
+    if touched:
+        old_counts = matcher.count(tokenize("\n".join(old_lines)))
+        new_counts = matcher.count(tokenize("\n".join(new_lines)))
+        for keyword in touched:
+            if keyword in missing and new_counts[keyword] > old_counts[keyword]:
+                promoted.append(keyword)
+            elif keyword in matched and old_counts[keyword] and not new_counts[keyword]:
+                # Only literal mentions can be taken away; semantic matches stay matched
+                demoted.append(keyword)
+
+    total = len(matched) + len(missing)
+    delta = WEIGHTS["keyword_match"] * (len(promoted) - len(demoted)) / total
+    justification = dict(previous.get("justification") or {})
+    if promoted or demoted:
+        note = f" Updated after edit: +{len(promoted)} / -{len(demoted)} keywords."
+        justification["keyword_match"] = justification.get("keyword_match", "") + note
+
+    return {
+        "ats_score": max(0, min(100, round(previous.get("ats_score", 0) + delta))),
+        "missing_keywords": [k for k in missing if k not in promoted] + demoted,
+        "matched_keywords": [k for k in matched if k not in demoted] + promoted,
+        "justification": justification,
+        "scorer": "incremental",
+        "rescore": {
+            "change_ratio": round(change_ratio, 4),
+            # Since the last full analysis
+            "steps": steps,
+            "drift": round(drift, 4),
+            "rechecked": sorted(touched),
+            "promoted": promoted,
+            "demoted": demoted,
+        },
+    }
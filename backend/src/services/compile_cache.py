@@ -0,0 +1,162 @@
+import os
+import time
+import shutil
+import hashlib
+import pathlib
+import subprocess
+import threading
+from typing import Optional
+
+# Cache Configuration
+# Entries live on the shared data volume so the API and the worker reuse each other's PDFs.
+DEFAULT_MAX_BYTES = int(os.getenv("COMPILE_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Full size scan at most this often; in between, stores add to a running estimate
+EVICT_SCAN_SECONDS = int(os.getenv("COMPILE_CACHE_SCAN_SECONDS", "300"))
+
+_toolchain_version = None
+_toolchain_lock = threading.Lock()
+
+
+def get_toolchain_version() -> str:
+    """
+    Returns the first line of `pdflatex --version` (resolved once per process).
+    Part of every cache key so a TeX Live upgrade never serves stale artifacts.
+    """
+    global _toolchain_version
+    if _toolchain_version is None:
+        with _toolchain_lock:
+            if _toolchain_version is None:
+                try:
+                    result = subprocess.run(
+                        ["pdflatex", "--version"],
+                        stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=10
+                    )
+                    lines = result.stdout.decode("utf-8", errors="ignore").splitlines()
+                    _toolchain_version = lines[0].strip() if lines else "unknown"
+                except Exception:
+                    _toolchain_version = "unknown"
+    return _toolchain_version
+
+
+class CompileCache:
+    """
+    Content-addressed store of compiled artifacts.
+
+    Layout: {root}/{key[:2]}/{key}/output.pdf + output.log
+    The entry directory mtime is the LRU clock: it is bumped on every hit,
+    and the oldest entries are evicted once the cache grows past max_bytes.
+    The tree is only walked when the running size estimate passes max_bytes, or every
+    EVICT_SCAN_SECONDS to pick up what other processes stored.
+    """
+
+    # Process-wide counters (shared by every CompileCache instance)
+    stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+    _stats_lock = threading.Lock()
+    # Per cache root: estimated bytes on disk (None until the first scan) and last scan time
+    _usage = {}
+
+    def __init__(self, root: pathlib.Path, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = pathlib.Path(root)
+        self.max_bytes = max_bytes
+
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def make_key(self, tex_content: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(get_toolchain_version().encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(tex_content.encode("utf-8"))
+        return digest.hexdigest()
+
+    def _entry_dir(self, key: str) -> pathlib.Path:
+        return self.root / key[:2] / key
+
+    def lookup(self, key: str) -> Optional[pathlib.Path]:
+        entry = self._entry_dir(key)
+        if (entry / "output.pdf").exists():
+            try:
+                os.utime(entry)  # Mark as recently used
+            except OSError:
+                pass
+            self._count("hits")
+            return entry
+        self._count("misses")
+        return None
+
+    def store(self, key: str, pdf_file: pathlib.Path, log_file: pathlib.Path):
+        entry = self._entry_dir(key)
+        if entry.exists():
+            return
+        entry.parent.mkdir(parents=True, exist_ok=True)
+
+        # Build the entry in a private directory and rename it into place,
+        # so concurrent readers never see a half-written entry.
+        staging = entry.parent / f".{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            staging.mkdir()
+            # Copy: the compile ran in scratch space, usually on another filesystem
+            shutil.copyfile(pdf_file, staging / "output.pdf")
+            if log_file.exists():
+                shutil.copyfile(log_file, staging / "output.log")
+            size = sum(f.stat().st_size for f in staging.iterdir())
+            os.rename(staging, entry)
+            self._count("stores")
+        except OSError:
+            # Another process stored the same key first
+            shutil.rmtree(staging, ignore_errors=True)
+            return
+
+        with self._stats_lock:
+            usage = self._usage.setdefault(str(self.root), {"bytes": None, "scanned_at": 0.0})
+            if usage["bytes"] is not None:
+                usage["bytes"] += size
+            due = (
+                usage["bytes"] is None
+                or usage["bytes"] > self.max_bytes
+                or time.monotonic() - usage["scanned_at"] >= EVICT_SCAN_SECONDS
+            )
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Removes least-recently-used entries until the cache fits in max_bytes."""
+        if not self.root.exists():
+            return
+
+        entries = []
+        total = 0
+        for shard in self.root.iterdir():
+            if not shard.is_dir():
+                continue
+            for entry in shard.iterdir():
+                if not entry.is_dir() or entry.name.startswith("."):
+                    continue
+                try:
+                    size = sum(f.stat().st_size for f in entry.iterdir())
+                    entries.append((entry.stat().st_mtime, size, entry))
+                    total += size
+                except OSError:
+                    continue
+
+        if total > self.max_bytes:
+            entries.sort(key=lambda e: e[0])
+            for _, size, entry in entries:
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
+                self._count("evictions")
+
+        with self._stats_lock:
+            self._usage[str(self.root)] = {"bytes": total, "scanned_at": time.monotonic()}
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            snapshot = dict(self.stats)
+        lookups = snapshot["hits"] + snapshot["misses"]
+        snapshot["hit_rate"] = round(snapshot["hits"] / lookups, 4) if lookups else 0.0
+        snapshot["max_bytes"] = self.max_bytes
+        snapshot["toolchain"] = get_toolchain_version()
+        return snapshot
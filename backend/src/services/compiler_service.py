@@ -1,13 +1,137 @@
 import os
-import subprocess
+import gzip
+import time
+import shutil
+import asyncio
+import threading
 import pathlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 from fastapi import HTTPException
+from src.services.compile_cache import CompileCache
+from src.services.format_cache import FormatCache, is_format_failure
+from src.services.pdflatex_runner import run_pdflatex, format_error, source_excerpt
+from src.services.latex_validator import LatexValidator, format_diagnostics
+
+# Async Compile Limits (per API process)
+COMPILE_CONCURRENCY = int(os.getenv("COMPILE_CONCURRENCY", str(os.cpu_count() or 2)))
+
+_compile_semaphore = None
+_queue_stats = {
+    "limit": COMPILE_CONCURRENCY,
+    "waiting": 0,
+    "running": 0,
+    "completed": 0,
+    "total_wait_seconds": 0.0,
+    "max_wait_seconds": 0.0,
+}
+
+# Scratch Compilation
+# pdflatex runs in a RAM-backed directory; only final artifacts are published to the data volume.
+COMPILE_SCRATCH_DIR = os.getenv(
+    "COMPILE_SCRATCH_DIR",
+    "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+)
+COMPILE_LOG_COMPRESS = os.getenv("COMPILE_LOG_COMPRESS", "0") == "1"
+AUX_SUFFIXES = (".aux", ".out", ".toc", ".fls", ".fdb_latexmk", ".synctex.gz")
+
+# Batch Compile Pool (separate processes, so pdflatex supervision doesn't contend for the GIL)
+COMPILE_POOL_SIZE = int(os.getenv("COMPILE_POOL_SIZE", str(os.cpu_count() or 2)))
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+def _get_batch_pool() -> ProcessPoolExecutor:
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            # spawn: forking a threaded uvicorn/celery process is not safe
+            _batch_pool = ProcessPoolExecutor(
+                max_workers=COMPILE_POOL_SIZE,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _batch_pool
+
+def _reset_batch_pool(broken: ProcessPoolExecutor):
+    """Drops a broken pool so the next batch starts a fresh one (once, however many batches saw it break)."""
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is not broken:
+            return
+        _batch_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def _compile_batch_item(output_base: str, user_id: str, item: dict) -> dict:
+    # Runs inside a pool process
+    service = CompilerService(output_base)
+    return service.compile_resume(
+        user_id,
+        item["latex_code"],
+        item["output_filename"],
+        workflow_id=item["workflow_id"],
+        version=item["version"]
+    )
 
 class CompilerService:
     def __init__(self, output_dir: str = "/app/data"):
         self.output_base = pathlib.Path(output_dir)
+        self.cache = CompileCache(self.output_base / ".cache" / "compile")
+        self.formats = FormatCache(self.output_base / ".cache" / "formats")
+        self.validator = LatexValidator()
+
+    def _run_pdflatex(self, tex_file: pathlib.Path, output_dir: pathlib.Path, fmt: str = None):
+        cmd = [
+            "pdflatex",
+            "-interaction=nonstopmode",
+            "-output-directory", str(output_dir),
+            str(tex_file)
+        ]
+        env = None
+        if fmt:
+            # Precompiled preamble: the document's own preamble is skipped up to \begin{document}
+            cmd.insert(1, f"-fmt={fmt}")
+            env = self.formats.env()
+        return run_pdflatex(cmd, timeout=30, env=env)
+
+    def _publish(self, target: pathlib.Path, source: pathlib.Path = None, content: str = None, compress: bool = False, link: bool = False):
+        """
+        Atomically places an artifact at target: write/copy/link to a hidden temp name
+        in the same directory, then rename over the old file. Readers (downloads) see
+        either the previous complete file or the new complete file, never a partial one.
+        """
+        staging = target.parent / f".{target.name}.{os.getpid()}.{time.monotonic_ns()}.tmp"
+        try:
+            if content is not None:
+                with open(staging, "w", encoding="utf-8") as f:
+                    f.write(content)
+            elif compress:
+                with open(source, "rb") as src, gzip.open(staging, "wb", compresslevel=6) as dst:
+                    shutil.copyfileobj(src, dst)
+            elif link:
+                try:
+                    os.link(source, staging)
+                except OSError:
+                    shutil.copyfile(source, staging)
+            else:
+                shutil.copyfile(source, staging)
+            os.replace(staging, target)
+        finally:
+            if staging.exists():
+                staging.unlink()
 
-    def compile_resume(self, user_id: str, tex_content: str, filename_base: str, workflow_id: str = None, version: str = None):
+    def _publish_log(self, source: pathlib.Path, log_file: pathlib.Path, link: bool = False) -> pathlib.Path:
+        if not source.exists():
+            return log_file
+        if COMPILE_LOG_COMPRESS:
+            target = log_file.with_name(log_file.name + ".gz")
+            self._publish(target, source=source, compress=True)
+            return target
+        self._publish(log_file, source=source, link=link)
+        return log_file
+
+    def compile_resume(self, user_id: str, tex_content: str, filename_base: str, workflow_id: str = None, version: str = None, preflight: bool = True, scratch_root: str = None):
         # Determine paths
         # Architecture Change: If workflow_id provided, use structured path:
         # /app/data/users/{user_id}/output/{workflow_id}/{version}/
@@ -24,47 +148,197 @@ class CompilerService:
         pdf_file = output_dir / f"{filename_base}.pdf"
         log_file = output_dir / f"{filename_base}.log"
         
+        # Pre-flight: apply safe fixes and catch structurally broken LaTeX without spawning pdflatex
+        report = None
+        if preflight:
+            validation = self.validator.validate(tex_content)
+            tex_content = validation["fixed_tex"]
+            report = {"valid": validation["valid"], "diagnostics": validation["diagnostics"], "fixes": validation["fixes"]}
+
         # Write .tex file
-        with open(tex_file, "w", encoding="utf-8") as f:
-            f.write(tex_content)
+        self._publish(tex_file, content=tex_content)
+
+        # Leftovers from compiles that ran directly in the output folder
+        for suffix in AUX_SUFFIXES:
+            stale = output_dir / f"{filename_base}{suffix}"
+            if stale.exists():
+                stale.unlink()
+
+        if report and not report["valid"]:
+            errors = [d for d in report["diagnostics"] if d["severity"] == "error"]
+            first = errors[0]
+            return {
+                "success": False,
+                "error": format_diagnostics(errors),
+                "error_details": {
+                    "type": "preflight",
+                    "message": first["message"],
+                    "line": first["line"],
+                    "context": None,
+                    "source_excerpt": source_excerpt(tex_content, first["line"])
+                },
+                "preflight": report,
+                "output_filename": filename_base
+            }
+
+        # Cache Lookup: identical source + toolchain -> reuse the stored PDF/log
+        cache_key = self.cache.make_key(tex_content)
+        cached_entry = self.cache.lookup(cache_key)
+        if cached_entry:
+            try:
+                self._publish(pdf_file, source=cached_entry / "output.pdf", link=True)
+                published_log = self._publish_log(cached_entry / "output.log", log_file, link=True)
+                return {
+                    "success": True,
+                    "pdf_path": str(pdf_file),
+                    "tex_path": str(tex_file),
+                    "log_path": str(published_log),
+                    "output_filename": filename_base,
+                    "cached": True,
+                    "preflight": report
+                }
+            except OSError:
+                pass  # Evicted between lookup and publish: compile it after all
             
         # Compile
-        # We run pdflatex twice for proper formatting sometimes
-        # We also capture all auxiliary files in the same dir
-        cmd = [
-            "pdflatex",
-            "-interaction=nonstopmode",
-            "-output-directory", str(output_dir),
-            str(tex_file)
-        ]
-        
+        # pdflatex runs in a private scratch directory (tmpfs when available). The .aux/.out churn
+        # never reaches the data volume and only the pdf/log are published once complete.
+        work_dir = pathlib.Path(tempfile.mkdtemp(prefix="compile_", dir=scratch_root or COMPILE_SCRATCH_DIR))
+        work_tex = work_dir / tex_file.name
+        work_pdf = work_dir / pdf_file.name
+        work_log = work_dir / log_file.name
         try:
+            with open(work_tex, "w", encoding="utf-8") as f:
+                f.write(tex_content)
+
+            fmt = self.formats.get_format(tex_content)
+
             # First pass
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=30)
-            
+            result = self._run_pdflatex(work_tex, work_dir, fmt)
+
             # Simple check, if simple resume one pass might be enough. 
             # If complex referencing, might need second pass. For now, doing one pass for speed unless requested.
+
+            if result["returncode"] != 0 and fmt and is_format_failure(result["output"]):
+                # The format couldn't be loaded (stale, corrupt, other TeX build): compile the regular way.
+                # A document error is reported as is; it would fail the same way without the format.
+                result = self._run_pdflatex(work_tex, work_dir)
+                self.formats.mark_failed(fmt)
+
+            published_log = self._publish_log(work_log, log_file)
             
-            if result.returncode != 0:
+            if result["returncode"] != 0:
                 # Capture log content for debugging
                 log_content = ""
-                if log_file.exists():
-                    with open(log_file, "r", encoding="utf-8", errors="ignore") as f:
+                if work_log.exists():
+                    with open(work_log, "r", encoding="utf-8", errors="ignore") as f:
                         log_content = f.read()[-2000:] # Last 2000 chars
                 
+                # A PDF from an earlier compile would no longer match the published .tex
+                if pdf_file.exists():
+                    pdf_file.unlink()
+
+                error = result["error"]
+                if error:
+                    error["source_excerpt"] = source_excerpt(tex_content, error["line"])
+                
                 return {
                     "success": False, 
-                    "error": result.stdout.decode('utf-8', errors='ignore')[-500:],
+                    "error": format_error(error) if error else result["output"][-500:],
+                    "error_details": error,
                     "log_tail": log_content,
+                    "preflight": report,
                     "output_filename": filename_base
                 }
+
+            if work_pdf.exists():
+                self.cache.store(cache_key, work_pdf, work_log)
+                self._publish(pdf_file, source=work_pdf)
                 
             return {
                 "success": True, 
                 "pdf_path": str(pdf_file),
                 "tex_path": str(tex_file),
-                "log_path": str(log_file),
-                "output_filename": filename_base
+                "log_path": str(published_log),
+                "output_filename": filename_base,
+                "cached": False,
+                "preflight": report
             }
         except Exception as e:
              return {"success": False, "error": str(e), "output_filename": filename_base}
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def compile_batch(self, user_id: str, items: list[dict]):
+        """
+        Compiles many (workflow_id, version, latex_code, output_filename) items in parallel
+        on the process pool, each in its own scratch directory.
+        Yields one result per item, in completion order, as soon as it is done.
+        """
+        pool = _get_batch_pool()
+        futures = {
+            pool.submit(_compile_batch_item, str(self.output_base), user_id, item): index
+            for index, item in enumerate(items)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            item = items[index]
+            try:
+                compile_result = future.result()
+            except BrokenProcessPool as e:
+                # A pool process died; start a fresh pool for the next batch
+                _reset_batch_pool(pool)
+                compile_result = {"success": False, "error": str(e), "output_filename": item["output_filename"]}
+            except Exception as e:
+                compile_result = {"success": False, "error": str(e), "output_filename": item["output_filename"]}
+            yield {
+                "index": index,
+                "workflow_id": item["workflow_id"],
+                "version": item["version"],
+                "compilation": compile_result
+            }
+
+    def get_cache_stats(self) -> dict:
+        return self.cache.get_stats()
+
+    async def compile_resume_async(self, user_id: str, tex_content: str, filename_base: str, workflow_id: str = None, version: str = None):
+        """
+        Awaitable compile_resume for the API process.
+        pdflatex runs on a worker thread, so the event loop keeps serving other requests,
+        and at most COMPILE_CONCURRENCY compiles run at once; the rest queue on the semaphore.
+        """
+        global _compile_semaphore
+        if _compile_semaphore is None:
+            _compile_semaphore = asyncio.Semaphore(COMPILE_CONCURRENCY)
+
+        queued_at = time.monotonic()
+        _queue_stats["waiting"] += 1
+        acquired = False
+        try:
+            async with _compile_semaphore:
+                acquired = True
+                wait = time.monotonic() - queued_at
+                _queue_stats["waiting"] -= 1
+                _queue_stats["running"] += 1
+                _queue_stats["total_wait_seconds"] += wait
+                _queue_stats["max_wait_seconds"] = max(_queue_stats["max_wait_seconds"], wait)
+                try:
+                    result = await asyncio.to_thread(
+                        self.compile_resume, user_id, tex_content, filename_base, workflow_id, version
+                    )
+                finally:
+                    _queue_stats["running"] -= 1
+                    _queue_stats["completed"] += 1
+        finally:
+            if not acquired:
+                # Cancelled (client went away) while still queued
+                _queue_stats["waiting"] -= 1
+
+        result["queue_wait_seconds"] = round(wait, 4)
+        return result
+
+    def get_queue_stats(self) -> dict:
+        snapshot = dict(_queue_stats)
+        completed = snapshot["completed"]
+        snapshot["avg_wait_seconds"] = round(snapshot["total_wait_seconds"] / completed, 4) if completed else 0.0
+        return snapshot
@@ -28,6 +28,7 @@ class UserConfig(Base):
     user_id = Column(String, primary_key=True, index=True)
     selected_llm_id = Column(String, nullable=True)
     prompts = Column(JSON, default={})
+    routing = Column(JSON, default={}) # {"hedging": bool, "secondary_llm_id": str}
 
 class LLMInventoryItem(Base):
     __tablename__ = "llm_inventory"
@@ -41,9 +42,24 @@ class LLMInventoryItem(Base):
     api_key = Column(String)
     plan_type = Column(String)
     
+_columns_checked = False
+
+def _add_missing_columns():
+    # create_all() doesn't alter existing tables; columns added after first deploy go here
+    global _columns_checked
+    if _columns_checked:
+        return
+    from sqlalchemy import inspect, text
+    existing = {c["name"] for c in inspect(engine).get_columns("user_configs")}
+    if "routing" not in existing:
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE user_configs ADD COLUMN routing JSON"))
+    _columns_checked = True
+
 class DatabaseService:
     def __init__(self):
         Base.metadata.create_all(bind=engine)
+        _add_missing_columns()
         self.db = SessionLocal()
 
     def get_config(self, user_id: str):
@@ -151,6 +167,7 @@ old_resume_code (LaTeX): {resume_text}"""
         return {
             "selected_llm_id": config.selected_llm_id,
             "prompts": config.prompts,
+            "routing": config.routing or {},
             "llm_inventory": inventory_list
         }
 
@@ -165,6 +182,9 @@ old_resume_code (LaTeX): {resume_text}"""
         
         if "prompts" in new_config:
             config.prompts = new_config["prompts"]
+
+        if "routing" in new_config:
+            config.routing = new_config["routing"]
             
         if "llm_inventory" in new_config:
             # Full sync strategy: Delete all for user and re-add
@@ -0,0 +1,82 @@
+import os
+import asyncio
+import threading
+from typing import Optional
+
+# Process-wide asyncio loop for sync code (Celery tasks).
+# The loop runs forever in a daemon thread; tasks submit coroutines to it. Because the loop
+# outlives individual tasks, async HTTP clients created on it (and their keep-alive
+# connections) can be reused by later tasks instead of being torn down with a per-task loop.
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_thread: Optional[threading.Thread] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
+
+
+def start_loop() -> asyncio.AbstractEventLoop:
+    """Starts this process's loop (idempotent). Safe to call again after a fork."""
+    global _loop, _loop_thread, _loop_pid
+    with _loop_lock:
+        if _loop is not None and _loop_pid == os.getpid() and _loop_thread.is_alive():
+            return _loop
+
+        # A loop inherited through fork has no running thread in this process
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+
+        def _run():
+            asyncio.set_event_loop(loop)
+            loop.call_soon(ready.set)
+            loop.run_forever()
+
+        thread = threading.Thread(target=_run, name="worker-event-loop", daemon=True)
+        thread.start()
+        ready.wait()
+
+        _loop, _loop_thread, _loop_pid = loop, thread, os.getpid()
+        return loop
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    return start_loop()
+
+
+def run_async(coro, timeout: Optional[float] = None):
+    """
+    Runs a coroutine on the process loop and blocks the calling thread until it finishes.
+    Several threads (Celery threads pool) may call this at once; their coroutines interleave
+    on the one loop.
+    """
+    loop = get_loop()
+    if threading.current_thread() is _loop_thread:
+        raise RuntimeError("run_async() called from the event loop thread; await the coroutine instead")
+    future = asyncio.run_coroutine_threadsafe(coro, loop)
+    return future.result(timeout)
+
+
+def stop_loop(timeout: float = 5.0):
+    """Cancels pending work and stops the loop (worker shutdown)."""
+    global _loop, _loop_thread, _loop_pid
+    with _loop_lock:
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = _loop_thread = _loop_pid = None
+            return
+        loop, thread = _loop, _loop_thread
+        _loop = _loop_thread = _loop_pid = None
+
+    async def _shutdown():
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await loop.shutdown_asyncgens()
+
+    try:
+        asyncio.run_coroutine_threadsafe(_shutdown(), loop).result(timeout)
+    except Exception as e:
+        print(f"[WARN] Event loop shutdown incomplete: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout)
+    if not loop.is_running():
+        loop.close()
@@ -0,0 +1,158 @@
+import os
+import re
+import hashlib
+import pathlib
+import subprocess
+import time
+from typing import Optional
+from src.services.compile_cache import get_toolchain_version
+
+BEGIN_DOCUMENT = "\\begin{document}"
+
+# Disable with PRECOMPILED_FORMATS=0 (e.g. when mylatexformat is not installed)
+FORMATS_ENABLED = os.getenv("PRECOMPILED_FORMATS", "1") != "0"
+# A preamble whose format failed is compiled the regular way until its marker is this old
+FORMAT_RETRY_SECONDS = int(os.getenv("FORMAT_RETRY_SECONDS", "3600"))
+
+# pdflatex output when the format itself can't be used (missing, stale, other TeX build)
+FORMAT_FAILURE = re.compile(
+    r"can't find the format file|Fatal format file error|format file .* made by different|"
+    r"\.fmt was written by|\.fmt.*(?:not found|corrupt)|I'm stymied",
+    re.I
+)
+
+
+def split_preamble(tex_content: str) -> Optional[str]:
+    """
+    Returns everything before \\begin{document}, or None if the source has no body marker.
+    """
+    idx = tex_content.find(BEGIN_DOCUMENT)
+    if idx == -1:
+        return None
+    return tex_content[:idx]
+
+
+def is_format_failure(output: str) -> bool:
+    """True when a -fmt run failed because of the format, not because of the document."""
+    return bool(FORMAT_FAILURE.search(output or ""))
+
+
+class FormatCache:
+    """
+    Precompiled pdflatex formats (.fmt) for resume preambles.
+
+    Each distinct preamble is dumped once with mylatexformat into {root}/pre_<hash>.fmt.
+    Documents compiled with that format skip their own preamble, so package loading
+    (most of a one-page resume compile) is paid only once per preamble.
+    The hash covers the preamble and the TeX toolchain version, so a template edit
+    or a TeX Live upgrade naturally produces a fresh format.
+    A preamble whose format failed gets a .failed marker and is retried once the marker
+    is FORMAT_RETRY_SECONDS old, so a transient failure doesn't disable it for good.
+    """
+
+    def __init__(self, root: pathlib.Path):
+        self.root = pathlib.Path(root)
+
+    def format_name(self, preamble: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(get_toolchain_version().encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(preamble.encode("utf-8"))
+        return f"pre_{digest.hexdigest()[:24]}"
+
+    def env(self) -> dict:
+        # Trailing separator keeps the default kpathsea search path (needed for &pdflatex itself)
+        env = dict(os.environ)
+        env["TEXFORMATS"] = f"{self.root}{os.pathsep}"
+        return env
+
+    def get_format(self, tex_content: str) -> Optional[str]:
+        """
+        Returns the format name to pass as -fmt, building it on first use.
+        Returns None whenever the document must be compiled the regular way.
+        """
+        if not FORMATS_ENABLED:
+            return None
+
+        preamble = split_preamble(tex_content)
+        if not preamble or not preamble.strip():
+            return None
+
+        name = self.format_name(preamble)
+        if (self.root / f"{name}.fmt").exists():
+            return name
+        if self._failed_recently(name):
+            return None
+
+        return name if self._build(name, preamble) else None
+
+    def _failed_recently(self, name: str) -> bool:
+        """True while a .failed marker is fresh; an expired one is removed so the format is retried."""
+        marker = self.root / f"{name}.failed"
+        try:
+            if time.time() - marker.stat().st_mtime < FORMAT_RETRY_SECONDS:
+                return True
+            marker.unlink()
+        except FileNotFoundError:
+            pass
+        return False
+
+    def mark_failed(self, name: str):
+        """Stops using a format that compiles differently from the plain preamble."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / f"{name}.failed").touch()
+        fmt_file = self.root / f"{name}.fmt"
+        if fmt_file.exists():
+            fmt_file.unlink()
+
+    def _build(self, name: str, preamble: str) -> bool:
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        # Only one builder per format across processes; losers compile without it this time
+        lock_file = self.root / f"{name}.lock"
+        if lock_file.exists() and time.time() - lock_file.stat().st_mtime > 120:
+            lock_file.unlink()  # Left behind by a crashed builder
+        try:
+            fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            os.close(fd)
+        except FileExistsError:
+            return False
+
+        # Dump under a temporary job name and rename, so readers never load a partial .fmt
+        build_name = f"{name}_build"
+        try:
+            source = self.root / f"{name}.tex"
+            with open(source, "w", encoding="utf-8") as f:
+                f.write(preamble)
+                f.write(BEGIN_DOCUMENT + "\n\\end{document}\n")
+
+            # pdflatex -ini "&pdflatex" mylatexformat.ltx <file>: dumps the state reached at \begin{document}
+            cmd = [
+                "pdflatex",
+                "-ini",
+                "-interaction=nonstopmode",
+                f"-jobname={build_name}",
+                "&pdflatex",
+                "mylatexformat.ltx",
+                source.name
+            ]
+            result = subprocess.run(
+                cmd, cwd=str(self.root), stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=60
+            )
+
+            built = self.root / f"{build_name}.fmt"
+            if result.returncode != 0 or not built.exists():
+                print(f"[WARN] Format build failed for {name}: {result.stdout.decode('utf-8', errors='ignore')[-500:]}")
+                (self.root / f"{name}.failed").touch()
+                return False
+            os.replace(built, self.root / f"{name}.fmt")
+            return True
+        except Exception as e:
+            print(f"[WARN] Format build failed for {name}: {e}")
+            (self.root / f"{name}.failed").touch()
+            return False
+        finally:
+            for leftover in (f"{name}.tex", f"{build_name}.log", f"{build_name}.fmt", f"{name}.lock"):
+                path = self.root / leftover
+                if path.exists():
+                    path.unlink()
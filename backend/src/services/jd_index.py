@@ -0,0 +1,141 @@
+import os
+import re
+import random
+import struct
+import hashlib
+from typing import Dict, List, Optional
+
+# Job Description Similarity Index
+# MinHash signatures over word shingles, bucketed with LSH in Redis, one index per user.
+# Near-duplicate postings (whitespace, reordered blurbs, tracking junk) land in a shared
+# bucket; candidates are then confirmed by their estimated Jaccard similarity.
+redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
+JD_SIMILARITY_THRESHOLD = float(os.getenv("JD_SIMILARITY_THRESHOLD", "0.8"))
+
+MINHASH_PERMUTATIONS = 128
+LSH_BANDS = 16  # 16 bands x 8 rows: pairs above ~0.7 Jaccard almost always share a bucket
+LSH_ROWS = MINHASH_PERMUTATIONS // LSH_BANDS
+SHINGLE_WORDS = 3
+
+PREFIX = "jd_index:"
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(0x4A44)  # Fixed seed: signatures must be stable across processes and restarts
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME)) for _ in range(MINHASH_PERMUTATIONS)]
+
+URL = re.compile(r"https?://\S+|www\.\S+|\S+@\S+\.\w+")
+WORD = re.compile(r"[a-z0-9+#]+")
+
+_client = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _client
+
+
+def _shingles(text: str) -> set:
+    # URLs / emails carry tracking parameters and ids that differ between pastes
+    words = WORD.findall(URL.sub(" ", text.lower()))
+    if len(words) < SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def signature(text: str) -> Optional[List[int]]:
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles]
+    return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+    """Estimated Jaccard similarity of the two shingle sets."""
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / MINHASH_PERMUTATIONS
+
+
+def _pack(sig: List[int]) -> bytes:
+    return struct.pack(f"<{MINHASH_PERMUTATIONS}Q", *sig)
+
+
+def _unpack(raw: bytes) -> List[int]:
+    return list(struct.unpack(f"<{MINHASH_PERMUTATIONS}Q", raw))
+
+
+def _band_keys(user_id, sig: List[int]) -> List[str]:
+    keys = []
+    for band in range(LSH_BANDS):
+        rows = struct.pack(f"<{LSH_ROWS}Q", *sig[band * LSH_ROWS:(band + 1) * LSH_ROWS])
+        keys.append(f"{PREFIX}{user_id}:band:{band}:{hashlib.sha1(rows).hexdigest()[:16]}")
+    return keys
+
+
+class JobDescriptionIndex:
+    """
+    Per-user near-duplicate lookup for job descriptions, keyed by workflow id.
+    Redis errors are logged and treated as "no match": the index only ever saves work.
+    """
+
+    def add(self, user_id, workflow_id: str, job_description: str, sig: List[int] = None):
+        sig = sig or signature(job_description or "")
+        if sig is None:
+            return
+        try:
+            pipe = _redis().pipeline()
+            pipe.hset(f"{PREFIX}{user_id}:sig", workflow_id, _pack(sig))
+            for key in _band_keys(user_id, sig):
+                pipe.sadd(key, workflow_id)
+            pipe.execute()
+        except Exception as e:
+            print(f"[WARN] Could not index job description for workflow {workflow_id}: {e}")
+
+    def ensure_built(self, user_id, load_workflows):
+        """
+        Backfills the index from the user's stored workflows the first time it is used
+        (or after Redis lost it). load_workflows() returns [(workflow_id, job_description)].
+        """
+        built_key = f"{PREFIX}{user_id}:built"
+        try:
+            if _redis().exists(built_key):
+                return
+        except Exception as e:
+            print(f"[WARN] Job description index unavailable: {e}")
+            return
+        for workflow_id, job_description in load_workflows():
+            self.add(user_id, workflow_id, job_description)
+        try:
+            _redis().set(built_key, 1)
+        except Exception:
+            pass
+
+    def find_similar(self, user_id, job_description: str, limit: int = 5, threshold: float = JD_SIMILARITY_THRESHOLD) -> List[Dict]:
+        """Indexed workflows whose job description is a near-duplicate, most similar first."""
+        sig = signature(job_description or "")
+        if sig is None:
+            return []
+        try:
+            client = _redis()
+            candidates = client.sunion(_band_keys(user_id, sig))
+            if not candidates:
+                return []
+            candidates = [c.decode() for c in candidates]
+            stored = client.hmget(f"{PREFIX}{user_id}:sig", candidates)
+        except Exception as e:
+            print(f"[WARN] Job description lookup failed: {e}")
+            return []
+
+        matches = []
+        for workflow_id, raw in zip(candidates, stored):
+            if raw is None:
+                continue
+            score = similarity(sig, _unpack(raw))
+            if score >= threshold:
+                matches.append({"workflow_id": workflow_id, "similarity": round(score, 3)})
+        matches.sort(key=lambda m: -m["similarity"])
+        return matches[:limit]
+
+
+jd_index = JobDescriptionIndex()
@@ -0,0 +1,169 @@
+import os
+import json
+import time
+import queue
+import threading
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+# Job Event Bus
+# Workers publish progress (LLM tokens, stage transitions, completion) to Redis pub/sub;
+# the API relays them to the browser over SSE. Every event is also appended to a short-lived
+# list so a client that connects late (or reconnects) can replay what it missed.
+redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
+JOB_EVENTS_TTL_SECONDS = int(os.getenv("JOB_EVENTS_TTL_SECONDS", "3600"))
+SSE_HEARTBEAT_SECONDS = 15
+
+TERMINAL_EVENTS = {"done", "error"}
+
+_client = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        import redis
+        # Short timeouts: a slow Redis costs a dropped progress event, never a stuck job
+        _client = redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _client
+
+
+def _channel(job_id: str) -> str:
+    return f"job_events:{job_id}"
+
+
+def publish(job_id: str, event: str, data: dict = None):
+    """Publishes one event for a job. Never raises: progress events must not fail a job."""
+    try:
+        client = _redis()
+        channel = _channel(job_id)
+        seq = client.incr(f"{channel}:seq")
+        message = json.dumps({"seq": seq, "event": event, "data": data or {}, "ts": time.time()})
+        pipe = client.pipeline()
+        pipe.rpush(f"{channel}:log", message)
+        pipe.expire(f"{channel}:log", JOB_EVENTS_TTL_SECONDS)
+        pipe.expire(f"{channel}:seq", JOB_EVENTS_TTL_SECONDS)
+        pipe.publish(channel, message)
+        pipe.execute()
+    except Exception as e:
+        print(f"[WARN] Could not publish {event} for job {job_id}: {e}")
+
+
+class TokenRelay:
+    """
+    on_token callback for streaming LLM calls.
+    Batches deltas so Redis sees a handful of messages per second, not one per token.
+
+    on_token runs on the worker's shared event loop, so batches are only queued there; one
+    publisher thread per relay sends them in order. close() sends the rest and waits for it.
+    """
+
+    def __init__(self, job_id: str, flush_chars: int = 48, flush_seconds: float = 0.1):
+        self.job_id = job_id
+        self.flush_chars = flush_chars
+        self.flush_seconds = flush_seconds
+        self._buffer = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+        self._outbox = queue.Queue()
+        self._publisher = None
+
+    def _drain(self):
+        while True:
+            text = self._outbox.get()
+            if text is None:
+                return
+            publish(self.job_id, "token", {"text": text})
+
+    def __call__(self, delta: str):
+        if not delta:
+            return
+        self._buffer.append(delta)
+        self._size += len(delta)
+        if self._size >= self.flush_chars or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            if self._publisher is None:
+                self._publisher = threading.Thread(target=self._drain, name=f"token-relay-{self.job_id}", daemon=True)
+                self._publisher.start()
+            self._outbox.put("".join(self._buffer))
+        self._buffer = []
+        self._size = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        """Flushes and blocks until every token is published. Call from the task thread, not the loop."""
+        self.flush()
+        if self._publisher is not None:
+            self._outbox.put(None)
+            self._publisher.join()
+            self._publisher = None
+
+
+async def stream_events(
+    job_id: str,
+    last_seq: int = 0,
+    finished: Callable[[], Awaitable[Optional[dict]]] = None
+) -> AsyncIterator[Optional[dict]]:
+    """
+    Yields events for a job in order, starting after last_seq, until a terminal event.
+    Yields None when idle for SSE_HEARTBEAT_SECONDS so the caller can send a keep-alive.
+    finished() returns the terminal event for a job that has already ended (from the DB), or
+    None. It is asked when there is nothing to replay and on every idle heartbeat, so a job
+    whose event log expired (or predates it) still ends the stream.
+    """
+    import redis.asyncio as aioredis
+
+    client = aioredis.Redis.from_url(redis_url)
+    pubsub = client.pubsub()
+    channel = _channel(job_id)
+    try:
+        # Subscribe before replaying, so nothing published in between is lost
+        await pubsub.subscribe(channel)
+
+        replay = await client.lrange(f"{channel}:log", 0, -1)
+        if not replay and finished:
+            event = await finished()
+            if event:
+                yield event
+                return
+
+        for raw in replay:
+            event = json.loads(raw)
+            if event["seq"] <= last_seq:
+                continue
+            last_seq = event["seq"]
+            yield event
+            if event["event"] in TERMINAL_EVENTS:
+                return
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=SSE_HEARTBEAT_SECONDS)
+            if message is None:
+                event = await finished() if finished else None
+                if event:
+                    yield event
+                    return
+                yield None
+                continue
+            event = json.loads(message["data"])
+            if event["seq"] <= last_seq:
+                continue  # Already sent during replay
+            last_seq = event["seq"]
+            yield event
+            if event["event"] in TERMINAL_EVENTS:
+                return
+    finally:
+        try:
+            await pubsub.unsubscribe(channel)
+            await pubsub.close()
+            await client.close()
+        except Exception:
+            pass
+
+
+def format_sse(event: Optional[dict]) -> str:
+    if event is None:
+        return ": keep-alive\n\n"
+    return f"id: {event['seq']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
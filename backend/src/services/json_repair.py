@@ -0,0 +1,188 @@
+import re
+import json
+import threading
+from collections import Counter
+from typing import Dict, Tuple
+
+# Tolerant Structured-Output Parsing
+# LLM JSON is usually right but not always: markdown fences, chatter around the object,
+# trailing commas, LaTeX backslashes that aren't valid (or are the wrong) JSON escapes, and
+# tails cut off by the output limit. Each of those used to fail the whole job; here they are
+# repaired locally and only a genuinely truncated reply costs another (continuation) call.
+
+FENCE = re.compile(r"^\s*```[a-zA-Z]*\s*\n?|\n?\s*```\s*$")
+# \b \f \n \r \t followed by letters is almost always a LaTeX command (\textbf, \begin, \frac,
+# \resumeItem); \n only for known commands, since "\nNext line" is a real newline
+LATEX_AFTER_ESCAPE = re.compile(
+    r"[bfrt][a-zA-Z]|n(?:ewline|oindent|ewcommand|ormalsize|ewpage|olinkurl|obreak|eq\b|abla)"
+)
+
+_lock = threading.Lock()
+stats = Counter()
+
+
+class TruncatedJSON(ValueError):
+    """The reply ended inside the JSON object: ask the model to continue."""
+
+
+def _count(*names):
+    with _lock:
+        for name in names:
+            stats[name] += 1
+
+
+def _scan_object(text: str, start: int):
+    """End offset (exclusive) of the JSON value opening at text[start], or None if it never closes."""
+    depth, in_string, escaped = 0, False, False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
+
+
+def _fix_escapes(text: str, repairs: list) -> str:
+    """Doubles backslashes inside strings that are invalid JSON escapes or LaTeX commands."""
+    out, in_string, i = [], False, 0
+    fixed = 0
+    while i < len(text):
+        ch = text[i]
+        if not in_string:
+            in_string = ch == '"'
+            out.append(ch)
+            i += 1
+            continue
+        if ch == '"':
+            in_string = False
+            out.append(ch)
+            i += 1
+            continue
+        if ch != "\\":
+            out.append(ch)
+            i += 1
+            continue
+        nxt = text[i + 1] if i + 1 < len(text) else ""
+        if nxt in '"\\/':
+            out.append(text[i:i + 2])
+            i += 2
+        elif nxt == "u" and re.match(r"[0-9a-fA-F]{4}", text[i + 2:i + 6]):
+            out.append(text[i:i + 6])
+            i += 6
+        elif nxt in "bfnrt" and not LATEX_AFTER_ESCAPE.match(text, i + 1):
+            out.append(text[i:i + 2])
+            i += 2
+        else:
+            out.append("\\\\")
+            fixed += 1
+            i += 1
+    if fixed:
+        repairs.append("latex_escapes")
+    return "".join(out)
+
+
+def _strip_trailing_commas(text: str, repairs: list) -> str:
+    out, in_string, escaped, removed = [], False, False, 0
+    for i, ch in enumerate(text):
+        if in_string:
+            out.append(ch)
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch == ",":
+            rest = text[i + 1:].lstrip()
+            if rest[:1] in ("}", "]"):
+                removed += 1
+                continue
+        out.append(ch)
+    if removed:
+        repairs.append("trailing_commas")
+    return "".join(out)
+
+
+def repair_json(content: str) -> Tuple[str, list]:
+    """
+    Best-effort repair of an LLM JSON reply. Returns (json_text, repairs).
+    Raises TruncatedJSON when the object is cut off, ValueError when there is no object at all.
+    """
+    repairs = []
+    text = content.strip()
+    if text.startswith("```"):
+        text = FENCE.sub("", text)
+        repairs.append("markdown_fence")
+
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("No JSON object in model output")
+    end = _scan_object(text, start)
+    if end is None:
+        raise TruncatedJSON("Model output ends inside the JSON object")
+    if start > 0 or text[end:].strip():
+        repairs.append("surrounding_text")
+    text = text[start:end]
+
+    text = _fix_escapes(text, repairs)
+    text = _strip_trailing_commas(text, repairs)
+    return text, repairs
+
+
+def parse_structured(content: str, result_model) -> Tuple[object, Dict]:
+    """
+    Validates an LLM reply into result_model, repairing it first if needed.
+    Returns (instance, report). Raises TruncatedJSON if only a continuation can help.
+    """
+    try:
+        text, repairs = repair_json(content)
+    except TruncatedJSON:
+        _count("truncated")
+        raise
+    except ValueError:
+        _count("failed")
+        raise
+    try:
+        # strict=False: raw newlines / tabs inside strings are accepted as-is
+        result = result_model.model_validate(json.loads(text, strict=False))
+    except Exception:
+        _count("failed")
+        raise
+    _count("repaired" if repairs else "clean", *[f"repair:{r}" for r in repairs])
+    return result, {"repaired": bool(repairs), "repairs": repairs}
+
+
+def record_continuation(succeeded: bool):
+    _count("continuations", "continuation_ok" if succeeded else "continuation_failed")
+
+
+def get_stats() -> Dict:
+    with _lock:
+        snapshot = dict(stats)
+    parsed = snapshot.get("clean", 0) + snapshot.get("repaired", 0)
+    return {
+        "parsed": parsed,
+        "clean": snapshot.get("clean", 0),
+        "repaired": snapshot.get("repaired", 0),
+        "repair_rate": round(snapshot.get("repaired", 0) / parsed, 4) if parsed else 0.0,
+        "truncated": snapshot.get("truncated", 0),
+        "continuations": snapshot.get("continuations", 0),
+        "continuation_ok": snapshot.get("continuation_ok", 0),
+        "failed": snapshot.get("failed", 0),
+        "repairs": {k.split(":", 1)[1]: v for k, v in snapshot.items() if k.startswith("repair:")},
+    }
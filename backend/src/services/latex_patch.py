@@ -0,0 +1,39 @@
+from typing import Dict, List, Optional
+
+
+def _normalize(text: str) -> str:
+    return "\n".join(line.rstrip() for line in text.split("\n"))
+
+
+def apply_patch(tex: str, search: str, replace: str) -> Optional[str]:
+    """Applies a search/replace patch; None when the search text is not in the source."""
+    if not search:
+        return None
+    if search in tex:
+        return tex.replace(search, replace, 1)
+    # Models tend to trim trailing whitespace from the lines they quote
+    stripped = _normalize(search)
+    normalized = _normalize(tex)
+    if stripped and stripped in normalized:
+        return normalized.replace(stripped, replace, 1)
+    return None
+
+
+def apply_edits(tex: str, edits: List[Dict]) -> Dict:
+    """
+    Applies a list of {"search", "replace"} hunks in order.
+
+    Every hunk must match exactly once (an ambiguous anchor could edit the wrong bullet).
+    Returns {"tex", "applied", "error"}; on any failure tex is None and error says which hunk.
+    """
+    current = tex
+    for index, edit in enumerate(edits):
+        search, replace = edit.get("search") or "", edit.get("replace") or ""
+        count = current.count(search) if search else 0
+        if count == 0:
+            count = _normalize(current).count(_normalize(search)) if search.strip() else 0
+        if count != 1:
+            reason = "not found" if count == 0 else f"matches {count} places"
+            return {"tex": None, "applied": index, "error": f"edit {index + 1}: search text {reason}"}
+        current = apply_patch(current, search, replace)
+    return {"tex": current, "applied": len(edits), "error": None}
@@ -0,0 +1,307 @@
+import re
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List
+
+# Resume structure index: sections -> entries -> bullets, as character offsets into the tex.
+# Good enough for the usual resume templates (\section + \resume...Heading + \resumeItem/\item);
+# anything it can't make sense of simply ends up unindexed and is sent to the LLM whole.
+
+SECTION = re.compile(r"\\section\*?\s*\{")
+ENTRY_HEADING = re.compile(r"\\[A-Za-z]*[Hh]eading\b(?!ListStart|ListEnd)")
+BULLET = re.compile(r"\\resumeItem\b|\\resumeSubItem\b|\\item\b")
+END_DOCUMENT = "\\end{document}"
+BEGIN_DOCUMENT = "\\begin{document}"
+MACRO_SIGNATURE = re.compile(r"\\(?:re)?newcommand\*?\s*\{?(\\[A-Za-z@]+)\}?\s*(\[\d\])?")
+WORD = re.compile(r"[A-Za-z][A-Za-z0-9+#.]*")
+# List/environment delimiters: a rewritten span has to open and close exactly the same ones
+LIST_MARKER = re.compile(r"\\[A-Za-z]*List(?:Start|End)\b|\\(?:begin|end)\s*\{[A-Za-z*]+\}")
+
+INDEX_CACHE_SIZE = 128
+
+# Words in a request that point at a section, keyed by words expected in the section title
+SECTION_HINTS = {
+    "skill": {"skill", "skills", "technologies", "technology", "stack", "tools", "languages", "frameworks"},
+    "experience": {"experience", "work", "job", "jobs", "role", "roles", "internship", "intern", "employment", "company"},
+    "project": {"project", "projects", "portfolio"},
+    "education": {"education", "degree", "university", "college", "gpa", "coursework", "school"},
+    "summary": {"summary", "objective", "profile", "about", "intro"},
+    "certification": {"certification", "certifications", "certificate", "certificates", "award", "awards"},
+    "publication": {"publication", "publications", "paper", "papers", "research"},
+}
+
+# Requests about the document as a whole can't be sliced
+GLOBAL_REQUEST = re.compile(
+    r"\b(whole|entire|overall|everything|every section|all sections|throughout|one[- ]page|shorten the resume|"
+    r"reorder|rearrange|font|margin|layout|format(?:ting)?)\b",
+    re.I
+)
+
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "to", "in", "on", "of", "for", "with", "my", "me", "it", "this", "that",
+    "add", "make", "more", "less", "please", "change", "update", "remove", "replace", "rewrite", "section",
+    "bullet", "bullets", "point", "points", "line", "can", "you", "should", "be", "is", "are", "from", "into",
+    "new", "about", "at", "as", "by", "i", "use", "using", "improve", "better", "stronger", "state", "present",
+    "jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}
+
+
+def _group_end(tex: str, open_at: int) -> int:
+    """Offset just past the {...} group starting at open_at (or len(tex) if unbalanced)."""
+    depth = 0
+    pos = open_at
+    while pos < len(tex):
+        ch = tex[pos]
+        if ch == "\\":
+            pos += 2
+            continue
+        if ch == "%":
+            newline = tex.find("\n", pos)
+            pos = len(tex) if newline == -1 else newline
+            continue
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return pos + 1
+        pos += 1
+    return len(tex)
+
+
+def _line_start(tex: str, offset: int) -> int:
+    return tex.rfind("\n", 0, offset) + 1
+
+
+def _uncommented(tex: str, start: int, end: int, pattern: re.Pattern):
+    for match in pattern.finditer(tex, start, end):
+        line_start = _line_start(tex, match.start())
+        if "%" in tex[line_start:match.start()].replace("\\%", ""):
+            continue
+        yield match
+
+
+def build_index(tex: str) -> Dict:
+    """
+    Indexes a resume into sections, entries and bullets.
+    Section/entry spans start at the beginning of their line, so slices carry their indentation.
+    """
+    body_start = tex.find(BEGIN_DOCUMENT)
+    body_start = 0 if body_start == -1 else body_start + len(BEGIN_DOCUMENT)
+    body_end = tex.rfind(END_DOCUMENT)
+    body_end = len(tex) if body_end == -1 else body_end
+
+    starts = [m for m in _uncommented(tex, body_start, body_end, SECTION)]
+    sections = []
+    for i, match in enumerate(starts):
+        title_end = _group_end(tex, match.end() - 1)
+        start = _line_start(tex, match.start())
+        end = _line_start(tex, starts[i + 1].start()) if i + 1 < len(starts) else body_end
+        sections.append({
+            "title": tex[match.end():title_end - 1].strip(),
+            "start": start,
+            "end": end,
+            "entries": _index_entries(tex, title_end, end),
+        })
+
+    return {
+        "body_start": body_start,
+        "body_end": body_end,
+        "header_end": sections[0]["start"] if sections else body_end,
+        "sections": sections,
+    }
+
+
+def _index_entries(tex: str, start: int, end: int) -> List[Dict]:
+    headings = list(_uncommented(tex, start, end, ENTRY_HEADING))
+    entries = []
+    for i, match in enumerate(headings):
+        entry_start = _line_start(tex, match.start())
+        entry_end = _line_start(tex, headings[i + 1].start()) if i + 1 < len(headings) else end
+        # Heading arguments: consecutive {...} groups after the macro name
+        pos, args = match.end(), []
+        while True:
+            while pos < entry_end and tex[pos] in " \t\r\n":
+                pos += 1
+            if pos >= entry_end or tex[pos] != "{":
+                break
+            group_end = _group_end(tex, pos)
+            args.append(tex[pos + 1:group_end - 1])
+            pos = group_end
+        entries.append({
+            "heading": " | ".join(a.strip() for a in args if a.strip()),
+            "start": entry_start,
+            "end": entry_end,
+            "bullets": _index_bullets(tex, pos, entry_end),
+        })
+    if not entries:
+        # Flat sections (skills lists, summaries): bullets hang off the section itself
+        bullets = _index_bullets(tex, start, end)
+        if bullets:
+            entries.append({"heading": "", "start": _line_start(tex, start), "end": end, "bullets": bullets})
+    return entries
+
+
+def _index_bullets(tex: str, start: int, end: int) -> List[Dict]:
+    bullets = []
+    for match in _uncommented(tex, start, end, BULLET):
+        pos = match.end()
+        while pos < end and tex[pos] in " \t":
+            pos += 1
+        if pos < end and tex[pos] == "{":
+            bullet_end = _group_end(tex, pos)
+        else:
+            newline = tex.find("\n", pos)
+            bullet_end = end if newline == -1 else min(newline, end)
+        bullets.append({"start": match.start(), "end": min(bullet_end, end)})
+    return bullets
+
+
+class StructureIndexCache:
+    """
+    LRU of structure indexes keyed by content hash: a template (or version) that is refined,
+    scored or optimized again is parsed once. Shared by the threads of a worker or API process.
+    """
+
+    def __init__(self, max_entries: int = INDEX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._by_hash: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, tex: str) -> Dict:
+        key = hashlib.sha1(tex.encode("utf-8")).hexdigest()
+        with self._lock:
+            index = self._by_hash.get(key)
+            if index is not None:
+                self._by_hash.move_to_end(key)
+                return index
+        # Parse outside the lock; two threads missing on the same text both build, one result is kept
+        index = build_index(tex)
+        with self._lock:
+            self._by_hash[key] = index
+            while len(self._by_hash) > self.max_entries:
+                self._by_hash.popitem(last=False)
+        return index
+
+
+index_cache = StructureIndexCache()
+
+
+def _words(text: str) -> set:
+    return {w.lower().rstrip(".") for w in WORD.findall(text)} - STOPWORDS
+
+
+def select_sections(tex: str, request: str, index: Dict = None) -> List[int]:
+    """
+    Indices of the sections a request is about, or [] when it can't be narrowed down
+    (global requests, no sections, or nothing matched).
+    """
+    index = index or index_cache.get(tex)
+    sections = index["sections"]
+    if len(sections) < 2 or GLOBAL_REQUEST.search(request):
+        return []
+
+    request_words = _words(request)
+    selected = []
+    for i, section in enumerate(sections):
+        title_words = _words(section["title"])
+        # Section named directly, or through a hint word ("internship" -> Experience)
+        hit = bool(request_words & title_words)
+        for key, hints in SECTION_HINTS.items():
+            if any(key in w for w in title_words) and request_words & hints:
+                hit = True
+        # An entry named in the request ("the Salesforce bullet")
+        if not hit:
+            for entry in section["entries"]:
+                if request_words & _words(entry["heading"]):
+                    hit = True
+                    break
+        if hit:
+            selected.append(i)
+
+    # Everything matched = nothing gained
+    return selected if len(selected) < len(sections) else []
+
+
+def macro_signatures(tex: str) -> str:
+    """The template's custom commands (name + arity), as minimal context for a sliced prompt."""
+    preamble_end = tex.find(BEGIN_DOCUMENT)
+    preamble = tex[:preamble_end] if preamble_end != -1 else ""
+    return ", ".join(name + (arity or "") for name, arity in MACRO_SIGNATURE.findall(preamble))
+
+
+def section_span(index: Dict, selected: List[int]) -> tuple:
+    """One contiguous (start, end) covering the selected sections."""
+    sections = index["sections"]
+    return sections[min(selected)]["start"], sections[max(selected)]["end"]
+
+
+def optimization_units(tex: str, index: Dict = None) -> List[Dict]:
+    """
+    Independently rewritable spans, in document order: the Skills section as a whole, and each
+    entry of Experience/Projects. Everything else (header, Education, ...) is left as is.
+    """
+    index = index or index_cache.get(tex)
+    units = []
+    for section in index["sections"]:
+        title = section["title"].lower()
+        if "skill" in title:
+            units.append({"kind": "skills", "title": section["title"], "start": section["start"], "end": section["end"]})
+        elif "experience" in title or "project" in title:
+            for entry in section["entries"]:
+                if entry["heading"]:
+                    units.append({
+                        "kind": "entry",
+                        "title": f"{section['title']}: {entry['heading']}",
+                        "start": entry["start"],
+                        "end": _drop_unopened_closers(tex, entry["start"], entry["end"]),
+                    })
+    return units
+
+
+def list_markers(tex: str) -> Counter:
+    """Multiset of list/environment delimiters (\resumeItemListStart, \end{itemize}, ...) in tex."""
+    return Counter(re.sub(r"\s+", "", m.group(0)) for m in LIST_MARKER.finditer(tex))
+
+
+def _drop_unopened_closers(tex: str, start: int, end: int) -> int:
+    """
+    The last entry of a section runs up to the next section, so its span also holds the
+    section list's closing macro. Ends the span before closers the entry didn't open.
+    """
+    while True:
+        markers = list(_uncommented(tex, start, end, LIST_MARKER))
+        depth, unopened = 0, None
+        for match in markers:
+            if match.group(0).endswith("Start") or match.group(0).startswith("\\begin"):
+                depth += 1
+            elif depth:
+                depth -= 1
+            else:
+                unopened = match
+        if unopened is None:
+            return end
+        line_start = _line_start(tex, unopened.start())
+        end = line_start if not tex[line_start:unopened.start()].strip() else unopened.start()
+
+
+def distribute_keywords(tex: str, units: List[Dict], keywords: List[str]) -> List[List[str]]:
+    """
+    Assigns each keyword to the Skills unit and to the one entry it fits best (most shared
+    words with the keyword, ties to the entry with the fewest keywords so far), so no entry
+    gets stuffed and every keyword lands somewhere a recruiter would look.
+    """
+    assigned = [[] for _ in units]
+    entries = [i for i, u in enumerate(units) if u["kind"] == "entry"]
+    unit_words = [_words(tex[u["start"]:u["end"]]) for u in units]
+    for keyword in keywords:
+        for i, unit in enumerate(units):
+            if unit["kind"] == "skills":
+                assigned[i].append(keyword)
+        if not entries:
+            continue
+        keyword_words = _words(keyword) or {keyword.lower()}
+        best = max(entries, key=lambda i: (len(keyword_words & unit_words[i]), -len(assigned[i]), -i))
+        assigned[best].append(keyword)
+    return assigned
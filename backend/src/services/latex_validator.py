@@ -0,0 +1,311 @@
+import re
+import bisect
+from typing import Dict, List
+
+# Tokenizer: re.split() hands back [text, token, text, token, ...] so plain text and
+# ordinary macros are skipped by the regex engine and only structural tokens reach Python.
+# The leading lookahead lets the engine reject ordinary characters with a single set test.
+TOKEN = re.compile(
+    r"(?=[{}&#$%\\])"
+    r"(%[^\n]*"                          # comment, consumed whole
+    r"|\\(?:begin|end)\s*\{[^{}]*\}"     # environment boundary with its name
+    r"|\\(?:url|href)\s*\{[^{}]*\}"      # URL argument: #, % and & are literal in here
+    r"|\\[^A-Za-z@]"                     # control symbol: \\, \%, \&, \{ ...
+    r"|[{}&#$])"
+)
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+COMMENT_PERCENT = re.compile(r"(?<![\\\d])%")
+LETTERS = re.compile(r"[A-Za-z]+")
+MACRO_DEFINITION = re.compile(r"\\(?:re)?newcommand\*?\s*\{?\\([A-Za-z@]+)|\\def\s*\\([A-Za-z@]+)|\\newenvironment\s*\{([A-Za-z@*]+)\}")
+MACRO_ENV = re.compile(r"\\(?:begin|end)\s*\{([A-Za-z*]+)\}")
+
+BEGIN_DOCUMENT = "\\begin{document}"
+
+ALIGNMENT_ENVS = {
+    "tabular", "tabular*", "tabularx", "longtable", "array", "align", "align*",
+    "alignat", "alignat*", "eqnarray", "eqnarray*", "matrix", "pmatrix", "bmatrix",
+    "vmatrix", "cases", "split", "aligned",
+}
+VERBATIM_ENVS = {"verbatim", "verbatim*", "lstlisting", "minted", "comment"}
+
+# Commands that LLMs commonly emit as "\\name" instead of "\name"
+COMMON_COMMANDS = {
+    "textbf", "textit", "emph", "underline", "href", "url", "item", "section", "subsection",
+    "begin", "end", "small", "large", "Large", "huge", "Huge", "hfill", "vspace", "hspace",
+    "textwidth", "linewidth", "newline", "noindent", "centering", "scshape", "bfseries",
+    "itshape", "footnotesize", "scriptsize", "tiny", "normalsize", "textsc", "texttt",
+    "quad", "qquad", "cdot", "bullet", "ldots", "dots", "LaTeX", "TeX",
+}
+
+# Preamble analysis is reused across compiles of the same template
+_preamble_cache: Dict[str, tuple] = {}
+PREAMBLE_CACHE_SIZE = 64
+
+
+def _line_starts(text: str) -> List[int]:
+    return [m.end() for m in re.finditer("\n", text)]
+
+
+def _position(line_starts: List[int], offset: int):
+    line = bisect.bisect_right(line_starts, offset)
+    column = offset - (line_starts[line - 1] if line else 0)
+    return line + 1, column + 1
+
+
+def _definition_body(preamble: str, start: int) -> str:
+    """The first balanced {...} group after a \\newcommand / \\def name."""
+    open_at = preamble.find("{", start)
+    if open_at == -1:
+        return ""
+    depth = 0
+    for pos in range(open_at, len(preamble)):
+        ch = preamble[pos]
+        if ch == "\\":
+            continue
+        if ch == "{" and preamble[pos - 1] != "\\":
+            depth += 1
+        elif ch == "}" and preamble[pos - 1] != "\\":
+            depth -= 1
+            if depth == 0:
+                return preamble[open_at + 1:pos]
+    return preamble[open_at + 1:]
+
+
+def _diagnostic(severity, code, message, line, column) -> Dict:
+    return {"severity": severity, "code": code, "message": message, "line": line, "column": column, "fixed": False}
+
+
+class LatexValidator:
+    """
+    Cheap pre-flight checks for LLM generated LaTeX, run before pdflatex is spawned.
+
+    validate() returns diagnostics with line/column positions and, when autofix is on,
+    a fixed copy of the source with the safe corrections applied:
+      - "30%" (a percent sign that would comment out the rest of the line) -> "30\\%"
+      - "&" / "#" in the body outside tables and macro parameters -> "\\&" / "\\#"
+      - a lone "$" in a paragraph ("saved $2M") -> "\\$"
+      - "\\\\textbf" (an escaped backslash in front of a known command) -> "\\textbf"
+      - a missing \\end{document} at the very end (truncated output)
+    Anything else (unbalanced braces, mismatched environments) is reported as an error.
+    Columns refer to the source as validated; fixes never add or remove lines.
+    """
+
+    def _analyze_preamble(self, preamble: str) -> tuple:
+        cached = _preamble_cache.get(preamble)
+        if cached is not None:
+            return cached
+
+        diagnostics = []
+        line_starts = _line_starts(preamble)
+        depth = []
+        parts = TOKEN.split(preamble)
+        offset = 0
+        for i in range(1, len(parts), 2):
+            offset += len(parts[i - 1])
+            tok = parts[i]
+            if tok == "{":
+                depth.append(offset)
+            elif tok == "}":
+                if depth:
+                    depth.pop()
+                else:
+                    diagnostics.append(_diagnostic("error", "unmatched_close_brace", "Closing brace without a matching '{'", *_position(line_starts, offset)))
+            offset += len(tok)
+        for open_offset in depth:
+            diagnostics.append(_diagnostic("error", "unclosed_brace", "'{' is never closed", *_position(line_starts, open_offset)))
+
+        # Environments a macro opens without closing (or vice versa), e.g. \resumeItemListStart
+        known_commands = set(COMMON_COMMANDS)
+        macro_envs = set()
+        for m in MACRO_DEFINITION.finditer(preamble):
+            known_commands.add(m.group(1) or m.group(2) or m.group(3))
+            definition = _definition_body(preamble, m.end())
+            balance = {}
+            for env in MACRO_ENV.finditer(definition):
+                step = 1 if env.group(0).startswith("\\begin") else -1
+                balance[env.group(1)] = balance.get(env.group(1), 0) + step
+            macro_envs.update(name for name, count in balance.items() if count)
+
+        result = (diagnostics, known_commands, macro_envs)
+        if len(_preamble_cache) >= PREAMBLE_CACHE_SIZE:
+            _preamble_cache.pop(next(iter(_preamble_cache)))
+        _preamble_cache[preamble] = result
+        return result
+
+    def validate(self, tex: str, autofix: bool = True) -> Dict:
+        body_start = tex.find(BEGIN_DOCUMENT)
+        if body_start == -1:
+            diagnostics = [_diagnostic("error", "missing_begin_document", "No \\begin{document} found", 1, 1)]
+            return {"valid": False, "diagnostics": diagnostics, "fixes": [], "fixed_tex": tex}
+
+        preamble, body = tex[:body_start], tex[body_start:]
+        preamble_diagnostics, known_commands, macro_envs = self._analyze_preamble(preamble)
+        diagnostics = [dict(d) for d in preamble_diagnostics]
+        fixes = []
+        first_body_line = preamble.count("\n")
+        first_line_indent = body_start - (preamble.rfind("\n") + 1)
+        body_line_starts = None
+
+        def position(offset: int):
+            nonlocal body_line_starts
+            if body_line_starts is None:
+                body_line_starts = _line_starts(body)
+            line, column = _position(body_line_starts, offset)
+            if line == 1:
+                column += first_line_indent
+            return first_body_line + line, column
+
+        def report(severity, code, message, offset):
+            diagnostic = _diagnostic(severity, code, message, *position(offset))
+            diagnostics.append(diagnostic)
+            return diagnostic
+
+        def fix(diagnostic, original, replacement):
+            diagnostic["fixed"] = autofix
+            if autofix:
+                fixes.append({"code": diagnostic["code"], "line": diagnostic["line"], "column": diagnostic["column"],
+                              "original": original, "replacement": replacement})
+
+        # Percent signs after digits go first: they hide the rest of their line from the tokenizer
+        percent_hits = []
+        hit = body.find("%")
+        while hit != -1:
+            if body[hit - 1].isdigit():
+                line_prefix = body[body.rfind("\n", 0, hit) + 1:hit]
+                if not COMMENT_PERCENT.search(line_prefix):  # Otherwise already inside a comment
+                    percent_hits.append(hit)
+                    fix(report("warning", "unescaped_percent", "'%' after a number starts a comment; use '\\%'", hit), "%", "\\%")
+            hit = body.find("%", hit + 1)
+        if percent_hits:
+            pieces, last = [], 0
+            for hit in percent_hits:
+                pieces.append(body[last:hit])
+                pieces.append("\\%")
+                last = hit + 1
+            pieces.append(body[last:])
+            body = "".join(pieces)
+            body_line_starts = None
+
+        # Environments opened inside macros make explicit \begin/\end pairs legitimately unbalanced
+        strict_envs = not macro_envs
+        check_alignment = not (macro_envs & ALIGNMENT_ENVS)
+
+        edits = []  # (offset, length, replacement)
+        dollars = []  # (offset, brace depth) of the unescaped $ not yet checked
+        brace_stack = []
+        env_stack = []  # (name, offset)
+        verbatim = None
+        document_closed = False
+
+        def close_math(depth: int = 0):
+            # A formula can't outlive its brace group or paragraph: an odd count there is a stray "$"
+            for level in sorted({d for _, d in dollars if d >= depth}):
+                group = [o for o, d in dollars if d == level]
+                if len(group) == 1:
+                    fix(report("warning", "unescaped_dollar", "'$' never closes a formula; use '\\$'", group[0]), "$", "\\$")
+                    edits.append((group[0], 1, "\\$"))
+                elif len(group) % 2:
+                    report("warning", "unbalanced_math", "Odd number of '$' in one group or paragraph", group[-1])
+            dollars[:] = [(o, d) for o, d in dollars if d < depth]
+
+        parts = TOKEN.split(body)
+        offset = 0
+        for i in range(1, len(parts), 2):
+            if dollars and PARAGRAPH_BREAK.search(parts[i - 1]):
+                close_math()
+            offset += len(parts[i - 1])
+            tok = parts[i]
+            first = tok[0]
+
+            if verbatim is not None:
+                if tok.startswith("\\end") and tok[tok.index("{") + 1:-1].strip() == verbatim:
+                    verbatim = None
+                    env_stack.pop()
+                offset += len(tok)
+                continue
+
+            if first == "{":
+                brace_stack.append(offset)
+            elif first == "}":
+                if brace_stack:
+                    brace_stack.pop()
+                    if dollars and dollars[-1][1] > len(brace_stack):
+                        close_math(len(brace_stack) + 1)
+                else:
+                    report("error", "unmatched_close_brace", "Closing brace without a matching '{'", offset)
+            elif first == "$":
+                dollars.append((offset, len(brace_stack)))
+            elif first == "&":
+                if check_alignment and not any(name in ALIGNMENT_ENVS for name, _ in env_stack):
+                    fix(report("warning", "unescaped_ampersand", "'&' outside a table; use '\\&'", offset), "&", "\\&")
+                    edits.append((offset, 1, "\\&"))
+            elif first == "#":
+                nxt = parts[i + 1][:1]
+                if not (nxt.isdigit() or nxt == "#"):
+                    fix(report("warning", "unescaped_hash", "'#' outside a macro definition; use '\\#'", offset), "#", "\\#")
+                    edits.append((offset, 1, "\\#"))
+            elif first == "\\":
+                if tok == "\\\\":
+                    word = LETTERS.match(parts[i + 1])
+                    if word and word.group() in known_commands:
+                        fix(report("warning", "double_backslash_command", f"'\\\\{word.group()}' should be '\\{word.group()}'", offset), "\\\\", "\\")
+                        edits.append((offset, 2, "\\"))
+                elif tok.startswith("\\begin"):
+                    name = tok[tok.index("{") + 1:-1].strip()
+                    env_stack.append((name, offset))
+                    if name in VERBATIM_ENVS:
+                        verbatim = name
+                elif tok.startswith("\\end"):
+                    name = tok[tok.index("{") + 1:-1].strip()
+                    if env_stack and env_stack[-1][0] == name:
+                        env_stack.pop()
+                    elif strict_envs:
+                        expected = env_stack[-1][0] if env_stack else None
+                        message = f"\\end{{{name}}} does not match \\begin{{{expected}}}" if expected else f"\\end{{{name}}} without a matching \\begin"
+                        report("error", "environment_mismatch", message, offset)
+                        if any(n == name for n, _ in env_stack):
+                            while env_stack[-1][0] != name:
+                                env_stack.pop()
+                            env_stack.pop()
+                    if name == "document":
+                        document_closed = True
+                        break
+            offset += len(tok)
+        close_math()
+
+        for open_offset in brace_stack:
+            report("error", "unclosed_brace", "'{' is never closed", open_offset)
+
+        if not document_closed:
+            unclosed = [(name, o) for name, o in env_stack if name != "document"]
+            if strict_envs:
+                for name, open_offset in unclosed:
+                    report("error", "unclosed_environment", f"\\begin{{{name}}} is never closed", open_offset)
+            if not unclosed and not brace_stack:
+                # Truncated generation: everything else is balanced, so closing the document is safe
+                fix(report("warning", "missing_end_document", "No \\end{document}; output looks truncated", len(body)), "", "\n\\end{document}\n")
+                edits.append((len(body), 0, "\n\\end{document}\n"))
+            else:
+                report("error", "missing_end_document", "No \\end{document}", len(body))
+
+        if autofix and edits:
+            pieces, last = [], 0
+            for edit_offset, edit_length, replacement in sorted(edits, key=lambda e: e[0]):
+                pieces.append(body[last:edit_offset])
+                pieces.append(replacement)
+                last = edit_offset + edit_length
+            pieces.append(body[last:])
+            body = "".join(pieces)
+
+        diagnostics.sort(key=lambda d: (d["line"], d["column"]))
+        return {
+            "valid": not any(d["severity"] == "error" and not d["fixed"] for d in diagnostics),
+            "diagnostics": diagnostics,
+            "fixes": fixes,
+            "fixed_tex": preamble + body if autofix else tex,
+        }
+
+
+def format_diagnostics(diagnostics: List[Dict]) -> str:
+    return "\n".join(f"line {d['line']}:{d['column']} [{d['code']}] {d['message']}" for d in diagnostics)
+
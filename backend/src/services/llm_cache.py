@@ -0,0 +1,167 @@
+import os
+import time
+import asyncio
+import hashlib
+from typing import Optional
+
+# LLM Response Cache Configuration
+# Lives in the Redis instance Celery already uses.
+redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(24 * 3600)))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+CACHE_PREFIX = "llm_cache:"
+
+_client = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        import redis
+        # Short timeouts: a slow or missing Redis must never hold up an LLM request
+        _client = redis.Redis.from_url(redis_url, socket_timeout=0.25, socket_connect_timeout=0.25)
+    return _client
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 characters per token for English/LaTeX; good enough for a savings counter
+    return max(1, len(text) // 4)
+
+
+class LLMResponseCache:
+    """
+    Structured LLM results cached by hash(model id, model_id, rendered prompt).
+
+    Entries expire after LLM_CACHE_TTL_SECONDS. An insertion-ordered index (sorted set) plus a
+    running byte counter keep the namespace under LLM_CACHE_MAX_BYTES by dropping the oldest
+    entries; the counter moves in the same pipelines that store and drop entries, so a write
+    never has to re-add every entry size. Redis errors are logged and treated as misses.
+    """
+
+    def __init__(self, namespace: str, ttl: int = LLM_CACHE_TTL_SECONDS, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.prefix = f"{CACHE_PREFIX}{namespace}:"
+        self.index_key = f"{self.prefix}index"
+        self.sizes_key = f"{self.prefix}sizes"
+        self.bytes_key = f"{self.prefix}bytes"
+        self.stats_key = f"{self.prefix}stats"
+
+    def make_key(self, model_conf: dict, prompt: str) -> str:
+        digest = hashlib.sha256()
+        for part in (model_conf.get("id"), model_conf.get("model_id"), prompt):
+            digest.update(str(part or "").encode("utf-8"))
+            digest.update(b"\x00")
+        return f"{self.prefix}entry:{digest.hexdigest()}"
+
+    # The Redis client is synchronous: async callers go through a thread so the loop never blocks
+    async def aget(self, key: str) -> Optional[str]:
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: str, tokens: int):
+        await asyncio.to_thread(self.set, key, value, tokens)
+
+    def get(self, key: str) -> Optional[str]:
+        if not LLM_CACHE_ENABLED:
+            return None
+        try:
+            client = _redis()
+            raw = client.hmget(key, "value", "tokens")
+            if raw[0] is None:
+                client.hincrby(self.stats_key, "misses", 1)
+                return None
+            pipe = client.pipeline()
+            pipe.hincrby(self.stats_key, "hits", 1)
+            pipe.hincrby(self.stats_key, "saved_tokens", int(raw[1] or 0))
+            pipe.execute()
+            return raw[0].decode("utf-8")
+        except Exception as e:
+            print(f"[WARN] LLM cache read failed: {e}")
+            return None
+
+    def set(self, key: str, value: str, tokens: int):
+        if not LLM_CACHE_ENABLED:
+            return
+        try:
+            client = _redis()
+            size = len(key) + len(value)
+            # Re-storing a key replaces its old size in the total
+            previous = int(client.hget(self.sizes_key, key) or 0)
+            now = time.time()
+            pipe = client.pipeline()
+            pipe.hset(key, mapping={"value": value, "tokens": tokens})
+            pipe.expire(key, self.ttl)
+            pipe.zadd(self.index_key, {key: now})
+            pipe.hset(self.sizes_key, key, size)
+            pipe.incrby(self.bytes_key, size - previous)
+            pipe.hincrby(self.stats_key, "stores", 1)
+            total = pipe.execute()[4]
+            self._enforce_limits(client, now, total)
+        except Exception as e:
+            print(f"[WARN] LLM cache write failed: {e}")
+
+    def _enforce_limits(self, client, now: float, total: int):
+        # Forget index entries whose keys Redis already expired
+        expired = client.zrangebyscore(self.index_key, "-inf", now - self.ttl)
+        total -= self._drop(client, expired)["bytes"]
+        if total <= self.max_bytes:
+            return
+
+        evicted = 0
+        while total > self.max_bytes:
+            oldest = client.zrange(self.index_key, 0, 15)
+            if not oldest:
+                break
+            dropped = self._drop(client, oldest, budget=total - self.max_bytes)
+            total -= dropped["bytes"]
+            evicted += dropped["count"]
+        if evicted:
+            client.hincrby(self.stats_key, "evictions", evicted)
+
+    def _drop(self, client, keys, budget: Optional[int] = None) -> dict:
+        dropped = {"count": 0, "bytes": 0}
+        for key in keys:
+            if budget is not None and dropped["bytes"] >= budget:
+                break
+            size = int(client.hget(self.sizes_key, key) or 0)
+            pipe = client.pipeline()
+            pipe.delete(key)
+            pipe.zrem(self.index_key, key)
+            pipe.hdel(self.sizes_key, key)
+            pipe.decrby(self.bytes_key, size)
+            if not pipe.execute()[2]:
+                # Another worker dropped it between our read and the pipeline, and decremented already
+                client.incrby(self.bytes_key, size)
+                continue
+            dropped["count"] += 1
+            dropped["bytes"] += size
+        return dropped
+
+    def get_stats(self) -> dict:
+        try:
+            client = _redis()
+            raw = {k.decode(): int(v) for k, v in client.hgetall(self.stats_key).items()}
+            entries = client.zcard(self.index_key)
+            size = int(client.get(self.bytes_key) or 0)
+        except Exception as e:
+            return {"enabled": LLM_CACHE_ENABLED, "error": str(e)}
+        hits, misses = raw.get("hits", 0), raw.get("misses", 0)
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+            "saved_tokens": raw.get("saved_tokens", 0),
+            "stores": raw.get("stores", 0),
+            "evictions": raw.get("evictions", 0),
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl,
+        }
+
+
+analyze_cache = LLMResponseCache("analyze")
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+# Registry Configuration
+LLM_CLIENT_IDLE_SECONDS = float(os.getenv("LLM_CLIENT_IDLE_SECONDS", "900"))
+LLM_CLIENT_MAX = int(os.getenv("LLM_CLIENT_MAX", "64"))
+
+
+def _api_key_hash(api_key: Optional[str]) -> str:
+    # Keys never sit in the registry in plain text
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+def _loop_id() -> Optional[int]:
+    # Async HTTP clients are bound to the loop they first ran on; never share one across loops
+    try:
+        return id(asyncio.get_running_loop())
+    except RuntimeError:
+        return None
+
+
+class ClientRegistry:
+    """
+    Process-wide cache of LLM SDK clients.
+
+    Keyed by (provider, model_id, api_key hash, base_url, event loop), so every request for
+    the same model reuses one client and its HTTP connection pool. Clients unused for
+    LLM_CLIENT_IDLE_SECONDS are dropped, as are the least recently used beyond LLM_CLIENT_MAX.
+    """
+
+    def __init__(self, idle_seconds: float = LLM_CLIENT_IDLE_SECONDS, max_clients: int = LLM_CLIENT_MAX):
+        self.idle_seconds = idle_seconds
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[tuple, list]" = OrderedDict()  # key -> [client, last_used]
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def make_key(self, config: Dict) -> tuple:
+        return (
+            config.get("provider"),
+            config.get("model_id"),
+            _api_key_hash(config.get("api_key")),
+            config.get("base_url"),
+            _loop_id(),
+        )
+
+    def get(self, config: Dict, factory: Callable[[Dict], object]):
+        key = self.make_key(config)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry is not None:
+                entry[1] = now
+                self._clients.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[0]
+            self.stats["misses"] += 1
+
+        # Built outside the lock; if two threads race, the first one stored wins
+        client = factory(config)
+        with self._lock:
+            entry = self._clients.setdefault(key, [client, now])
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.stats["evictions"] += 1
+            return entry[0]
+
+    def _evict_idle(self, now: float):
+        idle = [k for k, (_, last_used) in self._clients.items() if now - last_used > self.idle_seconds]
+        for key in idle:
+            del self._clients[key]
+            self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "clients": len(self._clients)}
+
+
+class CatalogCache:
+    """llms.json parsed once, re-read only when the file's mtime changes."""
+
+    def __init__(self):
+        self._entries: Dict[str, tuple] = {}  # path -> (mtime_ns, catalog)
+        self._lock = threading.Lock()
+
+    def load(self, path) -> list:
+        path = str(path)
+        mtime = os.stat(path).st_mtime_ns
+        cached = self._entries.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with self._lock:
+            with open(path, "r") as f:
+                catalog = json.load(f)
+            self._entries[path] = (mtime, catalog)
+            return catalog
+
+
+client_registry = ClientRegistry()
+catalog_cache = CatalogCache()
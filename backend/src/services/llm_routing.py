@@ -0,0 +1,128 @@
+import os
+import time
+import threading
+from collections import deque
+from typing import Dict
+
+from src.services.rate_limiter import limiter_key
+
+# LLM Routing Configuration
+# Hedging: when the primary model is slower than its own p95, the same prompt also goes to
+# the user's secondary model and the first valid result wins. Failover: hard errors move
+# the call to the secondary, and a per-provider circuit breaker stops sending to a provider
+# that keeps failing.
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "1") != "0"
+# Hedge delay until a model has enough latency samples for its own p95
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "20"))
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))
+LATENCY_WINDOW = 200
+LATENCY_MIN_SAMPLES = 20
+
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+
+def model_key(model_conf: Dict) -> str:
+    return f"{model_conf.get('provider')}:{model_conf.get('model_id')}"
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies per model (per process)."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_conf: Dict, seconds: float):
+        with self._lock:
+            self._samples.setdefault(model_key(model_conf), deque(maxlen=self.window)).append(seconds)
+
+    def p95(self, model_conf: Dict):
+        with self._lock:
+            samples = sorted(self._samples.get(model_key(model_conf), ()))
+        if len(samples) < LATENCY_MIN_SAMPLES:
+            return None
+        return samples[int(len(samples) * 0.95) - 1]
+
+    def hedge_delay(self, model_conf: Dict) -> float:
+        p95 = self.p95(model_conf)
+        return max(LLM_HEDGE_MIN_DELAY, p95) if p95 is not None else LLM_HEDGE_DEFAULT_DELAY
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            snapshot = {key: sorted(samples) for key, samples in self._samples.items()}
+        return {
+            key: {
+                "samples": len(samples),
+                "p50_seconds": round(samples[len(samples) // 2], 3),
+                "p95_seconds": round(samples[max(0, int(len(samples) * 0.95) - 1)], 3),
+            }
+            for key, samples in snapshot.items() if samples
+        }
+
+
+class CircuitBreaker:
+    """
+    Per provider + API key: closed -> open after BREAKER_FAILURES consecutive hard errors,
+    open -> half-open after BREAKER_COOLDOWN_SECONDS (one trial call), closed again on success.
+    A trial that ends in neither (cancelled, rate-limited) must release() its slot; one that
+    never reports back is given up on after another cooldown.
+    """
+
+    def __init__(self):
+        self._state: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, model_conf: Dict) -> Dict:
+        return self._state.setdefault(limiter_key(model_conf), {
+            "state": "closed", "failures": 0, "opened_at": 0.0, "trial": False, "trial_at": 0.0, "trips": 0
+        })
+
+    def allow(self, model_conf: Dict) -> bool:
+        with self._lock:
+            entry = self._entry(model_conf)
+            if entry["state"] == "closed":
+                return True
+            if entry["state"] == "open" and time.monotonic() - entry["opened_at"] >= BREAKER_COOLDOWN_SECONDS:
+                entry["state"] = "half_open"
+                entry["trial"] = False
+            if entry["state"] == "half_open" and entry["trial"] and time.monotonic() - entry["trial_at"] >= BREAKER_COOLDOWN_SECONDS:
+                entry["trial"] = False
+            if entry["state"] == "half_open" and not entry["trial"]:
+                entry.update(trial=True, trial_at=time.monotonic())
+                return True
+            return False
+
+    def release(self, model_conf: Dict):
+        """The call ended without saying anything about the provider: free a half-open trial."""
+        with self._lock:
+            entry = self._entry(model_conf)
+            if entry["state"] == "half_open":
+                entry["trial"] = False
+
+    def success(self, model_conf: Dict):
+        with self._lock:
+            entry = self._entry(model_conf)
+            entry.update(state="closed", failures=0, trial=False)
+
+    def failure(self, model_conf: Dict):
+        with self._lock:
+            entry = self._entry(model_conf)
+            entry["failures"] += 1
+            if entry["state"] == "half_open" or entry["failures"] >= BREAKER_FAILURES:
+                if entry["state"] != "open":
+                    entry["trips"] += 1
+                entry.update(state="open", opened_at=time.monotonic(), trial=False)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {
+                key: {"state": e["state"], "consecutive_failures": e["failures"], "trips": e["trips"]}
+                for key, e in self._state.items()
+            }
+
+
+latency_tracker = LatencyTracker()
+circuit_breaker = CircuitBreaker()
+routing_stats = {"calls": 0, "hedged": 0, "hedge_won": 0, "failovers": 0, "breaker_skips": 0}
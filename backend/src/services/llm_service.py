@@ -1,12 +1,41 @@
+import os
+import re
 import json
+import time
+import asyncio
 import pathlib
-from typing import Dict, Any
+from typing import Callable, Dict, Any
 from langchain_openai import ChatOpenAI
 from langchain_google_genai import ChatGoogleGenerativeAI
 # from langchain_mistralai import ChatMistralAI # Using native SDK now
 from langchain_core.prompts import ChatPromptTemplate
 # from langchain_core.output_parsers import JsonOutputParser # Removed
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+from src.services.llm_clients import client_registry, catalog_cache
+from src.services.llm_cache import analyze_cache, estimate_tokens
+from src.services.single_flight import llm_single_flight, flight_key
+from src.services.rate_limiter import llm_rate_limiter
+from src.services.llm_routing import LLM_HEDGING_ENABLED, latency_tracker, circuit_breaker, routing_stats
+from src.services.json_repair import parse_structured, record_continuation, TruncatedJSON
+from src.services.prompt_compactor import ANALYZE_PLAIN_TEXT, compact_resume, restore_resume, log_savings
+from src.services.latex_patch import apply_edits
+from src.services.ats_scorer import score_resume
+from src.services.latex_validator import LatexValidator
+from src.services.latex_structure import (
+    index_cache, select_sections, section_span, macro_signatures, optimization_units, distribute_keywords, list_markers
+)
+
+# Refine Mode: "patch" asks for search/replace hunks, "full" for the whole document
+REFINE_MODE = os.getenv("REFINE_MODE", "patch")
+# Send only the sections a refine request is about (falls back to the whole document)
+REFINE_SLICING = os.getenv("REFINE_SLICING", "1") != "0"
+# Optimize Mode: "sections" rewrites Skills / each Experience and Project entry concurrently,
+# "full" rewrites the whole document in one call
+OPTIMIZE_MODE = os.getenv("OPTIMIZE_MODE", "sections")
+OPTIMIZE_SECTION_CONCURRENCY = int(os.getenv("OPTIMIZE_SECTION_CONCURRENCY", "4"))
+# Follow-up calls allowed for a reply cut off inside its JSON object
+JSON_CONTINUATION_ATTEMPTS = int(os.getenv("JSON_CONTINUATION_ATTEMPTS", "2"))
+CONTINUE_PROMPT = "Your previous reply was cut off. Continue it exactly from the last character: no repetition, no commentary, no code fence."
 
 try:
     from mistralai import Mistral
@@ -35,10 +64,62 @@ class OptimizationResult(BaseModel):
     new_latex_code: str = Field(description="The full optimized LaTeX resume code")
     summary: list[str] = Field(description="Detailed list of specific changes made during optimization")
 
+    # How the result was produced (full / sections); not part of the LLM schema
+    _stats: dict = PrivateAttr(default_factory=dict)
+
+    @property
+    def stats(self) -> dict:
+        return self._stats
+
+class SectionRewrite(BaseModel):
+    new_latex_code: str = Field(description="The rewritten LaTeX for this part of the resume only")
+    summary: list[str] = Field(description="Specific changes made to this part")
+
 class RefineResult(BaseModel):
     new_latex_code: str = Field(description="The updated LaTeX code after refinement")
     summary: str = Field(description="Brief summary of the change applied")
 
+    # How the result was produced (patch / full); not part of the LLM schema
+    _stats: dict = PrivateAttr(default_factory=dict)
+
+    @property
+    def stats(self) -> dict:
+        return self._stats
+
+class RefineEdit(BaseModel):
+    search: str = Field(description="Exact text copied from the current LaTeX, long enough to be unique")
+    replace: str = Field(description="The text that replaces it")
+
+class RefinePatch(BaseModel):
+    edits: list[RefineEdit] = Field(description="Search/replace hunks, applied in order")
+    summary: str = Field(description="Brief summary of the change applied")
+
+class RepairPatch(BaseModel):
+    search: str = Field(description="Exact text copied from the source region that must be replaced")
+    replace: str = Field(description="Corrected text to put in its place")
+    explanation: str = Field(description="One line on what was wrong")
+
+
+def _raw_reply_text(raw) -> str:
+    """The reply text behind a failed LangChain structured parse (tool-call args or plain content)."""
+    if raw is None:
+        return ""
+    if getattr(raw, "tool_calls", None):
+        return json.dumps(raw.tool_calls[0]["args"])
+    if getattr(raw, "invalid_tool_calls", None):
+        return raw.invalid_tool_calls[0].get("args") or ""
+    return raw.content if isinstance(raw.content, str) else ""
+
+
+def _reserved_tokens(formatted_prompt: str) -> int:
+    # Rate-limit reservation: the prompt plus a reply of comparable size (rewrites echo the resume)
+    return estimate_tokens(formatted_prompt) * 2
+
+
+def _brace_depth(tex: str) -> int:
+    tex = re.sub(r"\\[{}]", "", re.sub(r"(?<!\\)%.*", "", tex))
+    return tex.count("{") - tex.count("}")
+
 
 class LLMService:
     def __init__(self):
@@ -49,14 +130,28 @@ class LLMService:
         if not selected_id:
             raise ValueError("No LLM model selected in configuration")
             
+        model_conf = self._resolve_inventory_item(user_config, selected_id)
+        if not model_conf:
+             raise ValueError("Selected model not found in inventory")
+
+        # Optional hedging / failover target (see llm_routing)
+        routing = user_config.get("routing") or {}
+        secondary_id = routing.get("secondary_llm_id")
+        if LLM_HEDGING_ENABLED and routing.get("hedging") and secondary_id and secondary_id != selected_id:
+            try:
+                model_conf["secondary"] = self._resolve_inventory_item(user_config, secondary_id)
+            except ValueError as e:
+                print(f"[WARN] Secondary model unavailable, hedging disabled: {e}")
+        return model_conf
+
+    def _resolve_inventory_item(self, user_config: Dict, item_id: str):
         inventory = user_config.get("llm_inventory", [])
-        item = next((i for i in inventory if i["id"] == selected_id), None)
+        item = next((i for i in inventory if i["id"] == item_id), None)
         if not item:
-             raise ValueError("Selected model not found in inventory")
+            return None
              
-        # Resolve from catalog
-        with open(self.catalog_path, "r") as f:
-            catalog = json.load(f)
+        # Resolve from catalog (parsed once per process, reloaded when llms.json changes)
+        catalog = catalog_cache.load(self.catalog_path)
             
         catalog_def = next((c for c in catalog if c["id"] == item["sdk_id"]), None)
         if not catalog_def:
@@ -65,6 +160,10 @@ class LLMService:
         return {**catalog_def, **item} # Merge (Api key in item overrides)
 
     def _init_llm(self, config: Dict):
+        # Shared across every LLMService instance, so per-request services still reuse connections
+        return client_registry.get(config, self._build_llm)
+
+    def _build_llm(self, config: Dict):
         provider = config.get("provider")
         api_key = config.get("api_key")
         model_name = config.get("model_id") # e.g. gpt-4 or gemini-pro
@@ -99,14 +198,206 @@ class LLMService:
         else:
             raise ValueError(f"Unsupported provider: {provider}")
 
-    async def analyze_resume(self, user_config: Dict, resume_text: str, jd_text: str) -> AnalysisResult:
+    async def _invoke_structured(self, llm, model_conf: Dict, formatted_prompt: str, result_model, temperature: float = 0.2):
+        """
+        Sends one prompt and parses the reply into result_model.
+        Both paths are real awaits, so a slow model never blocks the event loop.
+        Identical concurrent calls (same model + rendered prompt), in this process or any
+        other API/worker process, share a single upstream request, which waits for budget on
+        the API key's rate limiter first. With a secondary model configured the request is
+        hedged / failed over (see _invoke_routed).
+        """
+        key = flight_key(model_conf.get("id"), model_conf.get("model_id"), result_model.__name__, temperature, formatted_prompt)
+        return await llm_single_flight.do(
+            key,
+            lambda: self._invoke_routed(llm, model_conf, formatted_prompt, result_model, temperature),
+            encode=lambda result: result.model_dump_json(),
+            decode=result_model.model_validate_json
+        )
+
+    async def _invoke_routed(self, llm, model_conf: Dict, formatted_prompt: str, result_model, temperature: float):
+        """
+        Primary alone when no secondary is configured. Otherwise:
+        - primary's breaker open: straight to the secondary;
+        - primary fails: fail over to the secondary;
+        - primary slower than its p95: hedge with the secondary, first valid result wins
+          and the other call is cancelled.
+        """
+        routing_stats["calls"] += 1
+        secondary = model_conf.get("secondary")
+        if not secondary:
+            return await self._invoke_once(llm, model_conf, formatted_prompt, result_model, temperature)
+
+        def run_secondary():
+            return self._invoke_once(self._init_llm(secondary), secondary, formatted_prompt, result_model, temperature)
+
+        if not circuit_breaker.allow(model_conf):
+            routing_stats["breaker_skips"] += 1
+            return await run_secondary()
+
+        primary = asyncio.ensure_future(self._invoke_once(llm, model_conf, formatted_prompt, result_model, temperature))
+        done, _ = await asyncio.wait({primary}, timeout=latency_tracker.hedge_delay(model_conf))
+        if done:
+            if primary.exception() is None:
+                return primary.result()
+            if not circuit_breaker.allow(secondary):
+                raise primary.exception()
+            routing_stats["failovers"] += 1
+            print(f"[WARN] {model_conf.get('provider')} call failed, failing over to {secondary.get('provider')}: {primary.exception()}")
+            return await run_secondary()
+
+        if not circuit_breaker.allow(secondary):
+            return await primary
+
+        routing_stats["hedged"] += 1
+        hedge = asyncio.ensure_future(run_secondary())
+        pending, errors = {primary, hedge}, []
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            routing_stats["hedge_won"] += 1
+                        return task.result()
+                    errors.append(task.exception())
+            raise errors[0]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _invoke_once(self, llm, model_conf: Dict, formatted_prompt: str, result_model, temperature: float):
+        """One upstream call: rate-limited, timed for the hedge delay, counted by the circuit breaker."""
+        async def upstream():
+            # MISTRAL HANDLING (native SDK, async API)
+            if Mistral and isinstance(llm, Mistral):
+                messages = [{"role": "user", "content": formatted_prompt}]
+                resp = await llm.chat.complete_async(
+                    model=model_conf.get("model_id"),
+                    messages=messages,
+                    response_format={"type": "json_object"},
+                    temperature=temperature
+                )
+                content = resp.choices[0].message.content
+                return await self._parse_reply(llm, model_conf, formatted_prompt, content, result_model, temperature)
+
+            # LANGCHAIN HANDLING (OpenAI / Google)
+            # include_raw: a reply the provider's parser rejects is repaired instead of raising
+            prompt = ChatPromptTemplate.from_messages([("user", "{user_payload}")])
+            chain = prompt | llm.with_structured_output(result_model, include_raw=True)
+
+            output = await chain.ainvoke({"user_payload": formatted_prompt})
+            if output.get("parsed") is not None:
+                return output["parsed"]
+            content = _raw_reply_text(output.get("raw"))
+            return await self._parse_reply(llm, model_conf, formatted_prompt, content, result_model, temperature)
+
+        reported = False
+        try:
+            async with llm_rate_limiter.slot(model_conf, _reserved_tokens(formatted_prompt)):
+                started = time.monotonic()
+                try:
+                    result = await upstream()
+                except asyncio.CancelledError:
+                    raise  # Lost a hedge race; says nothing about the provider
+                except Exception:
+                    circuit_breaker.failure(model_conf)
+                    reported = True
+                    raise
+            latency_tracker.record(model_conf, time.monotonic() - started)
+            circuit_breaker.success(model_conf)
+            reported = True
+            return result
+        finally:
+            # Cancelled or never got a rate-limit slot: a half-open trial must not stay taken
+            if not reported:
+                circuit_breaker.release(model_conf)
+
+    async def _stream_structured(self, llm, model_conf: Dict, formatted_prompt: str, result_model, on_token: Callable[[str], None], temperature: float = 0.2):
+        """
+        Like _invoke_structured, but streams: every text delta is handed to on_token as it
+        arrives, and the accumulated JSON is parsed into result_model at the end.
+        Not coalesced: the tokens belong to one job.
+        """
+        chunks = []
+
+        async def consume():
+            # MISTRAL HANDLING (native SDK, async streaming)
+            if Mistral and isinstance(llm, Mistral):
+                messages = [{"role": "user", "content": formatted_prompt}]
+                stream = await llm.chat.stream_async(
+                    model=model_conf.get("model_id"),
+                    messages=messages,
+                    response_format={"type": "json_object"},
+                    temperature=temperature
+                )
+                async for event in stream:
+                    delta = event.data.choices[0].delta.content if event.data.choices else None
+                    if delta:
+                        chunks.append(delta)
+                        on_token(delta)
+
+            # LANGCHAIN HANDLING (OpenAI / Google): plain streaming, JSON enforced by the prompt
+            else:
+                async for chunk in llm.astream(formatted_prompt):
+                    delta = chunk.content if isinstance(chunk.content, str) else ""
+                    if delta:
+                        chunks.append(delta)
+                        on_token(delta)
+
+        async with llm_rate_limiter.slot(model_conf, _reserved_tokens(formatted_prompt)):
+            await consume()
+            # Fences, stray text and cut-off tails are handled like the non-streaming path
+            return await self._parse_reply(llm, model_conf, formatted_prompt, "".join(chunks), result_model, temperature, on_token)
+
+    async def _parse_reply(self, llm, model_conf: Dict, formatted_prompt: str, content: str, result_model, temperature: float, on_token=None):
+        """
+        Tolerant parse of a structured reply (see json_repair). A reply cut off inside the
+        JSON object gets up to JSON_CONTINUATION_ATTEMPTS follow-up calls instead of a full
+        regeneration; any other defect is repaired locally or raises.
+        """
+        for attempt in range(JSON_CONTINUATION_ATTEMPTS + 1):
+            try:
+                result, _ = parse_structured(content or "", result_model)
+                return result
+            except TruncatedJSON:
+                if attempt == JSON_CONTINUATION_ATTEMPTS:
+                    raise
+            more = await self._continue_reply(llm, model_conf, formatted_prompt, content, temperature)
+            record_continuation(bool(more))
+            if not more:
+                raise TruncatedJSON("Model output was cut off and the continuation was empty")
+            if on_token:
+                on_token(more)
+            content += more
+
+    async def _continue_reply(self, llm, model_conf: Dict, formatted_prompt: str, partial: str, temperature: float) -> str:
+        # No JSON mode here: the continuation is the rest of an object, not an object
+        if Mistral and isinstance(llm, Mistral):
+            resp = await llm.chat.complete_async(
+                model=model_conf.get("model_id"),
+                messages=[
+                    {"role": "user", "content": formatted_prompt},
+                    {"role": "assistant", "content": partial},
+                    {"role": "user", "content": CONTINUE_PROMPT}
+                ],
+                temperature=temperature
+            )
+            more = resp.choices[0].message.content or ""
+        else:
+            message = await llm.ainvoke([("user", formatted_prompt), ("assistant", partial), ("user", CONTINUE_PROMPT)])
+            more = message.content if isinstance(message.content, str) else ""
+        if more.lstrip().startswith("```"):
+            more = more.lstrip().split("\n", 1)[1] if "\n" in more.lstrip() else ""
+        return more.rstrip()[:-3] if more.rstrip().endswith("```") else more
+
+    async def analyze_resume(self, user_config: Dict, resume_text: str, jd_text: str, use_cache: bool = True) -> AnalysisResult:
         import traceback
         import logging
         logger = logging.getLogger(__name__)
         
         try:
             model_conf = self._get_model_config(user_config)
-            llm = self._init_llm(model_conf)
             
             # Get custom prompt or default
             analyze_prompt = user_config.get("prompts", {}).get("analyze_prompt", "")
@@ -160,31 +451,36 @@ class LLMService:
                     {job_description}
                  """
             
-            # Safe replacement to avoid issues with JSON/LaTeX braces (Legacy Strategy)
-            formatted_prompt = analyze_prompt.replace("{resume_text}", resume_text)
-            formatted_prompt = formatted_prompt.replace("{job_description}", jd_text)
-            
-            # Support double braces too if user typed them
-            formatted_prompt = formatted_prompt.replace("{{resume_text}}", resume_text)
-            formatted_prompt = formatted_prompt.replace("{{job_description}}", jd_text)
-            
-            # MISTRAL HANDLING
-            if Mistral and isinstance(llm, Mistral):
-                messages = [{"role": "user", "content": formatted_prompt}]
-                resp = llm.chat.complete(
-                    model=model_conf.get("model_id"),
-                    messages=messages,
-                    response_format={"type": "json_object"},
-                    temperature=0.2
-                )
-                content = resp.choices[0].message.content
-                return AnalysisResult.model_validate_json(content)
+            def render(resume: str) -> str:
+                # Safe replacement to avoid issues with JSON/LaTeX braces (Legacy Strategy)
+                prompt = analyze_prompt.replace("{resume_text}", resume)
+                prompt = prompt.replace("{job_description}", jd_text)
+
+                # Support double braces too if user typed them
+                prompt = prompt.replace("{{resume_text}}", resume)
+                prompt = prompt.replace("{{job_description}}", jd_text)
+                return prompt
+
+            # Only the document body is scored: preamble and comments stay out of the prompt
+            compacted = compact_resume(resume_text, plain_text=ANALYZE_PLAIN_TEXT)
+            formatted_prompt = render(compacted["text"])
+            if compacted["text"] != resume_text:
+                log_savings("analyze", render(resume_text), formatted_prompt)
+
+            # Same model + same rendered prompt -> same analysis; skip the LLM call
+            cache_key = analyze_cache.make_key(model_conf, formatted_prompt)
+            if use_cache:
+                cached = await analyze_cache.aget(cache_key)
+                if cached:
+                    return AnalysisResult.model_validate_json(cached)
 
-            # LANGCHAIN HANDLING (OpenAI / Google)
-            prompt = ChatPromptTemplate.from_messages([("user", "{user_payload}")])
-            chain = prompt | llm.with_structured_output(AnalysisResult)
-            
-            return await chain.ainvoke({"user_payload": formatted_prompt})
+            llm = self._init_llm(model_conf)
+            result = await self._invoke_structured(llm, model_conf, formatted_prompt, AnalysisResult)
+
+            # Bypassed requests still refresh the entry
+            payload = result.model_dump_json()
+            await analyze_cache.aset(cache_key, payload, estimate_tokens(formatted_prompt) + estimate_tokens(payload))
+            return result
         except Exception as e:
             logger.error(f"Error in analyze_resume: {str(e)}\n{traceback.format_exc()}")
             raise e
@@ -196,7 +492,8 @@ class LLMService:
         resume_text: str, 
         jd_text: str,
         ignored_keywords: list[str] = [],
-        manual_keywords: list[str] = []
+        manual_keywords: list[str] = [],
+        mode: str = None
     ) -> OptimizationResult:
         import traceback
         import logging
@@ -214,6 +511,14 @@ class LLMService:
             target_keywords = list(set(effective_missing + manual_keywords))
             
             optimize_prompt = user_config.get("prompts", {}).get("optimize_prompt", "")
+
+            # A custom prompt is written for the whole document, so it always gets the full rewrite
+            if (mode or OPTIMIZE_MODE) == "sections" and not optimize_prompt:
+                result = await self._optimize_sections(llm, model_conf, analysis, resume_text, jd_text, target_keywords)
+                if result:
+                    return result
+                logger.warning("Section optimize not applicable or failed, running full rewrite")
+
             if not optimize_prompt:
 
                 optimize_prompt = r"""You are an ATS-optimization engine used by Big Tech recruiting platforms.
@@ -251,6 +556,9 @@ class LLMService:
                     old_resume_code (LaTeX): {resume_text}
                 """
     
+            # Preamble, macro definitions and comments don't need rewriting; send the body only
+            compacted = compact_resume(resume_text)
+
             # Safe replacement logic (Legacy Strategy)
             replacements = {
                 "{initial_ats_score}": str(analysis.get('ats_score', 0)),
@@ -258,42 +566,314 @@ class LLMService:
                 "{matched_keywords}": ", ".join(analysis.get('matched_keywords', [])),
                 "{justification}": json.dumps(analysis.get('justification', {})),
                 "{job_description}": jd_text,
-                "{resume_text}": resume_text,
+                "{resume_text}": compacted["text"],
                 # Support double braces
                 "{{initial_ats_score}}": str(analysis.get('ats_score', 0)),
                 "{{missing_keywords}}": ", ".join(target_keywords),
                 "{{matched_keywords}}": ", ".join(analysis.get('matched_keywords', [])),
                 "{{justification}}": json.dumps(analysis.get('justification', {})),
                 "{{job_description}}": jd_text,
-                "{{resume_text}}": resume_text,
+                "{{resume_text}}": compacted["text"],
             }
-            
-            formatted_prompt = optimize_prompt
-            for key, val in replacements.items():
-                formatted_prompt = formatted_prompt.replace(key, str(val))
-    
-            # MISTRAL HANDLING
-            if Mistral and isinstance(llm, Mistral):
-                messages = [{"role": "user", "content": formatted_prompt}]
-                resp = llm.chat.complete(
-                    model=model_conf.get("model_id"),
-                    messages=messages,
-                    response_format={"type": "json_object"},
-                    temperature=0.2
-                )
-                content = resp.choices[0].message.content
-                return OptimizationResult.model_validate_json(content)
 
-            # LANGCHAIN HANDLING
-            prompt = ChatPromptTemplate.from_messages([("user", "{user_payload}")])
-            chain = prompt | llm.with_structured_output(OptimizationResult)
-            
-            return await chain.ainvoke({"user_payload": formatted_prompt})
+            def render(values: Dict) -> str:
+                prompt = optimize_prompt
+                for key, val in values.items():
+                    prompt = prompt.replace(key, str(val))
+                return prompt
+
+            formatted_prompt = render(replacements)
+            if compacted["text"] != resume_text:
+                raw = {**replacements, "{resume_text}": resume_text, "{{resume_text}}": resume_text}
+                log_savings("optimize", render(raw), formatted_prompt)
+
+            started = time.monotonic()
+            result = await self._invoke_structured(llm, model_conf, formatted_prompt, OptimizationResult)
+            # The model rewrote the body only; put the untouched preamble back around it
+            result.new_latex_code = restore_resume(compacted, result.new_latex_code)
+            result._stats = {"mode": "full", "seconds": round(time.monotonic() - started, 3)}
+            return result
         except Exception as e:
             logger.error(f"Error in optimize_resume: {str(e)}\n{traceback.format_exc()}")
             raise e
 
-    async def refine_resume(self, user_config: Dict, current_tex: str, user_request: str) -> RefineResult:
+    async def optimize_from_seed(
+        self,
+        user_config: Dict,
+        seed_tex: str,
+        seed_jd: str,
+        jd_text: str,
+        seed_score: int = None
+    ):
+        """
+        Warm start for a near-duplicate job description: instead of rewriting the resume
+        from scratch, adapts the resume already optimized for the earlier posting with a
+        small edit list covering only what changed between the two postings.
+        Returns None when the edits can't be applied, so the caller runs the normal optimize.
+        """
+        import difflib
+        import logging
+        logger = logging.getLogger(__name__)
+
+        old_lines = [l.strip() for l in seed_jd.splitlines() if l.strip()]
+        new_lines = [l.strip() for l in jd_text.splitlines() if l.strip()]
+        jd_changes = [
+            line for line in difflib.unified_diff(old_lines, new_lines, lineterm="", n=0)
+            if line[:1] in "+-" and not line.startswith(("+++", "---"))
+        ]
+
+        model_conf = self._get_model_config(user_config)
+        if not jd_changes:
+            result = OptimizationResult(
+                final_score=seed_score or 0,
+                new_latex_code=seed_tex,
+                summary=["Reused the resume optimized for an identical job description"]
+            )
+            result._stats = {"mode": "seed", "edits": 0, "jd_changed_lines": 0}
+            return result
+
+        llm = self._init_llm(model_conf)
+        seed_prompt = r"""You are an ATS-optimization engine.
+            The resume below was already optimized for a job posting. The posting has since changed slightly.
+            Task: adapt the resume to the changed lines with the SMALLEST possible set of edits.
+            Return no edits if the changes don't matter for the resume.
+
+            POSTING CHANGES (- removed, + added):
+            {jd_changes}
+
+            CURRENT LATEX:
+            {current_tex}
+
+            RULES
+            1) Each edit's "search" is copied character-for-character from CURRENT LATEX and matches exactly one place.
+            2) "replace" is the new text for exactly that span.
+            3) Keep LaTeX valid: escape & % # _ as \& \% \# \_ in text. Stay honest: no invented experience.
+
+            OUTPUT FORMAT (JSON):
+            {
+                "edits": [
+                    {"search": "Python, Django", "replace": "Python, Django, FastAPI"}
+                ],
+                "summary": "Added FastAPI, now listed in the posting"
+            }
+        """
+        formatted_prompt = seed_prompt.replace("{jd_changes}", "\n".join(jd_changes))
+        formatted_prompt = formatted_prompt.replace("{current_tex}", seed_tex)
+
+        started = time.monotonic()
+        try:
+            patch = await self._invoke_structured(llm, model_conf, formatted_prompt, RefinePatch)
+        except Exception as e:
+            logger.warning(f"Seeded optimize failed, running full optimize: {e}")
+            return None
+        applied = apply_edits(seed_tex, [e.model_dump() for e in patch.edits])
+        if applied["error"]:
+            logger.warning(f"Seeded optimize edits did not apply, running full optimize: {applied['error']}")
+            return None
+
+        result = OptimizationResult(
+            final_score=seed_score or 0,
+            new_latex_code=applied["tex"],
+            summary=["Started from the resume optimized for a near-identical job description", patch.summary]
+        )
+        result._stats = {
+            "mode": "seed",
+            "edits": len(patch.edits),
+            "jd_changed_lines": len(jd_changes),
+            "seconds": round(time.monotonic() - started, 3)
+        }
+        return result
+
+    async def _optimize_sections(self, llm, model_conf: Dict, analysis: Dict, resume_text: str, jd_text: str, target_keywords: list[str]):
+        """
+        Rewrites Skills and each Experience/Project entry in its own LLM call, at most
+        OPTIMIZE_SECTION_CONCURRENCY at a time, each with its share of the target keywords.
+        Wall time tracks the slowest part instead of the whole document's output.
+        Returns None when the resume can't be split (or every part failed) so the caller runs the full rewrite.
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+
+        units = optimization_units(resume_text)
+        if len(units) < 2 or not target_keywords:
+            return None
+        assignments = distribute_keywords(resume_text, units, target_keywords)
+        jobs = [(unit, keywords) for unit, keywords in zip(units, assignments) if keywords]
+
+        section_prompt = r"""You are an ATS-optimization engine used by Big Tech recruiting platforms.
+
+            Rewrite ONE part of a LaTeX resume so it covers the target keywords for the job description,
+            while preserving structure, honesty, and formatting.
+
+            STRICT RULES
+            1) Return only this part, with the same commands, environments and number of entries. No \section, no preamble.
+            2) Work every target keyword in naturally (Skills: add to the fitting category; entries: enhance bullets).
+            3) Escape & % # _ as \& \% \# \_ in text. Keep every { } balanced.
+            4) Template commands available: {macros}
+
+            OUTPUT FORMAT (JSON):
+            {
+                "new_latex_code": "the rewritten part",
+                "summary": ["Added 'Kubernetes' to the Salesforce deployment bullet"]
+            }
+
+            PART: {title}
+            TARGET KEYWORDS: {keywords}
+            JOB DESCRIPTION: {job_description}
+
+            LATEX:
+            {section}
+        """
+        semaphore = asyncio.Semaphore(OPTIMIZE_SECTION_CONCURRENCY)
+        macros = macro_signatures(resume_text) or "standard LaTeX"
+
+        async def rewrite(unit, keywords):
+            original = resume_text[unit["start"]:unit["end"]]
+            formatted_prompt = section_prompt.replace("{macros}", macros)
+            formatted_prompt = formatted_prompt.replace("{title}", unit["title"])
+            formatted_prompt = formatted_prompt.replace("{keywords}", ", ".join(keywords))
+            formatted_prompt = formatted_prompt.replace("{job_description}", jd_text)
+            formatted_prompt = formatted_prompt.replace("{section}", original)
+            async with semaphore:
+                try:
+                    part = await self._invoke_structured(llm, model_conf, formatted_prompt, SectionRewrite)
+                except Exception as e:
+                    logger.warning(f"Section optimize failed for {unit['title']}: {e}")
+                    return None
+            new_code = part.new_latex_code.rstrip("\n") + "\n"
+            # A part that would unbalance the document, its lists or add/drop sections is discarded
+            if (
+                _brace_depth(new_code) != _brace_depth(original)
+                or new_code.count("\\section") != original.count("\\section")
+                or list_markers(new_code) != list_markers(original)
+            ):
+                logger.warning(f"Section optimize for {unit['title']} changed the structure, keeping the original")
+                return None
+            return part.model_copy(update={"new_latex_code": new_code})
+
+        started = time.monotonic()
+        parts = await asyncio.gather(*[rewrite(unit, keywords) for unit, keywords in jobs])
+        if not any(parts):
+            return None
+
+        # Reassemble in document order; untouched spans are copied verbatim
+        pieces, summary, cursor = [], [], 0
+        for (unit, _), part in zip(jobs, parts):
+            if part is None:
+                continue
+            pieces.append(resume_text[cursor:unit["start"]])
+            pieces.append(part.new_latex_code)
+            summary.extend(part.summary)
+            cursor = unit["end"]
+        pieces.append(resume_text[cursor:])
+        new_tex = "".join(pieces)
+
+        # No whole-document LLM pass to score the result: score it locally instead of guessing
+        final_score = score_resume(new_tex, jd_text)["ats_score"]
+        placed = [k for k in target_keywords if k.lower() in new_tex.lower() and k.lower() not in resume_text.lower()]
+
+        result = OptimizationResult(final_score=final_score, new_latex_code=new_tex, summary=summary)
+        result._stats = {
+            "mode": "sections",
+            "scorer": "local",
+            "parts": len(jobs),
+            "failed_parts": sum(1 for p in parts if p is None),
+            "concurrency": OPTIMIZE_SECTION_CONCURRENCY,
+            "keywords_placed": len(placed),
+            "keywords_targeted": len(target_keywords),
+            "seconds": round(time.monotonic() - started, 3),
+        }
+        return result
+
+    def _slice_for_request(self, current_tex: str, user_request: str):
+        """
+        Narrows a refine prompt to the sections the request is about.
+        Returns None when the request has to see the whole document.
+        """
+        if not REFINE_SLICING:
+            return None
+        index = index_cache.get(current_tex)
+        selected = select_sections(current_tex, user_request, index)
+        if not selected:
+            return None
+        start, end = section_span(index, selected)
+        titles = [index["sections"][i]["title"] for i in range(min(selected), max(selected) + 1)]
+        others = [s["title"] for i, s in enumerate(index["sections"]) if not min(selected) <= i <= max(selected)]
+        context = (
+            f"CURRENT LATEX is an excerpt: only the section(s) {', '.join(titles)}. "
+            f"Other sections (not shown, leave alone): {', '.join(others) or 'none'}. "
+            f"Template commands: {macro_signatures(current_tex) or 'standard LaTeX'}.\n"
+        )
+        return {"start": start, "end": end, "excerpt": current_tex[start:end], "sections": titles, "context": context}
+
+    async def _refine_with_patch(self, llm, model_conf: Dict, current_tex: str, user_request: str, on_token=None, scope: Dict = None) -> tuple:
+        """
+        Asks for a compact edit list instead of the whole document, applies it locally and
+        checks the result. Returns (RefineResult or None, stats); None means fall back.
+        With a scope the prompt only carries the selected sections; edits still apply to the full tex.
+        """
+        patch_prompt = r"""You are a LaTeX Resume Editor.
+            Task: Apply the user's request to the resume with the SMALLEST possible set of edits.
+            Do NOT return the whole document.
+
+            {scope}CURRENT LATEX:
+            {current_tex}
+
+            USER REQUEST:
+            {user_request}
+
+            RULES
+            1) Each edit's "search" is copied character-for-character from CURRENT LATEX and matches exactly one place
+               (include a few surrounding words or the whole line if needed to make it unique).
+            2) "replace" is the new text for exactly that span. Use an empty "replace" to delete.
+            3) Keep LaTeX valid: escape & % # _ as \& \% \# \_ in text.
+
+            OUTPUT FORMAT (JSON):
+            {
+                "edits": [
+                    {"search": "\\item Built REST APIs in Flask", "replace": "\\item Built REST APIs in Flask and FastAPI"}
+                ],
+                "summary": "Added FastAPI to the backend bullet"
+            }
+        """
+        formatted_prompt = patch_prompt.replace("{scope}", scope["context"] if scope else "")
+        formatted_prompt = formatted_prompt.replace("{current_tex}", scope["excerpt"] if scope else current_tex)
+        formatted_prompt = formatted_prompt.replace("{user_request}", user_request)
+
+        if on_token:
+            patch = await self._stream_structured(llm, model_conf, formatted_prompt, RefinePatch, on_token)
+        else:
+            patch = await self._invoke_structured(llm, model_conf, formatted_prompt, RefinePatch)
+
+        stats = {"mode": "patch", "edits": len(patch.edits), "output_chars": len(patch.model_dump_json())}
+        if scope:
+            stats.update(sections=scope["sections"], prompt_chars=len(scope["excerpt"]), document_chars=len(current_tex))
+        if not patch.edits:
+            stats["patch_error"] = "no edits returned"
+            return None, stats
+
+        applied = apply_edits(current_tex, [e.model_dump() for e in patch.edits])
+        if applied["error"]:
+            stats["patch_error"] = applied["error"]
+            return None, stats
+        if scope and (applied["tex"][:scope["start"]] != current_tex[:scope["start"]]
+                      or applied["tex"][len(applied["tex"]) - (len(current_tex) - scope["end"]):] != current_tex[scope["end"]:]):
+            # A search that also matched text the model never saw landed outside the excerpt
+            stats["patch_error"] = "edit landed outside the selected sections"
+            return None, stats
+
+        # The edit must not break structure that was fine before
+        validator = LatexValidator()
+        errors_before = sum(1 for d in validator.validate(current_tex, autofix=False)["diagnostics"] if d["severity"] == "error")
+        errors_after = sum(1 for d in validator.validate(applied["tex"], autofix=False)["diagnostics"] if d["severity"] == "error")
+        if errors_after > errors_before:
+            stats["patch_error"] = f"patched LaTeX has {errors_after - errors_before} new structural error(s)"
+            return None, stats
+
+        result = RefineResult(new_latex_code=applied["tex"], summary=patch.summary)
+        return result, stats
+
+    async def refine_resume(self, user_config: Dict, current_tex: str, user_request: str, on_token: Callable[[str], None] = None, mode: str = None) -> RefineResult:
         import traceback
         import logging
         logger = logging.getLogger(__name__)
@@ -301,11 +881,26 @@ class LLMService:
         try:
             model_conf = self._get_model_config(user_config)
             llm = self._init_llm(model_conf)
+            scope = self._slice_for_request(current_tex, user_request)
             
+            # Patch mode first: output tokens dominate refine latency and cost
+            patch_stats = None
+            if (mode or REFINE_MODE) == "patch":
+                started = time.monotonic()
+                try:
+                    result, patch_stats = await self._refine_with_patch(llm, model_conf, current_tex, user_request, on_token, scope)
+                except Exception as e:
+                    result, patch_stats = None, {"mode": "patch", "patch_error": str(e)}
+                patch_stats["seconds"] = round(time.monotonic() - started, 3)
+                if result:
+                    result._stats = patch_stats
+                    return result
+                logger.warning(f"Patch refine fell back to full regeneration: {patch_stats.get('patch_error')}")
+
             refine_prompt = r"""You are a LaTeX Resume Editor.
                 Task: Update the resume code based on the user's request.
                 
-                CURRENT LATEX:
+                {scope}CURRENT LATEX:
                 {current_tex}
                 
                 USER REQUEST:
@@ -313,31 +908,78 @@ class LLMService:
                 
                 OUTPUT FORMAT (JSON):
                 {{
-                    "new_latex_code": "Updated full latex code",
+                    "new_latex_code": "{output_scope}",
                     "summary": "Updated summary section to include..."
                 }}
             """
             
-            formatted_prompt = refine_prompt.replace("{current_tex}", current_tex)
+            formatted_prompt = refine_prompt.replace("{scope}", scope["context"] if scope else "")
+            formatted_prompt = formatted_prompt.replace("{output_scope}", "Updated latex code for the section(s) shown" if scope else "Updated full latex code")
+            formatted_prompt = formatted_prompt.replace("{current_tex}", scope["excerpt"] if scope else current_tex)
             formatted_prompt = formatted_prompt.replace("{user_request}", user_request)
             
-            # MISTRAL HANDLING
-            if Mistral and isinstance(llm, Mistral):
-                messages = [{"role": "user", "content": formatted_prompt}]
-                resp = llm.chat.complete(
-                    model=model_conf.get("model_id"),
-                    messages=messages,
-                    response_format={"type": "json_object"},
-                    temperature=0.2
-                )
-                content = resp.choices[0].message.content
-                return RefineResult.model_validate_json(content)
-
-            # LANGCHAIN HANDLING
-            prompt = ChatPromptTemplate.from_messages([("user", "{user_payload}")])
-            chain = prompt | llm.with_structured_output(RefineResult)
-            
-            return await chain.ainvoke({"user_payload": formatted_prompt})
+            started = time.monotonic()
+            if on_token:
+                result = await self._stream_structured(llm, model_conf, formatted_prompt, RefineResult, on_token)
+            else:
+                result = await self._invoke_structured(llm, model_conf, formatted_prompt, RefineResult)
+            if scope and "\\begin{document}" not in result.new_latex_code:
+                # Splice the rewritten sections back between the untouched header and tail
+                excerpt = result.new_latex_code.rstrip("\n") + "\n"
+                result.new_latex_code = current_tex[:scope["start"]] + excerpt + current_tex[scope["end"]:]
+            result._stats = {
+                "mode": "full",
+                "output_chars": len(result.model_dump_json()),
+                "seconds": round(time.monotonic() - started, 3),
+                "fallback_from": patch_stats
+            }
+            if scope:
+                result._stats.update(sections=scope["sections"], prompt_chars=len(scope["excerpt"]), document_chars=len(current_tex))
+            return result
         except Exception as e:
             logger.error(f"Error in refine_resume: {str(e)}\n{traceback.format_exc()}")
             raise e
+
+    async def repair_latex(self, user_config: Dict, region: str, error: str, line: int) -> RepairPatch:
+        """
+        Small targeted fix for a failed compile: only the failing region and the pdflatex
+        error go to the model, and a search/replace patch comes back (not the full document).
+        """
+        import traceback
+        import logging
+        logger = logging.getLogger(__name__)
+
+        try:
+            model_conf = self._get_model_config(user_config)
+            llm = self._init_llm(model_conf)
+
+            repair_prompt = r"""You are a LaTeX compiler error fixer.
+                pdflatex failed on a resume. Fix ONLY the error below with the smallest possible edit.
+
+                PDFLATEX ERROR (reported at line {line}):
+                {error}
+
+                SOURCE REGION AROUND THE FAILING LINE:
+                {region}
+
+                RULES
+                1) "search" must be copied character-for-character from the source region (one or a few lines).
+                2) "replace" is the corrected version of exactly that text.
+                3) Do not rewrite, reword or reformat anything else.
+
+                OUTPUT FORMAT (JSON):
+                {{
+                    "search": "exact text from the region",
+                    "replace": "fixed text",
+                    "explanation": "Escaped the bare & in the skills line"
+                }}
+            """
+
+            formatted_prompt = repair_prompt.replace("{line}", str(line))
+            formatted_prompt = formatted_prompt.replace("{error}", error)
+            formatted_prompt = formatted_prompt.replace("{region}", region)
+
+            return await self._invoke_structured(llm, model_conf, formatted_prompt, RepairPatch, temperature=0)
+        except Exception as e:
+            logger.error(f"Error in repair_latex: {str(e)}\n{traceback.format_exc()}")
+            raise e
@@ -0,0 +1,132 @@
+import re
+import subprocess
+import threading
+from typing import Optional
+
+# TeX reports every error as a line starting with "! ".
+# In nonstopmode any such error already means a non-zero exit, so we stop at the first one.
+ERROR_LINE = re.compile(r"^! (.*)")
+LINE_MARKER = re.compile(r"^l\.(\d+)\s?(.*)")
+
+ERROR_TYPES = [
+    (re.compile(r"^Undefined control sequence"), "undefined_control_sequence"),
+    (re.compile(r"^Emergency stop"), "emergency_stop"),
+    (re.compile(r"^Paragraph ended before .* was complete"), "runaway_argument"),
+    (re.compile(r"^File ended while scanning"), "runaway_argument"),
+    (re.compile(r"^Misplaced alignment tab character"), "misplaced_alignment"),
+    (re.compile(r"^Missing \$ inserted"), "missing_math_shift"),
+    (re.compile(r"^Missing \} inserted|^Extra \}|^Too many \}'s"), "unbalanced_braces"),
+    (re.compile(r"^LaTeX Error: \\begin\{.*\} on input line .* ended by \\end"), "environment_mismatch"),
+    (re.compile(r"^LaTeX Error: File `.*' not found"), "missing_file"),
+    (re.compile(r"^LaTeX Error"), "latex_error"),
+]
+
+# Lines to keep reading after the "! ..." line while waiting for the "l.<n>" marker
+MAX_CONTEXT_LINES = 12
+
+
+def classify_error(message: str, runaway: bool = False) -> str:
+    if runaway:
+        return "runaway_argument"
+    for pattern, error_type in ERROR_TYPES:
+        if pattern.search(message):
+            return error_type
+    return "tex_error"
+
+
+def source_excerpt(tex_content: str, line: Optional[int], radius: int = 2) -> Optional[str]:
+    """Numbered source lines around the failing line, for the UI and the repair stage."""
+    if not line or not tex_content:
+        return None
+    lines = tex_content.splitlines()
+    start = max(1, line - radius)
+    end = min(len(lines), line + radius)
+    return "\n".join(f"{n}: {lines[n - 1]}" for n in range(start, end + 1))
+
+
+def run_pdflatex(cmd: list, timeout: int = 30, env: dict = None) -> dict:
+    """
+    Runs pdflatex while reading its terminal output line by line.
+
+    As soon as the first error and its "l.<n>" marker have been seen, the process is
+    killed instead of letting it limp on (or sit until the timeout) in nonstopmode.
+    Returns {"returncode", "output", "error"} where error is None on a clean run.
+    """
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
+
+    timed_out = threading.Event()
+
+    def _on_timeout():
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, _on_timeout)
+    timer.start()
+
+    output = []
+    error = None
+    runaway = False
+    context_left = 0
+
+    try:
+        for raw in proc.stdout:
+            line = raw.decode("utf-8", errors="ignore").rstrip("\r\n")
+            output.append(line)
+
+            if error is None:
+                if line.startswith("Runaway argument?"):
+                    runaway = True
+                    continue
+                match = ERROR_LINE.match(line)
+                if match:
+                    message = match.group(1).strip()
+                    error = {
+                        "type": classify_error(message, runaway),
+                        "message": message,
+                        "line": None,
+                        "context": [],
+                    }
+                    context_left = MAX_CONTEXT_LINES
+                continue
+
+            # Collecting context for the first error
+            error["context"].append(line)
+            marker = LINE_MARKER.match(line)
+            if marker and error["line"] is None:
+                # TeX prints the rest of the offending source line right after the marker
+                error["line"] = int(marker.group(1))
+                context_left = 1
+                continue
+            context_left -= 1
+            if context_left <= 0:
+                proc.kill()
+                break
+    finally:
+        timer.cancel()
+        proc.stdout.close()
+        returncode = proc.wait()
+
+    if timed_out.is_set() and error is None:
+        error = {
+            "type": "timeout",
+            "message": f"pdflatex did not finish within {timeout}s",
+            "line": None,
+            "context": output[-5:],
+        }
+
+    if error is not None:
+        error["context"] = "\n".join(error["context"])
+        if returncode == 0:
+            returncode = 1
+
+    return {"returncode": returncode, "output": "\n".join(output), "error": error}
+
+
+def format_error(error: dict) -> str:
+    """Single human readable string for the existing `error` field shown in the UI."""
+    text = error["message"]
+    if error.get("line"):
+        text += f" (line {error['line']})"
+    if error.get("context"):
+        text += "\n" + error["context"]
+    return text
@@ -0,0 +1,72 @@
+import os
+import time
+
+# Per-stage metrics for the Celery pipeline, kept in Redis so every worker process
+# (and the API) sees the same numbers.
+redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
+
+STATS_PREFIX = "pipeline:stage:"
+
+# Stage name -> Celery queue it is routed to
+STAGE_QUEUES = {
+    "extract": os.getenv("EXTRACT_QUEUE", "extract"),
+    "llm": os.getenv("LLM_QUEUE", "llm"),
+    "compile": os.getenv("COMPILE_QUEUE", "compile"),
+    "persist": os.getenv("PERSIST_QUEUE", "persist"),
+}
+
+_client = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(redis_url)
+    return _client
+
+
+def record_stage(stage: str, wait_seconds: float, run_seconds: float, failed: bool = False):
+    """Adds one run of a stage: time spent queued and time spent executing."""
+    try:
+        key = STATS_PREFIX + stage
+        pipe = _redis().pipeline()
+        pipe.hincrby(key, "count", 1)
+        if failed:
+            pipe.hincrby(key, "failed", 1)
+        pipe.hincrbyfloat(key, "total_wait_seconds", wait_seconds)
+        pipe.hincrbyfloat(key, "total_run_seconds", run_seconds)
+        pipe.hset(key, "last_run_at", time.time())
+        pipe.execute()
+
+        # Maxima are read-modify-write; good enough for a dashboard
+        current = _redis().hmget(key, "max_wait_seconds", "max_run_seconds")
+        if wait_seconds > float(current[0] or 0):
+            _redis().hset(key, "max_wait_seconds", wait_seconds)
+        if run_seconds > float(current[1] or 0):
+            _redis().hset(key, "max_run_seconds", run_seconds)
+    except Exception as e:
+        # Metrics must never fail a job
+        print(f"[WARN] Could not record stage stats for {stage}: {e}")
+
+
+def get_pipeline_stats() -> dict:
+    """Queue depth (messages waiting in the broker) plus latency counters for each stage."""
+    client = _redis()
+    stats = {}
+    for stage, queue in STAGE_QUEUES.items():
+        raw = {k.decode(): v.decode() for k, v in client.hgetall(STATS_PREFIX + stage).items()}
+        count = int(raw.get("count", 0))
+        total_wait = float(raw.get("total_wait_seconds", 0))
+        total_run = float(raw.get("total_run_seconds", 0))
+        stats[stage] = {
+            "queue": queue,
+            "queue_depth": client.llen(queue),
+            "count": count,
+            "failed": int(raw.get("failed", 0)),
+            "avg_wait_seconds": round(total_wait / count, 4) if count else 0.0,
+            "avg_run_seconds": round(total_run / count, 4) if count else 0.0,
+            "max_wait_seconds": round(float(raw.get("max_wait_seconds", 0)), 4),
+            "max_run_seconds": round(float(raw.get("max_run_seconds", 0)), 4),
+        }
+    return stats
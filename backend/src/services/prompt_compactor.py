@@ -0,0 +1,123 @@
+import os
+import re
+import threading
+from collections import Counter
+from typing import Dict
+
+from src.services.llm_cache import estimate_tokens
+from src.services.latex_structure import macro_signatures
+
+# Prompt Compaction
+# Scoring and rewriting only need the document body: the preamble (packages, geometry,
+# custom macro definitions) and comments are split off before the resume goes into a
+# prompt, and the preamble is spliced back onto the rewritten body afterwards.
+PROMPT_COMPACTION_ENABLED = os.getenv("PROMPT_COMPACTION_ENABLED", "1") != "0"
+# Analyze on plain text instead of LaTeX (smaller still, but the model can't judge parsability)
+ANALYZE_PLAIN_TEXT = os.getenv("ANALYZE_PLAIN_TEXT", "0") == "1"
+
+BEGIN_DOCUMENT = "\\begin{document}"
+END_DOCUMENT = "\\end{document}"
+BODY_MARKER = "% Document body only: preamble omitted."
+COMMENT = re.compile(r"(?<!\\)%")
+URL_ARGUMENT = re.compile(r"\\(?:url|href)\s*\{[^{}]*\}")
+# Layout-only commands whose arguments are not resume text (environment names, lengths)
+LAYOUT_COMMAND = re.compile(r"\\(?:begin|end|vspace|hspace|setlength|addtolength)\*?(?:\{[^{}]*\})+")
+BLANK_RUNS = re.compile(r"\n[ \t]*(?:\n[ \t]*){2,}")
+
+_lock = threading.Lock()
+stats = Counter()
+
+
+def is_latex(text: str) -> bool:
+    return "\\documentclass" in text or BEGIN_DOCUMENT in text or "\\section" in text
+
+
+def strip_comments(tex: str) -> str:
+    """Drops % comments (not \\% or % inside \\url/\\href) and comment-only lines."""
+    lines = []
+    for line in tex.split("\n"):
+        protected = [m.span() for m in URL_ARGUMENT.finditer(line)]
+        cut = None
+        for match in COMMENT.finditer(line):
+            if not any(start <= match.start() < end for start, end in protected):
+                cut = match.start()
+                break
+        if cut is None:
+            lines.append(line)
+        elif line[:cut].strip():
+            lines.append(line[:cut].rstrip())
+        # else: comment-only line, dropped
+    return BLANK_RUNS.sub("\n\n", "\n".join(lines))
+
+
+def compact_resume(tex: str, plain_text: bool = False) -> Dict:
+    """
+    Splits a LaTeX resume into preamble / body / tail and compacts the body for a prompt.
+    "text" is what goes into the prompt; restore_resume() reattaches the rest.
+    Non-LaTeX input (e.g. text extracted from a PDF) passes through untouched.
+    """
+    if not PROMPT_COMPACTION_ENABLED or not is_latex(tex):
+        return {"text": tex, "preamble": None, "tail": None}
+
+    begin = tex.find(BEGIN_DOCUMENT)
+    end = tex.rfind(END_DOCUMENT)
+    if begin == -1:
+        preamble, body, tail = None, tex, None
+    else:
+        preamble = tex[:begin + len(BEGIN_DOCUMENT)]
+        body = tex[begin + len(BEGIN_DOCUMENT):end if end != -1 else len(tex)]
+        tail = tex[end:] if end != -1 else ""
+
+    body = strip_comments(body).strip("\n")
+    if plain_text:
+        from src.services.ats_scorer import strip_latex
+        text = re.sub(r"[ \t]+", " ", strip_latex(LAYOUT_COMMAND.sub(" ", body)))
+        text = BLANK_RUNS.sub("\n\n", re.sub(r"\n[ \t]+", "\n", text)).strip()
+    elif preamble is not None:
+        # The model still needs to know the template's commands to keep using them
+        commands = macro_signatures(tex)
+        header = BODY_MARKER + (f" Template commands: {commands}" if commands else "")
+        text = f"{header}\n{body}"
+    else:
+        text = body
+    return {"text": text, "preamble": preamble, "tail": tail}
+
+
+def restore_resume(compacted: Dict, new_body: str) -> str:
+    """Puts the original preamble (and \\end{document}) back around a rewritten body."""
+    if compacted.get("preamble") is None or "\\documentclass" in new_body:
+        return new_body  # Nothing was split off, or the model returned a whole document anyway
+    body = new_body
+    if BEGIN_DOCUMENT in body:
+        body = body.split(BEGIN_DOCUMENT, 1)[1]
+    if END_DOCUMENT in body:
+        body = body.rsplit(END_DOCUMENT, 1)[0]
+    body = "\n".join(line for line in body.split("\n") if not line.startswith(BODY_MARKER))
+    return f"{compacted['preamble']}\n{body.strip(chr(10))}\n{compacted['tail'] or END_DOCUMENT}\n"
+
+
+def log_savings(label: str, prompt_before: str, prompt_after: str):
+    """Logs (and counts) the estimated input tokens a compaction saved for one call."""
+    before, after = estimate_tokens(prompt_before), estimate_tokens(prompt_after)
+    with _lock:
+        stats[f"{label}:calls"] += 1
+        stats[f"{label}:tokens_before"] += before
+        stats[f"{label}:tokens_after"] += after
+    saved = 100 * (before - after) / before if before else 0
+    print(f"[PROMPT] {label}: ~{before} -> ~{after} input tokens ({saved:.0f}% saved)")
+
+
+def get_stats() -> Dict:
+    with _lock:
+        snapshot = dict(stats)
+    labels = sorted({key.split(":", 1)[0] for key in snapshot})
+    report = {}
+    for label in labels:
+        before, after = snapshot.get(f"{label}:tokens_before", 0), snapshot.get(f"{label}:tokens_after", 0)
+        report[label] = {
+            "calls": snapshot.get(f"{label}:calls", 0),
+            "tokens_before": before,
+            "tokens_after": after,
+            "saved_ratio": round((before - after) / before, 4) if before else 0.0,
+        }
+    return {"enabled": PROMPT_COMPACTION_ENABLED, "plain_text_analyze": ANALYZE_PLAIN_TEXT, "prompts": report}
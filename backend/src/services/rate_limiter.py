@@ -0,0 +1,222 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import contextlib
+from typing import Dict
+
+# LLM Rate Limiter Configuration
+# One budget per (provider, API key), shared by the API and every worker through Redis,
+# so concurrent callers stay under the key's plan instead of discovering it through 429s.
+redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
+LLM_RATE_LIMIT_ENABLED = os.getenv("LLM_RATE_LIMIT_ENABLED", "1") != "0"
+# Longest a call waits for budget before giving up (the job fails instead of hanging)
+LLM_RATE_LIMIT_MAX_WAIT = float(os.getenv("LLM_RATE_LIMIT_MAX_WAIT", "60"))
+# A crashed caller's concurrency slot frees itself after this long
+LLM_SLOT_LEASE_SECONDS = int(os.getenv("LLM_SLOT_LEASE_SECONDS", "300"))
+
+# Requests/min, tokens/min and calls in flight per key, by plan_type; "provider:plan" entries win
+DEFAULT_LIMITS = {
+    "free": {"rpm": 15, "tpm": 250_000, "concurrency": 2},
+    "paid": {"rpm": 500, "tpm": 2_000_000, "concurrency": 16},
+    "google:free": {"rpm": 15, "tpm": 1_000_000, "concurrency": 4},
+    "mistral:free": {"rpm": 60, "tpm": 500_000, "concurrency": 2},
+    "openrouter:free": {"rpm": 20, "tpm": 200_000, "concurrency": 2},
+}
+# e.g. LLM_RATE_LIMITS='{"openai:paid": {"rpm": 3500, "tpm": 10000000, "concurrency": 64}}'
+LIMITS = {**DEFAULT_LIMITS, **json.loads(os.getenv("LLM_RATE_LIMITS", "{}"))}
+
+PREFIX = "rate_limit:"
+BUCKET_IDLE_SECONDS = 300
+
+# Refills both buckets for the time elapsed, then takes 1 request + `cost` tokens if both
+# have enough. Otherwise takes nothing and returns how long until they will.
+# Uses Redis TIME so callers on different hosts share one clock.
+TAKE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local rpm, tpm, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens', 'ts')
+local requests = tonumber(state[1]) or rpm
+local tokens = tonumber(state[2]) or tpm
+local elapsed = math.max(0, now - (tonumber(state[3]) or now))
+requests = math.min(rpm, requests + elapsed * rpm / 60)
+tokens = math.min(tpm, tokens + elapsed * tpm / 60)
+local wait = 0
+if requests < 1 then wait = (1 - requests) * 60 / rpm end
+if tokens < cost then wait = math.max(wait, (cost - tokens) * 60 / tpm) end
+if wait == 0 then
+    requests = requests - 1
+    tokens = tokens - cost
+end
+redis.call('HSET', KEYS[1], 'requests', requests, 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return {tostring(wait), tostring(requests), tostring(tokens)}
+"""
+
+# Leases are a sorted set scored by expiry, so a slot held by a dead process times out
+LEASE_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[1]) then
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[2])
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+_client = None
+_scripts = {}
+
+
+class RateLimitExceeded(Exception):
+    """No budget for the key within LLM_RATE_LIMIT_MAX_WAIT."""
+
+
+def _redis():
+    global _client
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _client
+
+
+def _script(name: str, source: str):
+    if name not in _scripts:
+        _scripts[name] = _redis().register_script(source)
+    return _scripts[name]
+
+
+def limits_for(model_conf: Dict) -> Dict:
+    provider = model_conf.get("provider") or "unknown"
+    plan = model_conf.get("plan_type") or "free"
+    return {**LIMITS.get(plan, LIMITS["free"]), **LIMITS.get(f"{provider}:{plan}", {})}
+
+
+def limiter_key(model_conf: Dict) -> str:
+    # The raw key never leaves the process; buckets are named by a hash of it
+    key_hash = hashlib.sha256((model_conf.get("api_key") or "").encode("utf-8")).hexdigest()[:16]
+    return f"{model_conf.get('provider') or 'unknown'}:{key_hash}"
+
+
+class RateLimiter:
+    """
+    Distributed token bucket (requests/min + tokens/min) plus a concurrency cap per API key.
+
+    acquire() waits asynchronously for budget, for at most LLM_RATE_LIMIT_MAX_WAIT seconds,
+    then raises RateLimitExceeded. If Redis is unavailable calls go through unthrottled.
+    The Redis client is synchronous, so its calls run in a thread, off the event loop.
+    """
+
+    @contextlib.asynccontextmanager
+    async def slot(self, model_conf: Dict, tokens: int):
+        lease = await self.acquire(model_conf, tokens)
+        try:
+            yield
+        finally:
+            await asyncio.to_thread(self._release, lease)
+
+    async def acquire(self, model_conf: Dict, tokens: int):
+        if not LLM_RATE_LIMIT_ENABLED:
+            return None
+        limits = limits_for(model_conf)
+        name = limiter_key(model_conf)
+        # A single call larger than the whole minute budget would otherwise never fit
+        cost = min(max(1, int(tokens)), limits["tpm"])
+        started = time.monotonic()
+        deadline = started + LLM_RATE_LIMIT_MAX_WAIT
+
+        try:
+            client = _redis()
+            await asyncio.to_thread(client.sadd, f"{PREFIX}keys", json.dumps({"key": name, "provider": model_conf.get("provider"), "plan": model_conf.get("plan_type")}))
+            take = _script("take", TAKE_SCRIPT)
+            while True:
+                taken = await asyncio.to_thread(take, keys=[f"{PREFIX}{name}:bucket"], args=[limits["rpm"], limits["tpm"], cost, BUCKET_IDLE_SECONDS])
+                wait = float(taken[0])
+                if wait == 0:
+                    break
+                if time.monotonic() + wait > deadline:
+                    await asyncio.to_thread(self._record, name, started, True)
+                    raise RateLimitExceeded(f"{model_conf.get('provider')} key over its {model_conf.get('plan_type') or 'free'} plan budget; retry later")
+                await asyncio.sleep(wait)
+
+            lease_id = uuid.uuid4().hex
+            lease = _script("lease", LEASE_SCRIPT)
+            while not await asyncio.to_thread(lease, keys=[f"{PREFIX}{name}:slots"], args=[limits["concurrency"], lease_id, LLM_SLOT_LEASE_SECONDS]):
+                if time.monotonic() >= deadline:
+                    await asyncio.to_thread(self._record, name, started, True)
+                    raise RateLimitExceeded(f"{model_conf.get('provider')} key has {limits['concurrency']} calls in flight; retry later")
+                await asyncio.sleep(0.1)
+        except RateLimitExceeded:
+            raise
+        except Exception as e:
+            print(f"[WARN] Rate limiter unavailable, calling without it: {e}")
+            return None
+
+        await asyncio.to_thread(self._record, name, started)
+        return (name, lease_id)
+
+    def _release(self, lease):
+        if not lease:
+            return
+        name, lease_id = lease
+        try:
+            _redis().zrem(f"{PREFIX}{name}:slots", lease_id)
+        except Exception as e:
+            print(f"[WARN] Rate limiter slot not released (expires on its own): {e}")
+
+    def _record(self, name: str, started: float, rejected: bool = False):
+        waited = time.monotonic() - started
+        try:
+            pipe = _redis().pipeline()
+            stats_key = f"{PREFIX}{name}:stats"
+            pipe.hincrby(stats_key, "rejected" if rejected else "acquired", 1)
+            if waited >= 0.01:
+                pipe.hincrby(stats_key, "waited", 1)
+                pipe.hincrbyfloat(stats_key, "wait_seconds", round(waited, 3))
+            pipe.execute()
+        except Exception:
+            pass
+
+    def get_stats(self) -> Dict:
+        """Current budget, calls in flight and wait metrics for every key seen."""
+        try:
+            client = _redis()
+            keys = [json.loads(raw) for raw in client.smembers(f"{PREFIX}keys")]
+            now = time.time()
+            report = []
+            for entry in sorted(keys, key=lambda k: k["key"]):
+                name = entry["key"]
+                limits = limits_for({"provider": entry["provider"], "plan_type": entry["plan"]})
+                bucket = client.hgetall(f"{PREFIX}{name}:bucket")
+                stats = {k.decode(): float(v) for k, v in client.hgetall(f"{PREFIX}{name}:stats").items()}
+                if bucket:
+                    elapsed = max(0.0, now - float(bucket[b"ts"]))
+                    requests = min(limits["rpm"], float(bucket[b"requests"]) + elapsed * limits["rpm"] / 60)
+                    tokens = min(limits["tpm"], float(bucket[b"tokens"]) + elapsed * limits["tpm"] / 60)
+                else:
+                    requests, tokens = limits["rpm"], limits["tpm"]
+                waited = int(stats.get("waited", 0))
+                report.append({
+                    "key": name,
+                    "provider": entry["provider"],
+                    "plan_type": entry["plan"],
+                    "limits": limits,
+                    "available_requests": round(requests, 2),
+                    "available_tokens": int(tokens),
+                    "in_flight": client.zcount(f"{PREFIX}{name}:slots", now, "+inf"),
+                    "acquired": int(stats.get("acquired", 0)),
+                    "rejected": int(stats.get("rejected", 0)),
+                    "waited": waited,
+                    "avg_wait_seconds": round(stats.get("wait_seconds", 0.0) / waited, 3) if waited else 0.0,
+                })
+        except Exception as e:
+            return {"enabled": LLM_RATE_LIMIT_ENABLED, "error": str(e)}
+        return {"enabled": LLM_RATE_LIMIT_ENABLED, "max_wait_seconds": LLM_RATE_LIMIT_MAX_WAIT, "keys": report}
+
+
+llm_rate_limiter = RateLimiter()
@@ -0,0 +1,169 @@
+import os
+import re
+import time
+from typing import Dict, List, Optional
+from src.services.latex_patch import apply_patch
+
+# Repair Configuration
+# Recompiles allowed after the first failed compile (local fixes and LLM patches both count)
+COMPILE_REPAIR_ATTEMPTS = int(os.getenv("COMPILE_REPAIR_ATTEMPTS", "2"))
+# Source lines sent to the LLM on each side of the failing line
+REPAIR_CONTEXT_LINES = int(os.getenv("REPAIR_CONTEXT_LINES", "6"))
+
+# Characters pdflatex rejects without inputenc/fontenc tricks; LLMs love emitting them
+UNICODE_REPLACEMENTS = {
+    "–": "--", "—": "---", "‘": "`", "’": "'", "“": "``", "”": "''",
+    "•": "\\textbullet{}", "…": "\\ldots{}", "\u00a0": "~", "→": "$\\rightarrow$",
+    "≤": "$\\leq$", "≥": "$\\geq$", "×": "$\\times$", "\u200b": "",
+}
+UNESCAPED_AMPERSAND = re.compile(r"(?<!\\)&")
+UNESCAPED_SUBSCRIPT = re.compile(r"(?<!\\)([_^])")
+UNESCAPED_HASH = re.compile(r"(?<!\\)#")
+
+
+def _replace_on_line(tex: str, line: int, pattern: re.Pattern, replacement: str) -> str:
+    lines = tex.split("\n")
+    if not line or line > len(lines):
+        return tex
+    # Math on the line means _ and ^ are probably intended
+    if "$" in lines[line - 1] and pattern is UNESCAPED_SUBSCRIPT:
+        return tex
+    lines[line - 1] = pattern.sub(replacement, lines[line - 1])
+    return "\n".join(lines)
+
+
+def local_fix(tex: str, error: Optional[Dict]) -> str:
+    """
+    Deterministic fixes keyed on the pdflatex error type.
+    Returns the (possibly unchanged) source; an unchanged result means nothing applied.
+    """
+    if not error:
+        return tex
+    error_type = error.get("type")
+    line = error.get("line")
+    message = error.get("message") or ""
+
+    if "Unicode character" in message:
+        for char, replacement in UNICODE_REPLACEMENTS.items():
+            tex = tex.replace(char, replacement)
+        return tex
+    if error_type == "misplaced_alignment":
+        return _replace_on_line(tex, line, UNESCAPED_AMPERSAND, r"\\&")
+    if error_type == "missing_math_shift":
+        return _replace_on_line(tex, line, UNESCAPED_SUBSCRIPT, r"\\\1")
+    if "parameter character" in message:
+        return _replace_on_line(tex, line, UNESCAPED_HASH, r"\\#")
+    return tex
+
+
+class RepairService:
+    """
+    Compile with a bounded repair loop, split so each half runs on the right worker pool.
+
+    compile_with_local_repair() (compile queue) recompiles with deterministic local fixes only.
+    When those don't apply, needs_llm() says so and llm_patch() (llm queue) asks the LLM for a
+    small search/replace patch over the failing region (never a full rewrite); the patched
+    source then goes back through compile_with_local_repair(). Every recompile is one attempt,
+    timed and recorded; `attempts` is carried between the stages.
+    """
+
+    def __init__(self, compiler_service=None, llm_service=None, max_attempts: int = COMPILE_REPAIR_ATTEMPTS):
+        self.compiler = compiler_service
+        self.llm = llm_service
+        self.max_attempts = max_attempts
+
+    def _failing_region(self, tex: str, compile_result: Dict):
+        error = compile_result.get("error_details") or {}
+        line = error.get("line")
+        if not line:
+            return None, None
+        lines = tex.split("\n")
+        start = max(1, line - REPAIR_CONTEXT_LINES)
+        end = min(len(lines), line + REPAIR_CONTEXT_LINES)
+        return "\n".join(lines[start - 1:end]), line
+
+    def compile_with_local_repair(
+        self,
+        user_id: str,
+        tex_content: str,
+        filename_base: str,
+        workflow_id: str = None,
+        version: str = None,
+        attempts: List[Dict] = None
+    ) -> Dict:
+        """
+        Compiles, applying local fixes between attempts. compile_result["repair"] holds the
+        attempts so far and the source that was compiled last ("tex").
+        """
+        attempts = attempts if attempts is not None else []
+        started = time.monotonic()
+        # Work on the same text pdflatex sees, so reported line numbers match
+        tex = self.compiler.validator.validate(tex_content)["fixed_tex"]
+        compile_result = self.compiler.compile_resume(user_id, tex, filename_base, workflow_id, version)
+        if attempts and attempts[-1].get("success") is None:
+            # This compile is the one an LLM patch was waiting on
+            attempts[-1]["seconds"] = round(attempts[-1]["seconds"] + time.monotonic() - started, 3)
+            attempts[-1]["success"] = compile_result["success"]
+
+        while not compile_result["success"] and len(attempts) < self.max_attempts:
+            error = compile_result.get("error_details")
+            patched = local_fix(tex, error)
+            if patched == tex:
+                break
+            started = time.monotonic()
+            attempt = {
+                "attempt": len(attempts) + 1,
+                "error_type": error.get("type") if error else None,
+                "error": compile_result.get("error", "")[:300],
+                "strategy": "local",
+            }
+            tex = patched
+            compile_result = self.compiler.compile_resume(user_id, tex, filename_base, workflow_id, version)
+            attempt["seconds"] = round(time.monotonic() - started, 3)
+            attempt["success"] = compile_result["success"]
+            attempts.append(attempt)
+
+        compile_result["repair"] = {
+            "attempts": attempts,
+            "repaired": bool(attempts) and compile_result["success"],
+            "tex": tex,
+        }
+        return compile_result
+
+    def needs_llm(self, compile_result: Dict) -> bool:
+        """Failed, local fixes exhausted, attempts left and a source line to patch."""
+        repair = compile_result.get("repair") or {}
+        return (
+            not compile_result["success"]
+            and len(repair.get("attempts", [])) < self.max_attempts
+            and self._failing_region(repair.get("tex", ""), compile_result)[0] is not None
+        )
+
+    async def llm_patch(self, user_config: Dict, tex: str, compile_result: Dict, attempts: List[Dict]) -> Optional[str]:
+        """
+        Asks the LLM to patch the failing region. Returns the patched source (to be compiled
+        again; its attempt stays open until then) or None when no usable patch came back.
+        """
+        error = compile_result.get("error_details")
+        started = time.monotonic()
+        attempt = {
+            "attempt": len(attempts) + 1,
+            "error_type": error.get("type") if error else None,
+            "error": compile_result.get("error", "")[:300],
+            "strategy": "llm",
+            "success": None,
+        }
+        attempts.append(attempt)
+        region, line = self._failing_region(tex, compile_result)
+        try:
+            patch = await self.llm.repair_latex(user_config, region, compile_result.get("error", ""), line)
+            patched = apply_patch(tex, patch.search, patch.replace)
+        except Exception as e:
+            print(f"[WARN] LLM repair failed: {e}")
+            patched = None
+        attempt["seconds"] = round(time.monotonic() - started, 3)
+        if patched is None or patched == tex:
+            attempt["success"] = False
+            attempt["note"] = "patch did not apply"
+            return None
+        return patched
@@ -0,0 +1,162 @@
+import os
+import time
+import uuid
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, Optional
+
+# Single-Flight Configuration
+redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "1") != "0"
+# Upper bound on one upstream call; also how long a crashed leader's lock can block followers
+SINGLE_FLIGHT_LOCK_SECONDS = int(os.getenv("SINGLE_FLIGHT_LOCK_SECONDS", "180"))
+# Followers read the leader's result within this window
+SINGLE_FLIGHT_RESULT_SECONDS = int(os.getenv("SINGLE_FLIGHT_RESULT_SECONDS", "30"))
+SINGLE_FLIGHT_POLL_SECONDS = 0.1
+
+PREFIX = "single_flight:"
+
+# Only delete the lock if it is still ours (it may have expired and been taken over)
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_client = None
+_release_script = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(redis_url, socket_timeout=0.25, socket_connect_timeout=0.25)
+    return _client
+
+
+def flight_key(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(str(part or "").encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls into one.
+
+    Within a process, callers with the same key await the first caller's future.
+    Across processes (API + workers), the first caller takes a Redis lock whose value is a
+    flight token; others poll result:{key}, which the leader writes before it drops the lock.
+    Lock and result are read together, so "lock gone, no result" reliably means the leader
+    failed. Then (or if Redis is unavailable) followers make the call themselves.
+    The Redis client is synchronous, so every call to it runs in a thread, off the event loop.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+        self.stats = {"leader": 0, "local_shared": 0, "remote_shared": 0, "fallback": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable], encode: Callable, decode: Callable):
+        if not SINGLE_FLIGHT_ENABLED:
+            return await fn()
+
+        local_key = (id(asyncio.get_running_loop()), key)
+        existing = self._inflight.get(local_key)
+        if existing is not None:
+            self.stats["local_shared"] += 1
+            # shield: one caller going away must not cancel the shared call
+            return await asyncio.shield(existing)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[local_key] = future
+        try:
+            result = await self._do_remote(key, fn, encode, decode)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure doesn't log "exception never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._inflight[local_key]
+
+    async def _do_remote(self, key: str, fn, encode, decode):
+        lock_key = f"{PREFIX}lock:{key}"
+        deadline = time.monotonic() + SINGLE_FLIGHT_LOCK_SECONDS
+        while True:
+            token = uuid.uuid4().hex
+            try:
+                acquired = await asyncio.to_thread(_redis().set, lock_key, token, nx=True, ex=SINGLE_FLIGHT_LOCK_SECONDS)
+            except Exception as e:
+                print(f"[WARN] Single-flight lock unavailable: {e}")
+                self.stats["fallback"] += 1
+                return await fn()
+
+            if acquired:
+                self.stats["leader"] += 1
+                return await self._lead(key, lock_key, token, fn, encode)
+
+            # Someone else is already making this call
+            result = await self._follow(key, lock_key, decode, deadline)
+            if result is not None:
+                self.stats["remote_shared"] += 1
+                return result
+            if time.monotonic() >= deadline:
+                self.stats["fallback"] += 1
+                return await fn()
+            # Leader failed without a result: try to lead ourselves
+
+    async def _lead(self, key: str, lock_key: str, token: str, fn, encode):
+        try:
+            result = await fn()
+        except BaseException:
+            await asyncio.to_thread(self._release, lock_key, token)
+            raise
+        await asyncio.to_thread(self._share, key, lock_key, token, encode(result))
+        return result
+
+    def _share(self, key: str, lock_key: str, token: str, payload: str):
+        try:
+            # Written before the lock is released, so a follower never sees neither
+            _redis().set(f"{PREFIX}result:{key}", payload, ex=SINGLE_FLIGHT_RESULT_SECONDS)
+        except Exception as e:
+            print(f"[WARN] Single-flight result not shared: {e}")
+        self._release(lock_key, token)
+
+    def _release(self, lock_key: str, token: str):
+        global _release_script
+        try:
+            if _release_script is None:
+                _release_script = _redis().register_script(RELEASE_SCRIPT)
+            _release_script(keys=[lock_key], args=[token])
+        except Exception as e:
+            print(f"[WARN] Single-flight lock not released: {e}")
+
+    async def _follow(self, key: str, lock_key: str, decode, deadline: float) -> Optional[object]:
+        while time.monotonic() < deadline:
+            try:
+                locked, raw = await asyncio.to_thread(self._poll, key, lock_key)
+            except Exception as e:
+                print(f"[WARN] Single-flight follow failed: {e}")
+                return None
+            if raw is not None:
+                return decode(raw.decode("utf-8"))
+            if not locked:
+                # Lock gone without a result: leader failed
+                return None
+            await asyncio.sleep(SINGLE_FLIGHT_POLL_SECONDS)
+        return None
+
+    def _poll(self, key: str, lock_key: str):
+        pipe = _redis().pipeline()  # MULTI/EXEC: one consistent view of lock + result
+        pipe.exists(lock_key)
+        pipe.get(f"{PREFIX}result:{key}")
+        return pipe.execute()
+
+
+llm_single_flight = SingleFlight()
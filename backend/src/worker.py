@@ -1,9 +1,14 @@
 import os
-import asyncio
-from celery import Celery
+import time
+from celery import Celery, chain
+from celery.signals import worker_process_init, worker_process_shutdown, worker_shutdown
 from src.services.llm_service import LLMService, OptimizationResult
 from src.services.compiler_service import CompilerService
 from src.services.file_service import FileService
+from src.services.repair_service import RepairService
+from src.services.pipeline_stats import STAGE_QUEUES, record_stage
+from src.services.event_loop import start_loop, stop_loop, run_async
+from src.services import job_events
 
 # Celery Configuration
 redis_url = os.getenv("REDIS_URL", "redis://redis:6379/0")
@@ -17,157 +22,344 @@ celery_app.conf.update(
     enable_utc=True,
 )
 
-@celery_app.task(bind=True)
-def optimize_resume_task(
-    self, 
-    workspace_id: str, 
-    template_filename: str, 
-    profile_filename: str, 
-    job_description: str, 
-    analysis_result: dict, 
-    output_filename: str, 
-    ignored_keywords: list[str],
-    manual_keywords: list[str],
-    workflow_id: str # New Argument
-):
+# Stage Routing
+# Each pipeline stage has its own queue so pools can be sized independently:
+# network-bound LLM stages with many threads, pdflatex stages with one process per core.
+celery_app.conf.task_routes = {
+    "src.worker.extract_inputs_task": {"queue": STAGE_QUEUES["extract"]},
+    "src.worker.load_version_task": {"queue": STAGE_QUEUES["extract"]},
+    "src.worker.optimize_llm_task": {"queue": STAGE_QUEUES["llm"]},
+    "src.worker.refine_llm_task": {"queue": STAGE_QUEUES["llm"]},
+    "src.worker.reanalyze_task": {"queue": STAGE_QUEUES["llm"]},
+    "src.worker.repair_llm_task": {"queue": STAGE_QUEUES["llm"]},
+    "src.worker.compile_stage_task": {"queue": STAGE_QUEUES["compile"]},
+    "src.worker.persist_result_task": {"queue": STAGE_QUEUES["persist"]},
+}
+
+
+# Per-Process Async Runtime
+# One long-lived loop (and one LLMService) per worker process, instead of
+# a fresh loop per task: HTTP connection pools built on the loop survive across tasks.
+# Threads-pool workers never fire worker_process_init; run_async() starts the loop lazily there.
+_llm_service = None
+
+@worker_process_init.connect
+def _init_worker_process(**kwargs):
+    start_loop()
+
+@worker_process_shutdown.connect
+@worker_shutdown.connect
+def _shutdown_worker_process(**kwargs):
+    stop_loop()
+
+def _get_llm_service() -> LLMService:
+    global _llm_service
+    if _llm_service is None:
+        _llm_service = LLMService()
+    return _llm_service
+
+
+def _mark_job_failed(job_id: str, error: Exception):
+    from src.db.session import SessionLocal
+    from src.db.models import Job
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if job:
+            job.status = "FAILED"
+            job.error_message = str(error)
+            db.commit()
+    except Exception as inner_e:
+        db.rollback()
+        print(f"Failed to update job status to FAILED: {inner_e}")
+    finally:
+        db.close()
+    job_events.publish(job_id, "error", {"error": str(error)})
+
+
+def _run_stage(stage: str, job_id: str, payload: dict, work, label: str = None):
     """
-    Celery task to handle resume optimization in the background.
+    Runs one pipeline stage: records queue wait + run time, publishes progress events,
+    and on error marks the job FAILED and re-raises so the rest of the chain is skipped.
+    """
+    started = time.time()
+    wait = max(0.0, started - payload.get("enqueued_at", started))
+    job_events.publish(job_id, "stage", {"stage": label or stage, "status": "started"})
+    try:
+        payload = work(payload)
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        record_stage(stage, wait, time.time() - started, failed=True)
+        _mark_job_failed(job_id, e)
+        raise
+    run = time.time() - started
+    record_stage(stage, wait, run)
+    job_events.publish(job_id, "stage", {"stage": label or stage, "status": "finished", "seconds": round(run, 3)})
+    payload.setdefault("stage_timings", {})[stage] = {"wait_seconds": round(wait, 3), "run_seconds": round(run, 3)}
+    payload["enqueued_at"] = time.time()
+    return payload
+
+
+# --- Optimize pipeline: extract -> LLM -> compile -> persist ---
+
+def _load_seed(workflow_id: str, template_filename: str):
+    """
+    Job description, latest compiled resume and score of an earlier workflow, for a warm start.
+    None unless that workflow was built from the same template: its resume replaces the template.
     """
-    # DB Setup for Worker
     from src.db.session import SessionLocal
-    from src.db.models import Job
+    from src.db.models import Workflow, Job
     db = SessionLocal()
-    
     try:
-        # Initialize Services
+        workflow = db.query(Workflow).filter(Workflow.id == workflow_id).first()
+        if not workflow or workflow.template_filename != template_filename:
+            return None
+        jobs = (
+            db.query(Job)
+            .filter(Job.workflow_id == workflow_id, Job.status == "SUCCESS")
+            .order_by(Job.updated_at.desc())
+            .all()
+        )
+        for job in jobs:
+            result_data = job.result_data or {}
+            tex_path = (result_data.get("compilation") or {}).get("tex_path")
+            if not tex_path or not os.path.exists(tex_path):
+                continue
+            with open(tex_path, "r", encoding="utf-8") as f:
+                tex = f.read()
+            score = (result_data.get("analysis") or {}).get("ats_score") or (result_data.get("optimization") or {}).get("final_score")
+            return {"job_description": workflow.job_description or "", "tex": tex, "score": score, "version": result_data.get("version")}
+        return None
+    finally:
+        db.close()
+
+
+@celery_app.task
+def extract_inputs_task(job_id: str, workspace_id: str, template_filename: str, profile_filename: str, seed_workflow_id: str = ""):
+    def work(payload):
         file_service = FileService()
-        llm_service = LLMService()
-        compiler_service = CompilerService()
 
-        # 1. Get Config
-        config = file_service.get_config(workspace_id)
-        
-        # 2. Get Files
+        # Near-duplicate of an earlier job description: start from that workflow's resume
+        if seed_workflow_id:
+            try:
+                payload["seed"] = _load_seed(seed_workflow_id, template_filename)
+            except Exception as e:
+                print(f"[WARN] Could not load seed workflow {seed_workflow_id}: {e}")
+
         resume_path = file_service.get_file_content(workspace_id, template_filename, "template")
         with open(resume_path, "r", encoding="utf-8") as f:
-            resume_text = f.read()
-            
+            payload["resume_text"] = f.read()
+
         import pypdf
         profile_path = file_service.get_file_content(workspace_id, profile_filename, "profile")
         reader = pypdf.PdfReader(str(profile_path))
         profile_text = ""
         for page in reader.pages:
             profile_text += page.extract_text()
-            
-        # 3. Optimize
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        opt_result: OptimizationResult = loop.run_until_complete(
-            llm_service.optimize_resume(
-                config, 
-                analysis_result, 
-                resume_text, 
-                job_description,
-                ignored_keywords,
-                manual_keywords
+        payload["profile_text"] = profile_text
+        return payload
+
+    return _run_stage("extract", job_id, {"enqueued_at": time.time()}, work)
+
+
+@celery_app.task
+def optimize_llm_task(
+    payload: dict,
+    job_id: str,
+    workspace_id: str,
+    job_description: str,
+    analysis_result: dict,
+    ignored_keywords: list[str],
+    manual_keywords: list[str]
+):
+    def work(payload):
+        config = FileService().get_config(workspace_id)
+        llm_service = _get_llm_service()
+        resume_text = payload.pop("resume_text")
+        seed = payload.pop("seed", None)
+
+        opt_result: OptimizationResult = None
+        if seed:
+            opt_result = run_async(
+                llm_service.optimize_from_seed(config, seed["tex"], seed["job_description"], job_description, seed.get("score"))
             )
-        )
-        loop.close()
-        
-        # 4. Compile
-        import uuid
-        # We reuse the workflow_id passed from API if possible, but for versioning logic we might need sub-ids
-        # For now, let's keep the file structure logic
-        # Architecture Note: The "Workflow" in DB tracks the session. 
-        # The file system "workflow_id" was used for folder separation. 
-        # Let's align them: usage of workflow_id in file path corresponds to DB workflow_id.
-        
-        version = "v1" # Initial optimization is always v1
-        
-        sanitized_latex = opt_result.new_latex_code.replace("\x00", "").replace("\u0000", "")
-        
-        compile_result = compiler_service.compile_resume(
-            workspace_id, 
-            sanitized_latex, 
-            output_filename, 
-            workflow_id=workflow_id,
-            version=version
-        )
-        
-        result_data = {
+        if opt_result is None:
+            opt_result = run_async(
+                llm_service.optimize_resume(
+                    config,
+                    analysis_result,
+                    resume_text,
+                    job_description,
+                    ignored_keywords,
+                    manual_keywords
+                )
+            )
+
+        payload.pop("profile_text", None)
+        payload["latex_code"] = opt_result.new_latex_code
+        payload["result_data"] = {
             "optimization": opt_result.model_dump(),
+            "optimization_stats": getattr(opt_result, "stats", {}),
+            # Analysis of the source resume, reusable by a later near-duplicate posting
+            "source_analysis": analysis_result
+        }
+        return payload
+
+    return _run_stage("llm", job_id, payload, work, label="optimize")
+
+
+@celery_app.task(bind=True)
+def compile_stage_task(self, payload: dict, job_id: str, workspace_id: str, output_filename: str, workflow_id: str, version: str):
+    def work(payload):
+        repair_service = RepairService(CompilerService())
+        state = payload.pop("repair_state", None)
+
+        if state and state.get("compile_result"):
+            # Back from an LLM repair that had no usable patch: the last compile stands
+            compile_result = state["compile_result"]
+            compile_result["repair"] = {"attempts": state["attempts"], "repaired": False}
+        else:
+            sanitized_latex = payload["latex_code"].replace("\x00", "").replace("\u0000", "")
+            # Failed compiles are repaired locally / with a small patch, never by re-running the rewrite
+            compile_result = repair_service.compile_with_local_repair(
+                workspace_id,
+                sanitized_latex,
+                output_filename,
+                workflow_id=workflow_id,
+                version=version,
+                attempts=state["attempts"] if state else None
+            )
+            tex = compile_result["repair"].pop("tex")
+            if repair_service.needs_llm(compile_result):
+                repair = compile_result.pop("repair")
+                payload["latex_code"] = tex
+                payload["repair_state"] = {"attempts": repair["attempts"], "compile_result": compile_result}
+                return payload
+
+        payload["result_data"].update({
             "compilation": compile_result,
+            "repair": compile_result.pop("repair"),
             "workflow_id": workflow_id,
             "version": version
-        }
-        
-        # Update DB - Success
-        job = db.query(Job).filter(Job.id == self.request.id).first()
-        if job:
-            job.status = "SUCCESS"
-            job.result_data = result_data
-            db.commit()
-            
-        return {
-            "status": "completed",
-            **result_data
-        }
+        })
+        # The PDF can be shown before re-analysis finishes
+        job_events.publish(job_id, "compiled", {
+            "success": compile_result["success"],
+            "error": compile_result.get("error"),
+            "output_filename": compile_result.get("output_filename"),
+            "version": version
+        })
+        return payload
 
-    except Exception as e:
-        db.rollback() # Critical: Rollback previous failed transaction
-        import traceback
-        traceback.print_exc()
-        
+    payload = _run_stage("compile", job_id, payload, work)
+    if "repair_state" in payload:
+        # The LLM patch is a network wait: make it on the llm queue, then come back here to compile
+        raise self.replace(chain(
+            repair_llm_task.s(payload, job_id, workspace_id),
+            compile_stage_task.s(job_id, workspace_id, output_filename, workflow_id, version)
+        ))
+    return payload
+
+
+@celery_app.task
+def repair_llm_task(payload: dict, job_id: str, workspace_id: str):
+    def work(payload):
+        config = FileService().get_config(workspace_id)
+        state = payload["repair_state"]
+        repair_service = RepairService(llm_service=_get_llm_service())
+        patched = run_async(
+            repair_service.llm_patch(config, payload["latex_code"], state["compile_result"], state["attempts"])
+        )
+        if patched is not None:
+            payload["latex_code"] = patched
+            del state["compile_result"]  # Stale now: the compile stage compiles the patch
+        return payload
+
+    return _run_stage("llm", job_id, payload, work, label="repair")
+
+
+@celery_app.task
+def persist_result_task(payload: dict, job_id: str):
+    def work(payload):
+        from src.db.session import SessionLocal
+        from src.db.models import Job
+        db = SessionLocal()
         try:
-            # Update DB - Failure
-            job = db.query(Job).filter(Job.id == self.request.id).first()
+            result_data = payload["result_data"]
+            job = db.query(Job).filter(Job.id == job_id).first()
             if job:
-                job.status = "FAILED"
-                job.error_message = str(e)
+                job.status = "SUCCESS"
+                job.result_data = {**result_data, "stage_timings": payload.get("stage_timings", {})}
                 db.commit()
-        except Exception as inner_e:
-            print(f"Failed to update job status to FAILED: {inner_e}")
-            
-        return {
-            "status": "failed",
-            "error": str(e)
-        }
-    finally:
-        db.close()
+        except Exception:
+            db.rollback() # Critical: Rollback previous failed transaction
+            raise
+        finally:
+            db.close()
+        return payload
 
+    payload = _run_stage("persist", job_id, payload, work)
+    job_events.publish(job_id, "done", {"status": "SUCCESS", "result": payload["result_data"]})
+    return {
+        "status": "completed",
+        **payload["result_data"]
+    }
 
-@celery_app.task(bind=True)
-def refine_resume_task(
-    self,
+
+def start_optimize_pipeline(
+    job_id: str,
     workspace_id: str,
-    workflow_id: str,
-    current_version: str,
-    current_tex_filename: str,
-    user_request: str,
-    output_filename: str,
+    template_filename: str,
+    profile_filename: str,
     job_description: str,
-    target_version: str = None
+    analysis_result: dict,
+    output_filename: str,
+    ignored_keywords: list[str],
+    manual_keywords: list[str],
+    workflow_id: str,
+    seed_workflow_id: str = ""
 ):
     """
-    Celery task to handle resume refinement in the background.
+    Enqueues the optimize pipeline for an existing Job row.
+    Initial optimization is always v1; the file system workflow_id is the DB workflow id.
+    seed_workflow_id warm-starts from an earlier workflow with a near-identical job description.
     """
+    return chain(
+        extract_inputs_task.s(job_id, workspace_id, template_filename, profile_filename, seed_workflow_id),
+        optimize_llm_task.s(job_id, workspace_id, job_description, analysis_result, ignored_keywords, manual_keywords),
+        compile_stage_task.s(job_id, workspace_id, output_filename, workflow_id, "v1"),
+        persist_result_task.s(job_id)
+    ).apply_async()
+
+
+# --- Refine pipeline: load -> LLM -> compile -> re-analyze (incremental or LLM) -> persist ---
+
+def _previous_analysis(workflow_id: str, version: str):
+    """The analysis stored with the latest successful job that produced `version`, if any."""
     from src.db.session import SessionLocal
     from src.db.models import Job
-    import re
     db = SessionLocal()
-
     try:
-        file_service = FileService()
-        llm_service = LLMService()
-        compiler_service = CompilerService()
+        jobs = (
+            db.query(Job)
+            .filter(Job.workflow_id == workflow_id, Job.status == "SUCCESS")
+            .order_by(Job.updated_at.desc())
+            .all()
+        )
+        for job in jobs:
+            result_data = job.result_data or {}
+            if result_data.get("version") == version and result_data.get("analysis"):
+                return result_data["analysis"]
+        return None
+    finally:
+        db.close()
 
-        # 1. Config
-        config = file_service.get_config(workspace_id)
 
-        # 2. Get current TeX
-        tex_path = file_service.get_file_content(
+@celery_app.task
+def load_version_task(job_id: str, workspace_id: str, workflow_id: str, current_version: str, current_tex_filename: str):
+    def work(payload):
+        tex_path = FileService().get_file_content(
             workspace_id,
             current_tex_filename + ".tex",
             "workflow_output",
@@ -175,88 +367,104 @@ def refine_resume_task(
             version=current_version
         )
         with open(tex_path, "r", encoding="utf-8") as f:
-            current_tex = f.read()
+            payload["current_tex"] = f.read()
+        # Lets the re-analysis stage update the score incrementally instead of calling the LLM
+        try:
+            payload["previous_analysis"] = _previous_analysis(workflow_id, current_version)
+        except Exception as e:
+            print(f"[WARN] Could not load previous analysis: {e}")
+        return payload
 
-        # 3. Refine (LLM) - run async in sync context
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        refine_result = loop.run_until_complete(
-            llm_service.refine_resume(config, current_tex, user_request)
-        )
+    return _run_stage("extract", job_id, {"enqueued_at": time.time()}, work)
 
-        # 4. Determine new version
-        if target_version:
-            new_version = target_version
-        else:
-            match = re.search(r"v(\d+)", current_version)
-            if match:
-                v_num = int(match.group(1)) + 1
-                new_version = f"v{v_num}"
-            else:
-                new_version = "v2"
-
-        # 5. Compile
-        sanitized_latex = refine_result.new_latex_code.replace("\x00", "").replace("\u0000", "")
-        compile_result = compiler_service.compile_resume(
-            workspace_id,
-            sanitized_latex,
-            output_filename,
-            workflow_id=workflow_id,
-            version=new_version
-        )
 
-        # 6. Re-Analyze (Auto-Score)
+@celery_app.task
+def refine_llm_task(payload: dict, job_id: str, workspace_id: str, user_request: str, stream: bool = False):
+    def work(payload):
+        config = FileService().get_config(workspace_id)
+        llm_service = _get_llm_service()
+
+        # Streaming: tokens go out over the job's event channel as they arrive
+        relay = job_events.TokenRelay(job_id) if stream else None
+        payload["previous_tex"] = payload.pop("current_tex")
         try:
-            new_analysis = loop.run_until_complete(
-                llm_service.analyze_resume(config, refine_result.new_latex_code, job_description)
+            refine_result = run_async(
+                llm_service.refine_resume(config, payload["previous_tex"], user_request, on_token=relay)
             )
-        except Exception as e:
-            print(f"[ERROR] Re-analysis failed: {e}")
-            import traceback
-            traceback.print_exc()
-            new_analysis = None
-
-        loop.close()
+        finally:
+            if relay:
+                relay.close()  # Every token goes out before the stage's "finished" event
 
-        result_data = {
+        payload["latex_code"] = refine_result.new_latex_code
+        payload["result_data"] = {
             "refinement": refine_result.model_dump() if hasattr(refine_result, 'model_dump') else {"summary": str(refine_result), "new_latex_code": refine_result.new_latex_code},
-            "compilation": compile_result,
-            "analysis": new_analysis.model_dump() if new_analysis and hasattr(new_analysis, 'model_dump') else new_analysis,
-            "workflow_id": workflow_id,
-            "version": new_version
+            # patch vs full regeneration, output size and LLM time
+            "refinement_stats": getattr(refine_result, "stats", {})
         }
+        return payload
 
-        # Update DB - Success
-        job = db.query(Job).filter(Job.id == self.request.id).first()
-        if job:
-            job.status = "SUCCESS"
-            job.result_data = result_data
-            db.commit()
+    return _run_stage("llm", job_id, payload, work, label="refine")
 
-        return {
-            "status": "completed",
-            **result_data
-        }
 
-    except Exception as e:
-        db.rollback() # Critical: Rollback previous failed transaction
-        import traceback
-        traceback.print_exc()
+@celery_app.task
+def reanalyze_task(payload: dict, job_id: str, workspace_id: str, job_description: str):
+    def work(payload):
+        from src.services.ats_scorer import rescore_incremental
 
-        try:
-            # Re-query job in clean session state
-            job = db.query(Job).filter(Job.id == self.request.id).first()
-            if job:
-                job.status = "FAILED"
-                job.error_message = str(e)
-                # Workflow doesn't have status field, relying on Job status for UI
-                db.commit()
-        except Exception as inner_e:
-            print(f"Failed to update job status to FAILED: {inner_e}")
+        previous_analysis = payload.pop("previous_analysis", None)
+        previous_tex = payload.pop("previous_tex", None)
+
+        # Re-Analyze (Auto-Score): small edits only recheck the keywords they touched
+        started = time.monotonic()
+        new_analysis = None
+        if previous_analysis and previous_tex:
+            new_analysis = rescore_incremental(previous_analysis, previous_tex, payload["latex_code"])
 
-        return {
-            "status": "failed",
-            "error": str(e)
+        if new_analysis is None:
+            config = FileService().get_config(workspace_id)
+            llm_service = _get_llm_service()
+            try:
+                new_analysis = run_async(
+                    llm_service.analyze_resume(config, payload["latex_code"], job_description)
+                ).model_dump()
+            except Exception as e:
+                print(f"[ERROR] Re-analysis failed: {e}")
+                import traceback
+                traceback.print_exc()
+                new_analysis = None
+
+        payload["result_data"]["analysis"] = new_analysis
+        payload["result_data"]["analysis_stats"] = {
+            "mode": (new_analysis or {}).get("scorer", "llm"),
+            "seconds": round(time.monotonic() - started, 3)
         }
-    finally:
-        db.close()
+        if new_analysis:
+            job_events.publish(job_id, "analysis", {"ats_score": new_analysis["ats_score"]})
+        return payload
+
+    return _run_stage("llm", job_id, payload, work, label="analysis")
+
+
+def start_refine_pipeline(
+    job_id: str,
+    workspace_id: str,
+    workflow_id: str,
+    current_version: str,
+    current_tex_filename: str,
+    user_request: str,
+    output_filename: str,
+    job_description: str,
+    new_version: str,
+    stream: bool = False
+):
+    """
+    Enqueues the refine pipeline for an existing Job row, producing new_version.
+    stream=True relays the LLM's tokens as job events (see /actions/jobs/{job_id}/events).
+    """
+    return chain(
+        load_version_task.s(job_id, workspace_id, workflow_id, current_version, current_tex_filename),
+        refine_llm_task.s(job_id, workspace_id, user_request, stream),
+        compile_stage_task.s(job_id, workspace_id, output_filename, workflow_id, new_version),
+        reanalyze_task.s(job_id, workspace_id, job_description),
+        persist_result_task.s(job_id)
+    ).apply_async()
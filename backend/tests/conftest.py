@@ -0,0 +1,5 @@
+import sys
+import pathlib
+
+# Tests import the app as `src.…`, the same way the API and worker run it from backend/
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
@@ -0,0 +1,156 @@
+from src.services import ats_scorer
+from src.services.ats_scorer import PhraseMatcher, rescore_incremental, score_resume, tokenize
+
+RESUME = "\n".join([
+    "\\section{Experience}",
+    "Backend engineer at Acme, building payment services.",
+    "Owned the billing pipeline and its on-call rotation for two years.",
+    "Cut p99 latency of the checkout API by forty percent.",
+    "Mentored four engineers and ran the weekly design review.",
+    "Moved nightly batch jobs to an event-driven queue with retries.",
+    "Wrote the runbooks and dashboards the support team still uses.",
+    "Software engineer at Initech, maintaining the internal reporting tools.",
+    "Rewrote the report generator, cutting nightly run time from hours to minutes.",
+    "Added integration tests to every service the team owned.",
+    "Migrated the document store to a managed database without downtime.",
+    "Introduced code review guidelines adopted across three teams.",
+    "Automated release notes from merged changes and ticket links.",
+    "Paired with product managers on quarterly planning and estimates.",
+    "Replaced hand-written deployment scripts with a single pipeline.",
+    "Tracked down a memory leak that had paged the team for months.",
+    "Built a feature flag service used by every web client.",
+    "\\section{Education}",
+    "Bachelor of Science in Computer Science, State University.",
+    "\\section{Skills}",
+    "Python, Spring Boot, PostgreSQL, Redis, Linux, Git",
+])
+PREVIOUS = {
+    "ats_score": 60,
+    "matched_keywords": ["Python", "Spring Boot"],
+    "missing_keywords": ["Kubernetes", "Distributed Systems"],
+    "justification": {"keyword_match": "2/4 job keywords found."},
+}
+
+JD = (
+    "Senior Backend Engineer. We need Python, Kubernetes and Spring Boot experience, "
+    "plus a background in distributed systems. Python services run on Kubernetes."
+)
+
+
+def test_matcher_counts_multi_word_phrases():
+    matcher = PhraseMatcher({"Spring Boot": ["spring boot"], "Spring": ["spring"]})
+    counts = matcher.count(tokenize("Built services with Spring Boot, then plain Spring."))
+
+    assert counts["Spring Boot"] == 1
+    assert counts["Spring"] == 2  # the single word also matches inside the phrase
+
+
+def test_matcher_folds_plurals_and_case():
+    matcher = PhraseMatcher({"Microservices": ["microservices"], "Distributed Systems": ["distributed systems"]})
+    counts = matcher.count(tokenize("Designed a MICROSERVICE for a Distributed System."))
+
+    assert counts["Microservices"] == 1
+    assert counts["Distributed Systems"] == 1
+
+
+def test_matcher_needs_the_whole_phrase():
+    matcher = PhraseMatcher({"Spring Boot": ["spring boot"]})
+
+    assert not matcher.count(tokenize("Spring cleaning, boot camp"))
+
+
+def test_matched_and_missing_keywords():
+    result = score_resume("Backend engineer. PYTHON and spring boot on distributed system.", JD)
+
+    assert {"Python", "Spring Boot", "Distributed Systems"} <= set(result["matched_keywords"])
+    assert "Kubernetes" in result["missing_keywords"]
+    assert not set(result["matched_keywords"]) & set(result["missing_keywords"])
+    assert result["scorer"] == "local"
+
+
+def test_latex_resume_is_matched_on_its_text():
+    resume = "\\section{Skills} \\textbf{Python}, \\emph{Kubernetes}"
+    result = score_resume(resume, JD)
+
+    assert {"Python", "Kubernetes"} <= set(result["matched_keywords"])
+
+
+def test_adding_a_keyword_raises_the_score():
+    base = "Backend engineer. Python and Spring Boot."
+    before = score_resume(base, JD)
+    after = score_resume(base + " Deployed on Kubernetes.", JD)
+
+    assert "Kubernetes" in before["missing_keywords"]
+    assert "Kubernetes" in after["matched_keywords"]
+    assert after["ats_score"] > before["ats_score"]
+
+
+def test_score_never_drops_as_keywords_are_added():
+    resume = "Backend engineer."
+    scores = [score_resume(resume, JD)["ats_score"]]
+    for addition in ["Python.", "Kubernetes.", "Spring Boot.", "Distributed systems."]:
+        resume += " " + addition
+        scores.append(score_resume(resume, JD)["ats_score"])
+
+    assert scores == sorted(scores)
+    assert 0 <= scores[0] and scores[-1] <= 100
+
+
+def test_small_edit_is_rescored_locally():
+    edited = RESUME.replace("Git", "Git, Kubernetes")
+    result = rescore_incremental(PREVIOUS, RESUME, edited)
+
+    assert result["scorer"] == "incremental"
+    assert result["rescore"]["promoted"] == ["Kubernetes"]
+    assert "Kubernetes" in result["matched_keywords"]
+    assert "Kubernetes" not in result["missing_keywords"]
+    assert result["ats_score"] > PREVIOUS["ats_score"]
+    assert result["rescore"]["steps"] == 1
+
+
+def test_removing_a_literal_mention_demotes_it():
+    edited = RESUME.replace("Python, Spring Boot", "Spring Boot")
+    result = rescore_incremental(PREVIOUS, RESUME, edited)
+
+    assert result["rescore"]["demoted"] == ["Python"]
+    assert "Python" in result["missing_keywords"]
+    assert result["ats_score"] < PREVIOUS["ats_score"]
+
+
+def test_large_edit_needs_a_full_analysis():
+    assert rescore_incremental(PREVIOUS, RESUME, RESUME + "\nKubernetes" * 200) is None
+
+
+def test_chain_stops_at_the_step_bound(monkeypatch):
+    monkeypatch.setattr(ats_scorer, "INCREMENTAL_RESCORE_MAX_STEPS", 2)
+    previous, tex = PREVIOUS, RESUME
+    for i in range(2):
+        edited = tex + f"\nShipped release {i}."
+        previous = rescore_incremental(previous, tex, edited)
+        assert previous["rescore"]["steps"] == i + 1
+        tex = edited
+
+    assert rescore_incremental(previous, tex, tex + "\nShipped release 2.") is None
+
+
+def test_cumulative_drift_stops_the_chain(monkeypatch):
+    # Each edit stays under the per-edit threshold, but together they rewrite the resume
+    monkeypatch.setattr(ats_scorer, "INCREMENTAL_RESCORE_MAX_STEPS", 100)
+    previous, tex = PREVIOUS, RESUME
+    results = []
+    for i in range(20):
+        edited = tex + f"\nLed migration project number {i} to a new platform."
+        previous = rescore_incremental(previous, tex, edited)
+        if previous is None:
+            break
+        assert previous["rescore"]["change_ratio"] <= ats_scorer.INCREMENTAL_RESCORE_THRESHOLD
+        results.append(previous)
+        tex = edited
+
+    assert previous is None
+    assert results and results[-1]["rescore"]["drift"] <= ats_scorer.INCREMENTAL_RESCORE_MAX_DRIFT
+
+
+def test_nothing_to_update_from():
+    assert rescore_incremental({}, RESUME, RESUME) is None
+    assert rescore_incremental({"ats_score": 50}, RESUME, RESUME) is None
@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from src.services import llm_routing
+from src.services.llm_routing import CircuitBreaker, limiter_key
+
+MODEL = {"provider": "openai", "model_id": "gpt-test", "api_key": "sk-test"}
+
+
+def half_open(breaker: CircuitBreaker):
+    """Trips the breaker and backdates it past the cooldown, so the next allow() is the trial."""
+    for _ in range(llm_routing.BREAKER_FAILURES):
+        breaker.failure(MODEL)
+    breaker._state[limiter_key(MODEL)]["opened_at"] -= llm_routing.BREAKER_COOLDOWN_SECONDS
+
+
+def test_released_trial_lets_the_next_call_through():
+    breaker = CircuitBreaker()
+    half_open(breaker)
+
+    assert breaker.allow(MODEL)
+    assert not breaker.allow(MODEL)  # one trial at a time
+    breaker.release(MODEL)
+    assert breaker.allow(MODEL)
+
+
+def test_unreported_trial_expires():
+    breaker = CircuitBreaker()
+    half_open(breaker)
+
+    assert breaker.allow(MODEL)
+    breaker._state[limiter_key(MODEL)]["trial_at"] -= llm_routing.BREAKER_COOLDOWN_SECONDS
+    assert breaker.allow(MODEL)
+
+
+def test_cancelled_trial_call_releases_the_breaker(monkeypatch):
+    llm_service = pytest.importorskip("src.services.llm_service")
+    from src.services import rate_limiter
+
+    class FakeMistral:
+        class chat:
+            @staticmethod
+            async def complete_async(**kwargs):
+                await asyncio.sleep(3600)
+
+    breaker = CircuitBreaker()
+    monkeypatch.setattr(llm_service, "circuit_breaker", breaker)
+    monkeypatch.setattr(llm_service, "Mistral", FakeMistral)
+    monkeypatch.setattr(rate_limiter, "LLM_RATE_LIMIT_ENABLED", False)
+    service = llm_service.LLMService.__new__(llm_service.LLMService)
+
+    async def scenario():
+        half_open(breaker)
+        assert breaker.allow(MODEL)  # this call is the half-open trial
+        trial = asyncio.ensure_future(
+            service._invoke_once(FakeMistral(), MODEL, "prompt", llm_service.AnalysisResult, 0.2)
+        )
+        await asyncio.sleep(0)
+        trial.cancel()  # e.g. lost the hedge race
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+    asyncio.run(scenario())
+    assert breaker._state[limiter_key(MODEL)]["state"] == "half_open"
+    assert breaker.allow(MODEL)
@@ -0,0 +1,50 @@
+import os
+import time
+
+import pytest
+
+from src.services import format_cache
+from src.services.format_cache import FormatCache
+
+TEX = "\\documentclass{article}\n\\usepackage{hyperref}\n\\begin{document}\nHi\n\\end{document}\n"
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(format_cache, "FORMATS_ENABLED", True)
+    cache = FormatCache(tmp_path)
+    monkeypatch.setattr(cache, "format_name", lambda preamble: "pre_test")
+    builds = []
+
+    def build(name, preamble):
+        builds.append(name)
+        return False
+
+    monkeypatch.setattr(cache, "_build", build)
+    cache.builds = builds
+    return cache
+
+
+def test_fresh_failure_marker_skips_the_build(cache):
+    cache.mark_failed("pre_test")
+
+    assert cache.get_format(TEX) is None
+    assert cache.builds == []
+
+
+def test_expired_failure_marker_is_retried(cache):
+    cache.mark_failed("pre_test")
+    marker = cache.root / "pre_test.failed"
+    stale = time.time() - format_cache.FORMAT_RETRY_SECONDS - 1
+    os.utime(marker, (stale, stale))
+
+    assert cache.get_format(TEX) is None
+    assert cache.builds == ["pre_test"]
+    assert not marker.exists()
+
+
+def test_existing_format_is_used(cache):
+    (cache.root / "pre_test.fmt").touch()
+
+    assert cache.get_format(TEX) == "pre_test"
+    assert cache.builds == []
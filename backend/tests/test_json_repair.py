@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from src.services.json_repair import TruncatedJSON, repair_json
+
+
+def parse(content: str):
+    text, repairs = repair_json(content)
+    return json.loads(text, strict=False), repairs
+
+
+def test_fenced_reply_with_prose_around_it():
+    content = 'Here is the result:\n```json\n{"ats_score": 80}\n```\nLet me know if you need more.'
+    data, repairs = parse(content)
+
+    assert data == {"ats_score": 80}
+    assert "surrounding_text" in repairs
+
+
+def test_fence_only_reply():
+    data, repairs = parse('```json\n{"ats_score": 80}\n```')
+
+    assert data == {"ats_score": 80}
+    assert repairs == ["markdown_fence"]
+
+
+def test_latex_commands_inside_strings_survive():
+    content = r'{"tex": "\section{Skills} \textbf{Python} \begin{itemize} \frac{1}{2} \newline"}'
+    data, repairs = parse(content)
+
+    assert data["tex"] == r"\section{Skills} \textbf{Python} \begin{itemize} \frac{1}{2} \newline"
+    assert "latex_escapes" in repairs
+
+
+def test_real_escapes_are_kept():
+    content = r'{"text": "first\nNext line \"quoted\" \\ done\t42 é"}'
+    data, repairs = parse(content)
+
+    assert data["text"] == 'first\nNext line "quoted" \\ done\t42 é'
+    assert repairs == []
+
+
+def test_trailing_commas_are_removed():
+    data, repairs = parse('{"matched": ["Python", "SQL",], "score": 70,}')
+
+    assert data == {"matched": ["Python", "SQL"], "score": 70}
+    assert repairs == ["trailing_commas"]
+
+
+def test_commas_inside_strings_are_untouched():
+    data, repairs = parse('{"note": "a, }"}')
+
+    assert data == {"note": "a, }"}
+    assert repairs == []
+
+
+def test_truncated_tail_raises():
+    with pytest.raises(TruncatedJSON):
+        repair_json('{"ats_score": 80, "missing_keywords": ["Kubernetes", "Ter')
+
+
+def test_no_object_is_a_plain_value_error():
+    with pytest.raises(ValueError) as excinfo:
+        repair_json("I cannot help with that.")
+    assert not isinstance(excinfo.value, TruncatedJSON)
+
+
+def test_valid_json_is_unchanged():
+    content = json.dumps({"ats_score": 72, "matched_keywords": ["Python"], "nested": {"a": [1, 2]}})
+    text, repairs = repair_json(content)
+
+    assert text == content
+    assert repairs == []
@@ -0,0 +1,74 @@
+from src.services.latex_patch import apply_edits
+
+TEX = "\n".join([
+    "\\section{Experience}",
+    "\\resumeItem{Built payment services in Java}",
+    "\\resumeItem{Ran the weekly design review}",
+    "\\section{Skills}",
+    "Java, SQL",
+])
+
+
+def test_unique_match_is_applied():
+    result = apply_edits(TEX, [{"search": "payment services in Java", "replace": "payment services in Python"}])
+
+    assert result["error"] is None
+    assert result["applied"] == 1
+    assert result["tex"] == TEX.replace("payment services in Java", "payment services in Python")
+
+
+def test_trailing_whitespace_in_the_source_still_matches():
+    tex = TEX.replace("in Java}", "in Java}   ")
+    result = apply_edits(tex, [{"search": "\\resumeItem{Built payment services in Java}\n", "replace": "\\resumeItem{Built it}\n"}])
+
+    assert result["error"] is None
+    assert "\\resumeItem{Built it}" in result["tex"]
+
+
+def test_zero_matches_are_rejected():
+    result = apply_edits(TEX, [{"search": "Kubernetes", "replace": "Docker"}])
+
+    assert result["tex"] is None
+    assert result["applied"] == 0
+    assert "not found" in result["error"]
+
+
+def test_empty_search_is_rejected():
+    result = apply_edits(TEX, [{"search": "", "replace": "anything"}])
+
+    assert result["tex"] is None
+    assert "not found" in result["error"]
+
+
+def test_multiple_matches_are_rejected():
+    result = apply_edits(TEX, [{"search": "Java", "replace": "Python"}])
+
+    assert result["tex"] is None
+    assert "matches 2 places" in result["error"]
+
+
+def test_edits_apply_in_order_against_the_updated_text():
+    edits = [
+        {"search": "Java, SQL", "replace": "Python, SQL"},
+        # "Java" is unique only once the first edit has gone in
+        {"search": "Java", "replace": "Kotlin"},
+        {"search": "Python, SQL", "replace": "Python, SQL, Redis"},
+    ]
+    result = apply_edits(TEX, edits)
+
+    assert result["error"] is None
+    assert result["applied"] == 3
+    assert "\\resumeItem{Built payment services in Kotlin}" in result["tex"]
+    assert result["tex"].endswith("Python, SQL, Redis")
+
+
+def test_failure_reports_the_failing_edit_and_discards_earlier_ones():
+    edits = [
+        {"search": "Java, SQL", "replace": "Python, SQL"},
+        {"search": "Kubernetes", "replace": "Docker"},
+    ]
+    result = apply_edits(TEX, edits)
+
+    assert result["tex"] is None
+    assert result["applied"] == 1
+    assert result["error"].startswith("edit 2:")
@@ -0,0 +1,148 @@
+from src.services.latex_validator import LatexValidator
+
+PREAMBLE = "\\documentclass{article}\n\\usepackage{hyperref}\n"
+
+
+def document(body: str) -> str:
+    return f"{PREAMBLE}\\begin{{document}}\n{body}\n\\end{{document}}\n"
+
+
+def codes(report):
+    return [d["code"] for d in report["diagnostics"]]
+
+
+def test_clean_document_passes_unchanged():
+    tex = document("\\section{Skills}\n\\textbf{Python} \\& SQL, 30\\% faster\n\\begin{tabular}{ll} a & b \\end{tabular}")
+    report = LatexValidator().validate(tex)
+
+    assert report["valid"]
+    assert report["diagnostics"] == []
+    assert report["fixed_tex"] == tex
+
+
+def test_percent_after_a_number_is_escaped():
+    tex = document("Cut latency by 40% in a quarter % a real comment")
+    report = LatexValidator().validate(tex)
+
+    assert codes(report) == ["unescaped_percent"]
+    assert "by 40\\% in a quarter % a real comment" in report["fixed_tex"]
+    assert report["valid"]
+
+
+def test_fixes_in_one_paragraph_are_applied_in_source_order():
+    tex = document("Saved $2M for R&D")
+    report = LatexValidator().validate(tex)
+
+    assert "Saved \\$2M for R\\&D" in report["fixed_tex"]
+
+
+def test_ampersand_outside_a_table_is_escaped():
+    tex = document("Research & Development\n\\begin{tabular}{ll} a & b \\end{tabular}")
+    report = LatexValidator().validate(tex)
+
+    assert codes(report) == ["unescaped_ampersand"]
+    assert "Research \\& Development" in report["fixed_tex"]
+    assert "a & b" in report["fixed_tex"]
+
+
+def test_lone_dollar_is_escaped():
+    tex = document("\\resumeItem{Saved $2M a year}\n\\resumeItem{Cut costs by $300k}")
+    report = LatexValidator().validate(tex)
+
+    assert codes(report) == ["unescaped_dollar", "unescaped_dollar"]
+    assert "Saved \\$2M a year" in report["fixed_tex"]
+    assert "Cut costs by \\$300k" in report["fixed_tex"]
+    assert report["valid"]
+
+
+def test_math_and_escaped_dollars_are_left_alone():
+    tex = document("Raised \\$2M; solved $x^{2}$ and $\\frac{a}{b}$ faster\n\\textbf{$O(n)$}\n\n$$e = mc^2$$")
+    report = LatexValidator().validate(tex)
+
+    assert report["diagnostics"] == []
+    assert report["fixed_tex"] == tex
+
+
+def test_odd_dollars_in_a_paragraph_are_reported():
+    tex = document("Solved $x$ for $2M")
+    report = LatexValidator().validate(tex, autofix=False)
+
+    assert codes(report) == ["unbalanced_math"]
+    assert report["valid"]
+
+
+def test_url_arguments_keep_special_characters():
+    tex = document("\\href{https://example.com/a%20b#c&d}{link}")
+    report = LatexValidator().validate(tex)
+
+    assert report["diagnostics"] == []
+
+
+def test_unbalanced_braces_are_errors():
+    validator = LatexValidator()
+
+    unclosed = validator.validate(document("\\textbf{Python"))
+    assert "unclosed_brace" in codes(unclosed)
+    assert not unclosed["valid"]
+
+    extra = validator.validate(document("Python}"))
+    assert "unmatched_close_brace" in codes(extra)
+    assert not extra["valid"]
+
+
+def test_mismatched_environments_are_errors():
+    report = LatexValidator().validate(document("\\begin{itemize}\n\\item Python\n\\end{enumerate}"))
+
+    assert "environment_mismatch" in codes(report)
+    assert not report["valid"]
+
+
+def test_unclosed_environment_is_an_error():
+    tex = f"{PREAMBLE}\\begin{{document}}\n\\begin{{itemize}}\n\\item Python\n"
+    report = LatexValidator().validate(tex)
+
+    assert "unclosed_environment" in codes(report)
+    assert not report["valid"]
+
+
+def test_truncated_document_gets_its_end():
+    tex = f"{PREAMBLE}\\begin{{document}}\n\\section{{Skills}} Python"
+    report = LatexValidator().validate(tex)
+
+    assert codes(report) == ["missing_end_document"]
+    assert report["valid"]
+    assert report["fixed_tex"].rstrip().endswith("\\end{document}")
+
+
+def test_missing_end_document_with_open_braces_is_not_fixed():
+    tex = f"{PREAMBLE}\\begin{{document}}\n\\textbf{{Python"
+    report = LatexValidator().validate(tex)
+
+    assert "missing_end_document" in codes(report)
+    assert not report["valid"]
+    assert "\\end{document}" not in report["fixed_tex"]
+
+
+def test_missing_begin_document():
+    report = LatexValidator().validate("\\section{Skills} Python")
+
+    assert codes(report) == ["missing_begin_document"]
+    assert not report["valid"]
+
+
+def test_autofix_off_reports_without_rewriting():
+    tex = document("Cut latency by 40% with R&D for $5")
+    report = LatexValidator().validate(tex, autofix=False)
+
+    assert codes(report) == ["unescaped_percent", "unescaped_ampersand", "unescaped_dollar"]
+    assert report["fixes"] == []
+    assert report["fixed_tex"] == tex
+
+
+def test_diagnostic_positions_point_into_the_source():
+    tex = document("line one\nR&D")
+    report = LatexValidator().validate(tex)
+
+    (diagnostic,) = report["diagnostics"]
+    line = tex.split("\n")[diagnostic["line"] - 1]
+    assert line[diagnostic["column"] - 1] == "&"
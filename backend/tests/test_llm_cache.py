@@ -0,0 +1,72 @@
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from src.services import llm_cache
+from src.services.llm_cache import LLMResponseCache
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = fakeredis.FakeRedis()
+    monkeypatch.setattr(llm_cache, "_client", client)
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", True)
+    return client
+
+
+def stored_bytes(cache: LLMResponseCache, client) -> int:
+    return sum(int(s) for s in client.hvals(cache.sizes_key))
+
+
+def test_byte_counter_tracks_stores_and_overwrites(client):
+    cache = LLMResponseCache("test", max_bytes=10_000)
+    cache.set("a", "x" * 100, 10)
+    cache.set("b", "y" * 50, 5)
+    cache.set("a", "x" * 20, 2)
+
+    assert cache.get("a") == "x" * 20
+    assert int(client.get(cache.bytes_key)) == stored_bytes(cache, client) == 21 + 51
+    assert cache.get_stats()["bytes"] == 72
+
+
+def test_oldest_entries_are_evicted_past_the_limit(client):
+    cache = LLMResponseCache("test", max_bytes=250)
+    for name in "abcd":
+        cache.set(name, name * 100, 1)
+
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("c") == "c" * 100
+    assert cache.get("d") == "d" * 100
+    assert int(client.get(cache.bytes_key)) == stored_bytes(cache, client) == 202
+    assert cache.get_stats()["evictions"] == 2
+
+
+def test_no_eviction_under_the_limit(client):
+    cache = LLMResponseCache("test", max_bytes=10_000)
+    for name in "abcd":
+        cache.set(name, name * 100, 1)
+
+    assert client.zcard(cache.index_key) == 4
+    assert cache.get_stats()["evictions"] == 0
+
+
+def test_expired_entries_leave_the_total(client, monkeypatch):
+    cache = LLMResponseCache("test", ttl=60, max_bytes=10_000)
+    cache.set("old", "o" * 100, 1)
+    later = llm_cache.time.time() + 120
+    monkeypatch.setattr(llm_cache.time, "time", lambda: later)
+    cache.set("new", "n" * 10, 1)
+
+    assert client.zrange(cache.index_key, 0, -1) == [b"new"]
+    assert int(client.get(cache.bytes_key)) == 13
+
+
+def test_concurrent_drop_does_not_double_count(client):
+    cache = LLMResponseCache("test", max_bytes=10_000)
+    cache.set("a", "a" * 100, 1)
+    cache.set("b", "b" * 100, 1)
+    cache._drop(client, [b"a"])
+    cache._drop(client, [b"a"])  # already gone
+
+    assert int(client.get(cache.bytes_key)) == 101
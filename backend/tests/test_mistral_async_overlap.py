@@ -0,0 +1,105 @@
+import json
+import time
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+REQUESTS = 6
+LATENCY = 0.5
+
+ANALYSIS = json.dumps({
+    "ats_score": 72,
+    "missing_keywords": ["Kubernetes"],
+    "matched_keywords": ["Python"],
+    "justification": {
+        "keyword_match": "ok", "skill_depth": "ok", "role_fit": "ok",
+        "experience_relevance": "ok", "education_fit": "ok", "parsing_quality": "ok"
+    }
+})
+
+
+class StubMistralHandler(BaseHTTPRequestHandler):
+    """Speaks the Mistral chat-completions API, holding each request LATENCY seconds."""
+    protocol_version = "HTTP/1.1"
+    in_flight = 0
+    max_in_flight = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        cls = StubMistralHandler
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        time.sleep(LATENCY)
+        with cls.lock:
+            cls.in_flight -= 1
+
+        body = json.dumps({
+            "id": "stub",
+            "object": "chat.completion",
+            "model": "mistral-stub",
+            "created": int(time.time()),
+            "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": ANALYSIS}}],
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    StubMistralHandler.in_flight = StubMistralHandler.max_in_flight = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubMistralHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_concurrent_mistral_analyze_calls_overlap(stub_server, monkeypatch):
+    pytest.importorskip("mistralai")
+    llm_service = pytest.importorskip("src.services.llm_service")
+    if llm_service.Mistral is None:
+        pytest.skip("mistralai SDK without the Mistral client")
+    from src.services import llm_cache, single_flight, rate_limiter
+
+    # Only the Mistral round trips are under test: no Redis-backed layers in front of them
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_ENABLED", False)
+    monkeypatch.setattr(single_flight, "SINGLE_FLIGHT_ENABLED", False)
+    monkeypatch.setattr(rate_limiter, "LLM_RATE_LIMIT_ENABLED", False)
+
+    class StubMistralLLMService(llm_service.LLMService):
+        def _build_llm(self, config):
+            return llm_service.Mistral(api_key=config.get("api_key"), server_url=stub_server)
+
+    service = StubMistralLLMService()
+    with open(service.catalog_path, "r") as f:
+        mistral = next(c for c in json.load(f) if c["provider"] == "mistral")
+    config = {
+        "selected_llm_id": "stub",
+        "llm_inventory": [{"id": "stub", "sdk_id": mistral["id"], "model_id": mistral["model_name"], "api_key": "stub-key"}],
+        "prompts": {},
+    }
+
+    async def fire():
+        return await asyncio.gather(*[
+            service.analyze_resume(config, f"\\section{{Skills}} Python {i}", "Python and Kubernetes engineer", use_cache=False)
+            for i in range(REQUESTS)
+        ])
+
+    started = time.perf_counter()
+    results = asyncio.run(fire())
+    elapsed = time.perf_counter() - started
+
+    assert [r.ats_score for r in results] == [72] * REQUESTS
+    assert StubMistralHandler.max_in_flight > 1
+    # Serialized calls would take REQUESTS x LATENCY
+    assert elapsed < REQUESTS * LATENCY * 0.5
@@ -50,6 +50,7 @@ export default function ResumePreview({ baseFilename, jobDescription, initialSco
     const [latexSource, setLatexSource] = useState("");
     const [refinementInput, setRefinementInput] = useState("");
     const [isManualCompiling, setIsManualCompiling] = useState(false);
+    const [liveOutput, setLiveOutput] = useState<Record<string, string>>({}); // Streamed LLM text per version
 
     // Fetch TeX Content
     const getDownloadUrl = (ext: 'pdf' | 'tex' | 'log') => {
@@ -109,6 +110,32 @@ export default function ResumePreview({ baseFilename, jobDescription, initialSco
         console.log("Download URL (PDF):", getDownloadUrl('pdf'));
     }, [currentVersion, versions, refinementInput]); // varied dep array for debugging
 
+    // Apply a finished refine job's result to its version card
+    const applyRefineResult = (versionId: string, result: any) => {
+        const isSuccess = result?.compilation?.success !== false;
+        setVersions(prev => prev.map(v =>
+            v.id === versionId
+                ? {
+                    ...v,
+                    score: result?.analysis?.ats_score || 0,
+                    timestamp: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
+                    status: isSuccess ? 'completed' : 'error',
+                    summary: result?.refinement?.summary || v.summary,
+                    filename: result?.compilation?.output_filename || v.filename,
+                    error: isSuccess ? undefined : (result?.compilation?.error || "Unknown Error")
+                }
+                : v
+        ));
+    };
+
+    const failRefineVersion = (versionId: string, error?: string) => {
+        setVersions(prev => prev.map(v =>
+            v.id === versionId
+                ? { ...v, status: 'error', timestamp: 'Failed', error: error || "Refinement failed" }
+                : v
+        ));
+    };
+
     // Poll for refine job result
     const pollRefineJob = (jobId: string, versionId: string) => {
         const interval = setInterval(async () => {
@@ -118,28 +145,10 @@ export default function ResumePreview({ baseFilename, jobDescription, initialSco
 
                 if (data.status === "SUCCESS" || data.status === "completed") {
                     clearInterval(interval);
-                    const result = data.result;
-                    const isSuccess = result?.compilation?.success !== false;
-                    setVersions(prev => prev.map(v =>
-                        v.id === versionId
-                            ? {
-                                ...v,
-                                score: result?.analysis?.ats_score || 0,
-                                timestamp: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
-                                status: isSuccess ? 'completed' : 'error',
-                                summary: result?.refinement?.summary || v.summary,
-                                filename: result?.compilation?.output_filename || v.filename,
-                                error: isSuccess ? undefined : (result?.compilation?.error || "Unknown Error")
-                            }
-                            : v
-                    ));
+                    applyRefineResult(versionId, data.result);
                 } else if (data.status === "FAILED" || data.status === "FAILURE") {
                     clearInterval(interval);
-                    setVersions(prev => prev.map(v =>
-                        v.id === versionId
-                            ? { ...v, status: 'error', timestamp: 'Failed', error: data.error || "Refinement failed" }
-                            : v
-                    ));
+                    failRefineVersion(versionId, data.error);
                 }
             } catch (err) {
                 console.error("Polling error:", err);
@@ -147,6 +156,79 @@ export default function ResumePreview({ baseFilename, jobDescription, initialSco
         }, 2000);
     };
 
+    // Stream refine job progress over SSE: LLM tokens, then compile / re-analysis events.
+    // Falls back to polling if the stream can't be opened or drops.
+    const STAGE_LABELS: Record<string, string> = {
+        extract: "Loading...",
+        refine: "Writing...",
+        compile: "Compiling...",
+        analysis: "Scoring...",
+        persist: "Saving...",
+    };
+
+    const streamRefineJob = (jobId: string, versionId: string) => {
+        if (typeof EventSource === "undefined") {
+            pollRefineJob(jobId, versionId);
+            return;
+        }
+        const source = new EventSource(`${getBaseUrl()}/actions/jobs/${jobId}/events?token=${getAuthToken()}`);
+        let finished = false;
+
+        source.addEventListener("token", (e) => {
+            const { text } = JSON.parse((e as MessageEvent).data);
+            setLiveOutput(prev => ({ ...prev, [versionId]: (prev[versionId] || "") + text }));
+        });
+        source.addEventListener("stage", (e) => {
+            const { stage, status } = JSON.parse((e as MessageEvent).data);
+            if (status === "started" && STAGE_LABELS[stage]) {
+                setVersions(prev => prev.map(v =>
+                    v.id === versionId && v.status === 'generating' ? { ...v, timestamp: STAGE_LABELS[stage] } : v
+                ));
+            }
+        });
+        source.addEventListener("compiled", (e) => {
+            // Show the PDF right away; the score follows with the "analysis" event
+            const data = JSON.parse((e as MessageEvent).data);
+            setVersions(prev => prev.map(v =>
+                v.id === versionId
+                    ? {
+                        ...v,
+                        timestamp: new Date().toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' }),
+                        status: data.success ? 'completed' : 'error',
+                        filename: data.output_filename || v.filename,
+                        error: data.success ? undefined : (data.error || "Unknown Error")
+                    }
+                    : v
+            ));
+        });
+        source.addEventListener("analysis", (e) => {
+            const { ats_score } = JSON.parse((e as MessageEvent).data);
+            setVersions(prev => prev.map(v => v.id === versionId ? { ...v, score: ats_score || 0 } : v));
+        });
+        source.addEventListener("done", (e) => {
+            finished = true;
+            source.close();
+            applyRefineResult(versionId, JSON.parse((e as MessageEvent).data).result);
+            setLiveOutput(prev => {
+                const { [versionId]: _, ...rest } = prev;
+                return rest;
+            });
+        });
+        source.addEventListener("error", (e) => {
+            const data = (e as MessageEvent).data;
+            if (data) {
+                // Job failed (server-sent "error" event)
+                finished = true;
+                source.close();
+                failRefineVersion(versionId, JSON.parse(data).error);
+            } else if (!finished) {
+                // Connection problem
+                source.close();
+                pollRefineJob(jobId, versionId);
+            }
+        });
+    };
+
     // MUTATION
     const refineMutation = useMutation({
         mutationFn: async (userReq: string) => {
@@ -172,14 +254,15 @@ export default function ResumePreview({ baseFilename, jobDescription, initialSco
                 user_request: userReq,
                 output_filename: nextFilename,
                 job_description: jobDescription,
-                target_version: nextId
+                target_version: nextId,
+                stream: true
             });
             return { ...res.data, versionId: nextId };
         },
         onSuccess: (data) => {
-            // Start polling for the async job result
+            // Follow the async job (streamed, with polling fallback)
             if (data.job_id) {
-                pollRefineJob(data.job_id, data.versionId);
+                streamRefineJob(data.job_id, data.versionId);
             }
             setRefinementInput("");
         },
@@ -422,6 +505,18 @@ export default function ResumePreview({ baseFilename, jobDescription, initialSco
                                 <Box sx={{ display: 'flex', flexDirection: 'column', alignItems: 'center', justifyContent: 'center' }}>
                                     <CircularProgress size={40} thickness={4} />
                                     <Typography sx={{ mt: 2, color: 'text.secondary' }}>Generating Resume PDF...</Typography>
+                                    {liveOutput[currentVersion.id] && (
+                                        <Box
+                                            component="pre"
+                                            sx={{
+                                                mt: 2, p: 2, width: 640, maxWidth: '100%', maxHeight: 360, overflow: 'hidden',
+                                                bgcolor: '#1e1e1e', color: '#d4d4d4', borderRadius: 1,
+                                                fontSize: '12px', whiteSpace: 'pre-wrap', wordBreak: 'break-all'
+                                            }}
+                                        >
+                                            {liveOutput[currentVersion.id].slice(-2000)}
+                                        </Box>
+                                    )}
                                 </Box>
                             ) : (
                                 <embed